@@ -8,6 +8,10 @@ sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-en
 from sharing_game import SharingGame
 from game_configs_exp1 import game_configs
 from strategic_play import LevelKSimulation_Selfish
+from compiled_game import compile_game
+from power_models import choice_policy
+from goal_utility import GREU_ESTIMATED, GREU_UNIFORM, discrete_prior, goal_level_k
+from goal_utility import compute_greu as compute_greu_goals
 
 """ 
 These class of models implements the theory that people's intuitive psychology of structural power concerns whether a player is in a position to get what they actually want.
@@ -189,191 +193,32 @@ def compute_mpru_direct(game, p_in_player1, p_right_player2):
 ### 2. GREU.
 def compute_greu(game, p_in_player1, p_right_player2):
     """This computes the relative expected utility (P2 - P1) under all possible goals that each player might have"""
-    # Extract Direct rewards
-     # Extract rewards from the game config
-    U_P1_Out = game.get_reward(2)[Player1]
-    U_P2_Out = game.get_reward(2)[Player2]
-    U_P1_Left = game.get_reward(4)[Player1]
-    U_P2_Left = game.get_reward(4)[Player2]
-    U_P1_Right = game.get_reward(5)[Player1]
-    U_P2_Right = game.get_reward(5)[Player2]
-
-    # Expected Utility Calculations using precomputed probabilities
-    P_out = 1 - p_in_player1  # Assuming Out is complementary to In
-    P_in = p_in_player1
-    P_left = 1 - p_right_player2  # Assuming Left is complementary to Right
-    P_right = p_right_player2
-
-    "Altruism: Ua = Uother"
-    Ua_P1_Out = U_P2_Out
-    Ua_P2_Out =  U_P1_Out
-    Ua_P1_Left = U_P2_Left 
-    Ua_P2_Left = U_P1_Left
-    Ua_P1_Right = U_P2_Right
-    Ua_P2_Right = U_P1_Right
-
-    # Expected utilities for both players
-    EUa_P1 = Ua_P1_Out * P_out + Ua_P1_Left * P_in * P_left + Ua_P1_Right * P_in * P_right
-    EUa_P2 = Ua_P2_Out * P_out + Ua_P2_Left * P_in * P_left + Ua_P2_Right * P_in * P_right
-
-    "Prosocial: Up = 1/2 Uself + 1/2 Uother"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Up_P1_Out = (1/2) * (U_P1_Out + U_P2_Out)
-    Up_P2_Out = (1/2) * (U_P2_Out + U_P1_Out)
-    Up_P1_Left = (1/2) * (U_P1_Left + U_P2_Left)
-    Up_P2_Left = (1/2) * (U_P2_Left + U_P1_Left)
-    Up_P1_Right = (1/2) * (U_P1_Right + U_P2_Right)
-    Up_P2_Right = (1/2) * (U_P2_Right + U_P1_Right)
-
-
-    # Expected utilities for both players
-    EUp_P1 = Up_P1_Out * P_out + Up_P1_Left * P_in * P_left + Up_P1_Right * P_in * P_right
-    EUp_P2 = Up_P2_Out * P_out + Up_P2_Left * P_in * P_left + Up_P2_Right * P_in * P_right
-
-    "Selish: Usel = Uself"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Usel_P1_Out = U_P1_Out
-    Usel_P2_Out =  U_P2_Out
-    Usel_P1_Left = U_P1_Left 
-    Usel_P2_Left = U_P2_Left
-    Usel_P1_Right = U_P1_Right
-    Usel_P2_Right = U_P2_Right
-
-    # Expected utilities for both players
-    EUsel_P1 = Usel_P1_Out * P_out + Usel_P1_Left * P_in * P_left + Usel_P1_Right * P_in * P_right
-    EUsel_P2 = Usel_P2_Out * P_out + Usel_P2_Left * P_in * P_left + Usel_P2_Right * P_in * P_right
-
-    "Competitive: Uc = 1/2 Uself - 1/2 Uother"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Uc_P1_Out =  (1/2) * (U_P1_Out - U_P2_Out)
-    Uc_P2_Out =  (1/2) * (U_P2_Out - U_P1_Out)
-    Uc_P1_Left = (1/2) * (U_P1_Left - U_P2_Left)
-    Uc_P2_Left = (1/2) * (U_P2_Left - U_P1_Left)
-    Uc_P1_Right =(1/2) * (U_P1_Right - U_P2_Right)
-    Uc_P2_Right =(1/2) * (U_P2_Right - U_P1_Right)
-
-    # Expected utilities for both players
-    EUc_P1 = Uc_P1_Out * P_out + Uc_P1_Left * P_in * P_left + Uc_P1_Right * P_in * P_right
-    EUc_P2 = Uc_P2_Out * P_out + Uc_P2_Left * P_in * P_left + Uc_P2_Right * P_in * P_right
-
-    "Sadistic: Us = -Uother"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Usad_P1_Out = -U_P2_Out
-    Usad_P2_Out =  -U_P1_Out
-    Usad_P1_Left = -U_P2_Left 
-    Usad_P2_Left = -U_P1_Left
-    Usad_P1_Right = -U_P2_Right
-    Usad_P2_Right = -U_P1_Right
-
-    # Expected utilities for both players
-    EUsad_P1 = Usad_P1_Out * P_out + Usad_P1_Left * P_in * P_left + Usad_P1_Right * P_in * P_right
-    EUsad_P2 = Usad_P2_Out * P_out + Usad_P2_Left * P_in * P_left + Usad_P2_Right * P_in * P_right
-
-    "Average Expected Utility under possible goals"
-    EU_P1 = EUa_P1 + EUp_P1 + EUsel_P1 + EUc_P1 +EUsad_P1
-    EU_P2 = EUa_P2 + EUp_P2 + EUsel_P2 + EUc_P2 +EUsad_P2
-
-    # Compute Relative Expected Utility
-    relative_expected_utility = EU_P2 - EU_P1
-
-    return EU_P1, EU_P2, relative_expected_utility
+    "Altruistic, prosocial, selfish, competitive and sadistic goals (goal_utility.GOALS), summed with equal weight"
+    tree = compile_game(game)
+    policy = choice_policy(tree, p_in_player1, p_right_player2)
+    EU_P1, EU_P2, relative_expected_utility = compute_greu_goals(tree, policy, tree.payoffs, *discrete_prior(GREU_UNIFORM))
+    return float(EU_P1), float(EU_P2), float(relative_expected_utility)
 
 ### 3. GREU (Estimated Goal Priors).
 def compute_greu_estimated(game, p_in_player1, p_right_player2):
     """This computes the relative expected utility (P2 - P1) under likely goals for each player. This merely posits what the likely """
     "The model posits that observes will think that players are most likely selfish(0.7), less likely prosocial (0.2), and even less likely altrustic (0.1) but never competetive (0) or sadistic (0)"
     "The subjective utilities under possible goals are unchanged from GREU"
-    # Extract Direct rewards
-     # Extract rewards from the game config
-    U_P1_Out = game.get_reward(2)[Player1]
-    U_P2_Out = game.get_reward(2)[Player2]
-    U_P1_Left = game.get_reward(4)[Player1]
-    U_P2_Left = game.get_reward(4)[Player2]
-    U_P1_Right = game.get_reward(5)[Player1]
-    U_P2_Right = game.get_reward(5)[Player2]
-
-    # Expected Utility Calculations using precomputed probabilities
-    P_out = 1 - p_in_player1  # Assuming Out is complementary to In
-    P_in = p_in_player1
-    P_left = 1 - p_right_player2  # Assuming Left is complementary to Right
-    P_right = p_right_player2
+    tree = compile_game(game)
+    policy = choice_policy(tree, p_in_player1, p_right_player2)
+    EU_P1, EU_P2, relative_expected_utility = compute_greu_goals(tree, policy, tree.payoffs, *discrete_prior(GREU_ESTIMATED))
+    return float(EU_P1), float(EU_P2), float(relative_expected_utility)
 
 
-
-    "Altruism: Ua = Uother"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Ua_P1_Out = U_P2_Out
-    Ua_P2_Out =  U_P1_Out
-    Ua_P1_Left = U_P2_Left 
-    Ua_P2_Left = U_P1_Left
-    Ua_P1_Right = U_P2_Right
-    Ua_P2_Right = U_P1_Right
-
-    # Expected utilities for both players
-    EUa_P1 = Ua_P1_Out * P_out + Ua_P1_Left * P_in * P_left + Ua_P1_Right * P_in * P_right
-    EUa_P2 = Ua_P2_Out * P_out + Ua_P2_Left * P_in * P_left + Ua_P2_Right * P_in * P_right
-
-    "Prosocial: Up = 1/2 Uself + 1/2 Uother"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Up_P1_Out = (1/2) * (U_P1_Out + U_P2_Out)
-    Up_P2_Out =  (1/2) *  (U_P2_Out + U_P1_Out)
-    Up_P1_Left = (1/2) *  (U_P1_Left + U_P2_Left)
-    Up_P2_Left = (1/2) *  (U_P2_Left + U_P1_Left)
-    Up_P1_Right = (1/2) *  (U_P1_Right + U_P2_Right)
-    Up_P2_Right = (1/2) *  (U_P2_Right + U_P1_Right)
-
-    # Expected utilities for both players
-    EUp_P1 = Up_P1_Out * P_out + Up_P1_Left * P_in * P_left + Up_P1_Right * P_in * P_right
-    EUp_P2 = Up_P2_Out * P_out + Up_P2_Left * P_in * P_left + Up_P2_Right * P_in * P_right
-
-    "Selish: Usel = Uself"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Usel_P1_Out = U_P1_Out
-    Usel_P2_Out =  U_P2_Out
-    Usel_P1_Left = U_P1_Left 
-    Usel_P2_Left = U_P2_Left
-    Usel_P1_Right = U_P1_Right
-    Usel_P2_Right = U_P2_Right
-
-    # Expected utilities for both players
-    EUsel_P1 = Usel_P1_Out * P_out + Usel_P1_Left * P_in * P_left + Usel_P1_Right * P_in * P_right
-    EUsel_P2 = Usel_P2_Out * P_out + Usel_P2_Left * P_in * P_left + Usel_P2_Right * P_in * P_right
-
-    "Competitive: Uc = 1/2 Uself - 1/2 Uother"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Uc_P1_Out = (1/2) *  (U_P1_Out - U_P2_Out)
-    Uc_P2_Out =  (1/2) *  (U_P2_Out - U_P1_Out)
-    Uc_P1_Left = (1/2) *  (U_P1_Left - U_P2_Left)
-    Uc_P2_Left = (1/2) * (U_P2_Left - U_P1_Left)
-    Uc_P1_Right = (1/2) *  (U_P1_Right - U_P2_Right)
-    Uc_P2_Right = (1/2) * (U_P2_Right - U_P1_Right)
-
-    # Expected utilities for both players
-    EUc_P1 = Uc_P1_Out * P_out + Uc_P1_Left * P_in * P_left + Uc_P1_Right * P_in * P_right
-    EUc_P2 = Uc_P2_Out * P_out + Uc_P2_Left * P_in * P_left + Uc_P2_Right * P_in * P_right
-
-    "Sadistic: Us = -Uother"
-    # Extract rewards from the game config but modify for 5 distinct goals
-    Usad_P1_Out = -U_P2_Out
-    Usad_P2_Out =  -U_P1_Out
-    Usad_P1_Left = -U_P2_Left 
-    Usad_P2_Left = -U_P1_Left
-    Usad_P1_Right = -U_P2_Right
-    Usad_P2_Right = -U_P1_Right
-
-    # Expected utilities for both players
-    EUsad_P1 = Usad_P1_Out * P_out + Usad_P1_Left * P_in * P_left + Usad_P1_Right * P_in * P_right
-    EUsad_P2 = Usad_P2_Out * P_out + Usad_P2_Left * P_in * P_left + Usad_P2_Right * P_in * P_right
-
-    "The model posits that observes will think that players are most likely selfish(0.7), less likely prosocial (0.2), and even less likely altrustic (0.1) but never competetive (0) or sadistic (0)"
-    "Average Expected Utility under plausible goals implements these as goal priors"
-    EU_P1 = ((0.1*EUa_P1) + (.2*EUp_P1) + (0.7*EUsel_P1) + (0*EUc_P1)+(0*EUsad_P1))
-    EU_P2 = ((0.1*EUa_P2) + (.2*EUp_P2) + (0.7*EUsel_P2) + (0*EUc_P2)+(0*EUsad_P2))
-
-    # Compute Relative Expected Utility
-    relative_expected_utility = EU_P2 - EU_P1
-
-    return EU_P1, EU_P2, relative_expected_utility
+### 4. GREU (Goal-conditioned Level K).
+def compute_greu_goal_level_k(game, beta_player1, beta_player2, prior=GREU_ESTIMATED):
+    """This computes the relative expected utility (P2 - P1) when each goal drives its own level 2 play, instead of plugging in the selfish P(In) / P(Right)"""
+    "Both the behaviour (the goal-prior mixture of the goal policies) and the utilities change with the goals"
+    tree = compile_game(game)
+    result = goal_level_k(tree, tree.payoffs, [beta_player1, beta_player2], *discrete_prior(prior))
+    EU_P1, EU_P2, relative_expected_utility = result["GREU"]
+    p_in_player1, p_right_player2 = result["predictions"]
+    return float(EU_P1), float(EU_P2), float(relative_expected_utility), float(p_in_player1), float(p_right_player2)
 
 
 # Define CSV file paths for each model
@@ -383,6 +228,7 @@ csv_file_path_rcr = "rcr_direct_results.csv"
 csv_file_path_mpru = "mpru_direct_results.csv"
 csv_file_path_greu = "greu_results.csv"
 csv_file_path_greu_estimated = "greu_estimated_results.csv"
+csv_file_path_greu_goal_level_k = "greu_goal_level_k_results.csv"
 
 # Initialize dictionaries to store results for each model
 results_reu = {}
@@ -391,6 +237,7 @@ results_rcr = {}
 results_mpru = {}
 results_greu = {}
 results_greu_estimated = {}
+results_greu_goal_level_k = {}
 
 # Loop through all games in the game_configs dictionary
 # Loop through all games in the game_configs dictionary
@@ -471,6 +318,10 @@ for game_name, config in game_configs.items():
     EU_P1_greu_est, EU_P2_greu_est, GREU_estimated = compute_greu_estimated(game, p_in_player1, p_right_player2)
     results_greu_estimated[game_name] = {"U_P1": round(EU_P1_greu_est, 2), "U_P2": round(EU_P2_greu_est, 2), "Relative Utility (P2 - P1)": round(GREU_estimated, 2)}
 
+    # Compute GREU (Goal-conditioned Level K, estimated goal priors)
+    EU_P1_goal, EU_P2_goal, GREU_goal, p_in_goal, p_right_goal = compute_greu_goal_level_k(game, simulation.beta_player1, simulation.beta_player2)
+    results_greu_goal_level_k[game_name] = {"U_P1": round(EU_P1_goal, 2), "U_P2": round(EU_P2_goal, 2), "Relative Utility (P2 - P1)": round(GREU_goal, 2)}
+
     # Print results for each model
     print(f"REU - Expected Utility of Player 1: {EU_P1:.2f}, Player 2: {EU_P2:.2f}, REU: {REU:.2f}")
     print(f"RCCR - Relative Control over Chance Resources for Player 1: {CCR_P1:.2f}, Player 2: {CCR_P2:.2f}, RCCR: {RCCR:.2f}")
@@ -495,6 +346,7 @@ save_results_to_csv(csv_file_path_rcr, results_rcr)
 save_results_to_csv(csv_file_path_mpru, results_mpru)
 save_results_to_csv(csv_file_path_greu, results_greu)
 save_results_to_csv(csv_file_path_greu_estimated, results_greu_estimated)
+save_results_to_csv(csv_file_path_greu_goal_level_k, results_greu_goal_level_k)
 
 
 
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from level_k import MODEL_PARAMETERS, level_k_log_predictions, level_k_nll
+from multistart import MODEL_CONSTRAINTS, model_constraints
+
+"""
+Parallel participant bootstrap of the level-k fits.
+
+A replicate resamples participants with replacement from the cleaned participant x game rows and refits the model
+to the resampled data with the likelihood of the point fit: the trial-level one (targets = mean responses, counts =
+number of responses) or, with trial_level=False, the per-game means alone (one pseudo-observation per game).
+Rows are reduced once into per-participant response sums and counts (hierarchical.participant_arrays), so a
+replicate's data are just multinomial participant weights times those arrays. Replicates are split into blocks,
+each block gets its own seed and runs in a worker process, and every refit is warm-started from the full-data optimum.
+Percentile intervals are reported for every parameter and every predicted P(In) / P(Right).
+"""
+
+_problem = {}  # The games, the participant statistics and the fit settings, set once in every worker by _init_worker
+
+
+def _init_worker(tree, payoffs, sums, counts, model, level, x0, bounds, method, trial_level):
+    _problem.update(tree=tree, payoffs=payoffs, sums=sums, counts=counts, model=model, level=level,
+                    x0=x0, bounds=bounds, method=method, trial_level=trial_level)
+
+
+def _objective(x, targets, counts):
+    p = _problem
+    return level_k_nll(p["tree"], p["payoffs"], x, targets, model=p["model"], level=p["level"], jac=True, counts=counts)
+
+
+def _fit_replicates(seed, n_replicates):
+    """Draw n_replicates participant resamples from seed and refit each; returns the block's arrays."""
+    p = _problem
+    rng = np.random.default_rng(seed)
+    n_participants = len(p["counts"])
+    weights = rng.multinomial(n_participants, np.full(n_participants, 1 / n_participants), size=n_replicates)
+    counts = np.tensordot(weights, p["counts"], axes=1)  # (n_replicates, n_games, 2)
+    sums = np.tensordot(weights, p["sums"], axes=1)
+    targets = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    if not p["trial_level"]:
+        counts = (counts > 0).astype(float)  # Each resampled game mean weighs one; games nobody answered drop out
+    constraints = model_constraints(p["model"], len(p["x0"]))
+
+    params, nll, success, n_evaluations = [], [], [], 0
+    for r in range(n_replicates):
+        result = minimize(_objective, p["x0"], args=(targets[r], counts[r]), jac=True, bounds=p["bounds"],
+                          constraints=constraints, method=p["method"])
+        params.append(result.x)
+        nll.append(result.fun)
+        success.append(result.success)
+        n_evaluations += result.nfev
+    params = np.array(params)
+    predictions = np.exp(level_k_log_predictions(p["tree"], p["payoffs"], params, p["model"], p["level"])[0])
+    return params, np.array(nll), predictions, np.array(success), n_evaluations
+
+
+def bootstrap_fit(tree, payoffs, sums, counts, model, x0, bounds, n_replicates=1000, max_workers=None, seed=0,
+                  level=2, method=None, block_size=25, trial_level=True, verbose=True):
+    """
+    Participant bootstrap of one model's fit.
+    :param sums, counts: (n_participants, n_games, 2) response sums and counts (targets * counts from participant_arrays).
+    :param x0: Full-data optimum (e.g. the fit_multistart params), the warm start of every replicate.
+    :param bounds: Parameter bounds, as for fit_multistart.
+    :param block_size: Replicates per process-pool task.
+    :param trial_level: Refit with the trial-level likelihood; False refits the per-game means with counts 1, matching
+                        a point fit on the means.
+    :return: {"params": (n_replicates, k), "nll", "predictions": (n_replicates, n_games, 2) level-k P(In)/P(Right),
+              "success", "timing"}.
+    """
+    method = method or ("SLSQP" if model in MODEL_CONSTRAINTS else "L-BFGS-B")
+    max_workers = max_workers or os.cpu_count()
+    x0 = np.asarray(x0, dtype=float)
+    sizes = [min(block_size, n_replicates - start) for start in range(0, n_replicates, block_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    start = time.perf_counter()
+    blocks, done, n_evaluations = [None] * len(sizes), 0, 0
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(tree, payoffs, sums, counts, model, level, x0, bounds, method, trial_level)) as pool:
+        futures = {pool.submit(_fit_replicates, s, n): b for b, (s, n) in enumerate(zip(seeds, sizes))}
+        for future in as_completed(futures):
+            blocks[futures[future]] = future.result()
+            done += sizes[futures[future]]
+            n_evaluations += blocks[futures[future]][4]
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"{model}: {done}/{n_replicates} replicates, {done / elapsed:.1f} fits/s, "
+                      f"ETA {elapsed * (n_replicates - done) / done:.0f}s")
+    wall_seconds = time.perf_counter() - start
+
+    params, nll, predictions, success = (np.concatenate([block[i] for block in blocks]) for i in range(4))
+    return {
+        "params": params,
+        "nll": nll,
+        "predictions": predictions,
+        "success": success,
+        "timing": {
+            "n_replicates": n_replicates,
+            "n_workers": max_workers,
+            "wall_seconds": wall_seconds,
+            "fits_per_second": n_replicates / wall_seconds,
+            "evaluations_per_second": n_evaluations / wall_seconds,
+        },
+    }
+
+
+def percentile_intervals(tree, payoffs, game_names, model, x0, bootstrap, level=2, alpha=0.05):
+    """
+    Percentile (1 - alpha) intervals of every parameter and every predicted P(In) / P(Right).
+    :return: DataFrame with one row per quantity: Model, Game (empty for parameters), Quantity, Estimate (full-data fit),
+             Lower, Upper and SD of the bootstrap replicates.
+    """
+    x0 = np.asarray(x0, dtype=float)
+    estimate = np.exp(level_k_log_predictions(tree, payoffs, x0, model, level)[0])
+    rows = []
+    for j, name in enumerate(MODEL_PARAMETERS[model]):
+        rows.append(("", name, x0[j], bootstrap["params"][:, j]))
+    for g, game in enumerate(game_names):
+        for c, name in enumerate(("p_in", "p_right")):
+            rows.append((game, name, estimate[g, c], bootstrap["predictions"][:, g, c]))
+    lower, upper = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    return pd.DataFrame([
+        {"Model": model, "Game": game, "Quantity": name, "Estimate": value,
+         "Lower": np.percentile(replicates, lower), "Upper": np.percentile(replicates, upper), "SD": replicates.std(ddof=1)}
+        for game, name, value, replicates in rows
+    ])
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from level_k import level_k_log_predictions, level_k_nll, log_binary_nll
+from multistart import MODEL_CONSTRAINTS, model_constraints, fit_multistart
+
+"""
+Cross-validation over games.
+
+Folds hold out whole games: leave-one-game-out (folds="logo") or k shuffled folds (folds=k). For every fold the model
+is refitted on the remaining games, warm-started from the full-data fit, and scored on the held-out games.
+Folds run in parallel in a ProcessPoolExecutor; the workers only fit, and the held-out predictions are made in the
+main process by one stacked level-k solve: every held-out game is paired with the parameters of its own fold, so
+each game is simulated exactly once.
+"""
+
+
+def game_folds(n_games, folds="logo", seed=0):
+    """
+    Held-out game indices of every fold.
+    :param folds: "logo" for leave-one-game-out, or the number of shuffled k-fold splits.
+    """
+    if folds == "logo":
+        return [np.array([g]) for g in range(n_games)]
+    order = np.random.default_rng(seed).permutation(n_games)
+    return [np.sort(fold) for fold in np.array_split(order, folds)]
+
+
+_problem = {}  # The games, the human data and the fit settings, set once in every worker process by _init_worker
+
+
+def _init_worker(tree, payoffs, targets, counts, model, level, x0, bounds, method):
+    _problem.update(tree=tree, payoffs=payoffs, targets=targets, counts=counts, model=model, level=level,
+                    x0=x0, bounds=bounds, method=method)
+
+
+def _objective(x, train):
+    p = _problem
+    return level_k_nll(p["tree"], p["payoffs"][train], x, p["targets"][train], model=p["model"], level=p["level"],
+                       jac=True, counts=p["counts"][train])
+
+
+def _fit_fold(train):
+    """Refit on the training games of one fold, from the full-data optimum."""
+    p = _problem
+    start = time.perf_counter()
+    result = minimize(_objective, p["x0"], args=(train,), jac=True, bounds=p["bounds"],
+                      constraints=model_constraints(p["model"], len(p["x0"])), method=p["method"])
+    return result.x, float(result.fun), bool(result.success), time.perf_counter() - start
+
+
+def cross_validate(tree, payoffs, game_names, targets, model, bounds, folds="logo", x0=None, counts=1, level=2,
+                   method=None, max_workers=None, seed=0, n_starts=32):
+    """
+    Cross-validate one model over games.
+    :param tree, payoffs, targets: Stacked games (stack_payoffs) and their (n_games, 2) human [P(In), P(Right)].
+    :param folds: "logo" or the number of k-fold splits (see game_folds).
+    :param x0: Full-data optimum used as the warm start of every fold; fitted with fit_multistart when None.
+    :return: {"predictions": DataFrame with one row per held-out game (Game, Fold, p_in, p_right, NLL),
+              "test_nll": summed held-out NLL, "folds": per-fold params and train NLL, "x0", "timing"}.
+    """
+    method = method or ("SLSQP" if model in MODEL_CONSTRAINTS else "L-BFGS-B")
+    counts = np.broadcast_to(np.asarray(counts, dtype=float), targets.shape)
+    if x0 is None:
+        x0 = list(fit_multistart(tree, payoffs, targets, model, bounds, n_starts=n_starts, max_workers=max_workers,
+                                 seed=seed, level=level, counts=counts)["params"].values())
+    x0 = np.asarray(x0, dtype=float)
+    tests = game_folds(len(game_names), folds, seed)
+    trains = [np.setdiff1d(np.arange(len(game_names)), test) for test in tests]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(tree, payoffs, targets, counts, model, level, x0, bounds, method)) as pool:
+        fits = list(pool.map(_fit_fold, trains))
+    wall_seconds = time.perf_counter() - start
+
+    # Every held-out game with its fold's params, as its own batch entry: (n_held_out, 1, n_terminals, 2)
+    held_out = np.concatenate(tests)
+    fold_of = np.repeat(np.arange(len(tests)), [len(test) for test in tests])
+    fold_params = np.array([params for params, _, _, _ in fits])[fold_of]
+    log_p, log_not_p = (a[:, 0] for a in level_k_log_predictions(tree, payoffs[held_out][:, None], fold_params, model, level))
+    nll = log_binary_nll(log_p[:, None], log_not_p[:, None], targets[held_out][:, None], counts[held_out][:, None])
+    predictions = pd.DataFrame({"Game": [game_names[g] for g in held_out], "Fold": fold_of,
+                                "p_in": np.exp(log_p[:, 0]), "p_right": np.exp(log_p[:, 1]), "NLL": nll})
+    fold_records = [{"test_games": [game_names[g] for g in test], "params": params.tolist(), "train_nll": train_nll,
+                     "success": success, "seconds": seconds} for test, (params, train_nll, success, seconds) in zip(tests, fits)]
+    return {
+        "predictions": predictions,
+        "test_nll": float(predictions["NLL"].sum()),
+        "folds": fold_records,
+        "x0": x0.tolist(),
+        "timing": {"n_folds": len(tests), "wall_seconds": wall_seconds},
+    }
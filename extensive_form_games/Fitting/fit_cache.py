@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import hashlib
+
+import numpy as np
+
+"""
+Content-addressed store of fit results.
+
+A fit is keyed by the SHA-256 of everything it depends on:
+    - the model class,
+    - the configs of the games it was fitted on (each game's config is hashed separately, so editing a game that a
+      fit does not use leaves that fit's entry valid, and editing one that it does use gives a new key),
+    - the input data: the bytes of the CSV files, or the raw bytes of in-memory arrays,
+    - the optimizer settings (bounds, starts, level, seed, ...),
+    - the code: CACHE_VERSION and the sources of the modules a fit runs through (CODE_FILES), so a change to the
+      level-k solver or the objective never returns fits made by the old code.
+Entries are JSON files named by their key inside the cache directory; index.json maps each key to its file, a
+description and its last use, so lookups never scan the directory. The least recently used entries are evicted
+beyond max_entries.
+"""
+
+
+CACHE_VERSION = 1  # Bump to invalidate every entry after a change outside CODE_FILES that alters results
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CODE_FILES = [os.path.join(_ROOT, "Games", name) for name in ("compiled_game.py", "level_k.py")] + \
+             [os.path.join(_ROOT, "Fitting", name) for name in ("multistart.py", "trial_likelihood.py")]
+
+
+def _canonical(value):
+    """JSON-ready form of a config or settings value with a stable ordering (dict keys of any type are allowed)."""
+    if isinstance(value, dict):
+        return [[repr(k), _canonical(v)] for k, v in sorted(value.items(), key=lambda item: repr(item[0]))]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _canonical(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def config_hash(game_configs):
+    """{game: hash of its config}; a fit depends only on the games it was fitted on."""
+    return {game: hashlib.sha256(json.dumps(_canonical(config)).encode()).hexdigest() for game, config in game_configs.items()}
+
+
+def data_hash(data):
+    """Hash of the input data: a CSV path (hashed by content), an array, or a list / dict of those."""
+    if isinstance(data, dict):
+        return {key: data_hash(value) for key, value in sorted(data.items())}
+    if isinstance(data, (list, tuple)):
+        return [data_hash(value) for value in data]
+    if isinstance(data, (str, os.PathLike)):
+        digest = hashlib.sha256()
+        with open(data, "rb") as fp:
+            for block in iter(lambda: fp.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    array = np.ascontiguousarray(data)
+    return hashlib.sha256(str(array.dtype).encode() + str(array.shape).encode() + array.tobytes()).hexdigest()
+
+
+def code_hash(files=CODE_FILES):
+    """Hash of CACHE_VERSION and the sources of the fitting code (files that do not exist are skipped)."""
+    return data_hash([CACHE_VERSION] + [path for path in files if os.path.exists(path)])
+
+
+def fit_key(model, game_configs, data, settings=None):
+    """SHA-256 key of one fit, from the model class, the fitted games' configs, the input data, the settings and the code."""
+    content = {"model": model, "games": config_hash(game_configs), "data": data_hash(data), "settings": _canonical(settings or {}),
+               "code": code_hash()}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class FitCache:
+    "On-disk LRU store of JSON fit results, addressed by fit_key"
+    def __init__(self, directory=".fit_cache", max_entries=256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(directory, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as fp:
+                self.index = json.load(fp)
+
+    def _write_json(self, path, content):
+        """Write through a temporary file so a crash never leaves a half-written entry or index."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as fp:
+            json.dump(content, fp, indent=2)
+        os.replace(temporary, path)
+
+    def get(self, key):
+        """The stored result for key, or None (a missing entry file is dropped from the index)."""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        path = os.path.join(self.directory, entry["file"])
+        if not os.path.exists(path):
+            del self.index[key]
+            self._write_json(self.index_path, self.index)
+            return None
+        entry["last_used"] = time.time()
+        self._write_json(self.index_path, self.index)
+        with open(path) as fp:
+            return json.load(fp)
+
+    def put(self, key, result, description=""):
+        """Store a JSON-serialisable result under key, evicting the least recently used entries beyond max_entries."""
+        file_name = f"{key}.json"
+        self._write_json(os.path.join(self.directory, file_name), result)
+        now = time.time()
+        self.index[key] = {"file": file_name, "description": description, "created": now, "last_used": now}
+        for old in sorted(self.index, key=lambda k: self.index[k]["last_used"])[:max(0, len(self.index) - self.max_entries)]:
+            path = os.path.join(self.directory, self.index.pop(old)["file"])
+            if os.path.exists(path):
+                os.remove(path)
+        self._write_json(self.index_path, self.index)
+
+    def fetch(self, model, game_configs, data, settings, fit):
+        """
+        Cached call of fit(): the stored result when one exists for these inputs, otherwise fit() stored and returned.
+        :param game_configs: Configs of the fitted games only.
+        :param data: CSV path(s) or arrays the fit reads.
+        :param settings: Everything else the result depends on (bounds, n_starts, level, ...).
+        :return: (result, hit) where hit tells whether it came from the cache.
+        """
+        key = fit_key(model, game_configs, data, settings)
+        result = self.get(key)
+        if result is not None:
+            return result, True
+        result = fit()
+        self.put(key, result, description=f"{model} on {len(game_configs)} games")
+        return result, False
+
+    def __len__(self):
+        return len(self.index)
@@ -0,0 +1,257 @@
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from level_k import MODEL_PARAMETERS, level_k_nll
+from trial_likelihood import RESPONSE_COLUMNS
+
+"""
+Hierarchical (empirical-Bayes) per-participant fitting.
+
+Each participant i gets their own parameters, drawn from a population prior:
+    phi_i ~ Normal(mu, diag(variance)),  theta_i = transform(phi_i)
+where phi is an unconstrained reparameterisation of the model's parameters (PARAMETER_TRANSFORMS), so betas stay
+positive and the IA constraint alpha <= delta holds by construction. The prior is fitted by EM with a Laplace
+approximation:
+    - E-step: MAP phi_i for every participant under the current prior, plus the posterior covariance from the
+      Hessian at the MAP. All participants of a chunk are solved together: their parameter rows go through one
+      batched level-k solve (the utility kernels behind LevelKSimulation_Selfish / _IA), and the chunks are spread
+      over a ProcessPoolExecutor. The joint solve stops on the chunk's summed objective, so every participant is
+      then polished by its own L-BFGS-B run from the joint solution.
+    - M-step: mu = mean of the MAPs, variance = mean of (MAP - mu)^2 + posterior variance.
+The per-participant likelihood is the Bernoulli trial likelihood of trial_likelihood, one response per game.
+Posteriors are saved as a compressed .npz with one array per column (save_posteriors / load_posteriors).
+"""
+
+PHI_BOUND = 15  # |phi| bound keeping exp(phi) finite during the MAP search
+
+
+def _sigmoid(x):
+    return 0.5 * (1 + np.tanh(x / 2))
+
+
+def _selfish_transform(phi):
+    theta = np.exp(phi)
+    return theta, theta[..., :, None] * np.eye(phi.shape[-1])
+
+
+def _inequality_transform(phi):
+    """(log beta1, log beta2, log delta1, log delta2, logit(alpha1 / delta1), logit(alpha2 / delta2))."""
+    positive = np.exp(phi[..., :4])
+    share = _sigmoid(phi[..., 4:6])
+    delta = positive[..., 2:4]
+    theta = np.concatenate([positive, delta * share], axis=-1)
+    jacobian = np.zeros(phi.shape + (6,))
+    for a in range(4):
+        jacobian[..., a, a] = positive[..., a]
+    for p in (0, 1):
+        jacobian[..., 4 + p, 2 + p] = delta[..., p] * share[..., p]
+        jacobian[..., 4 + p, 4 + p] = delta[..., p] * share[..., p] * (1 - share[..., p])
+    return theta, jacobian
+
+
+def _reciprocity_transform(phi):
+    """(log beta1, log beta2, logit theta2)."""
+    theta = np.concatenate([np.exp(phi[..., :2]), _sigmoid(phi[..., 2:3])], axis=-1)
+    jacobian = np.zeros(phi.shape + (3,))
+    jacobian[..., 0, 0], jacobian[..., 1, 1] = theta[..., 0], theta[..., 1]
+    jacobian[..., 2, 2] = theta[..., 2] * (1 - theta[..., 2])
+    return theta, jacobian
+
+
+# phi -> (theta laid out as MODEL_PARAMETERS[model], d theta / d phi as a (..., k, k) array)
+PARAMETER_TRANSFORMS = {
+    "selfish": _selfish_transform,
+    "inequality": _inequality_transform,
+    "reciprocity": _reciprocity_transform,
+}
+
+
+def participant_arrays(rows, game_names, columns=RESPONSE_COLUMNS, scale=100):
+    """
+    Arrange participant x game rows into dense per-participant arrays.
+    :param rows: DataFrame with ID, Game and the response columns (e.g. final_cleaned_data_2.csv).
+    :return: (ids, targets, counts); targets are (n_participants, n_games, 2) mean responses in [0, 1] and
+             counts the number of responses behind each (0 where a participant did not see a game).
+    """
+    game_index = pd.Index(list(game_names)).get_indexer(rows["Game"])
+    keep = game_index >= 0
+    participant_index, ids = pd.factorize(rows.loc[keep, "ID"])
+    responses = rows.loc[keep, list(columns)].to_numpy(dtype=float) / scale
+    observed = ~np.isnan(responses)
+    shape = (len(ids), len(game_names), len(columns))
+    sums, counts = np.zeros(shape), np.zeros(shape)
+    np.add.at(sums, (participant_index, game_index[keep]), np.where(observed, responses, 0.0))
+    np.add.at(counts, (participant_index, game_index[keep]), observed)
+    targets = np.divide(sums, counts, out=np.zeros(shape), where=counts > 0)
+    return np.asarray(ids), targets, counts
+
+
+_problem = {}  # The shared games and model, set once in every worker process by _init_worker
+
+
+def _init_worker(tree, payoffs, model, level):
+    _problem.update(tree=tree, payoffs=payoffs, model=model, level=level)
+
+
+def _posterior_terms(phi, targets, counts, mu, variance):
+    """Per-participant negative log posterior (up to a constant), its gradient in phi and the NLL alone."""
+    p = _problem
+    theta, jacobian = PARAMETER_TRANSFORMS[p["model"]](phi)
+    nll, gradient = level_k_nll(p["tree"], p["payoffs"], theta, targets, p["model"], p["level"], jac=True, counts=counts)
+    residual = (phi - mu) / variance
+    objective = nll + 0.5 * np.sum(residual * (phi - mu), axis=-1)
+    return objective, np.einsum("...a,...ab->...b", gradient, jacobian) + residual, nll  # jacobian[..., theta, phi]
+
+
+def check_gradient(targets, counts, mu, variance, phi, step=1e-6):
+    """
+    Largest absolute difference between the analytic posterior gradient (transform Jacobian included) and central
+    finite differences, for (n, k) phi rows of the participants in targets / counts. Uses the current worker problem.
+    """
+    _, gradient, _ = _posterior_terms(phi, targets, counts, mu, variance)
+    numeric = np.empty_like(gradient)
+    for j in range(phi.shape[-1]):
+        shift = np.zeros(phi.shape[-1])
+        shift[j] = step
+        numeric[..., j] = (_posterior_terms(phi + shift, targets, counts, mu, variance)[0]
+                           - _posterior_terms(phi - shift, targets, counts, mu, variance)[0]) / (2 * step)
+    return float(np.max(np.abs(gradient - numeric)))
+
+
+def _map_chunk(targets, counts, mu, variance, phi0, step=1e-4):
+    """
+    E-step for one chunk of participants: joint MAP search polished participant by participant, then Laplace
+    covariances from the gradient's differences.
+    """
+    n, k = phi0.shape
+
+    def objective(flat, rows):
+        value, gradient, _ = _posterior_terms(flat.reshape(-1, k), targets[rows], counts[rows], mu, variance)
+        return value.sum(), gradient.ravel()  # Participants are independent, so the chunk's objective is a plain sum
+
+    def solve(phi_start, rows):
+        return minimize(objective, phi_start.ravel(), args=(rows,), jac=True, method="L-BFGS-B",
+                        bounds=[(-PHI_BOUND, PHI_BOUND)] * phi_start.size).x.reshape(-1, k)
+
+    phi = solve(phi0, slice(None))
+    # The joint stopping tests act on the summed objective, so polish every participant on its own
+    for i in range(n):
+        phi[i] = solve(phi[i:i + 1], slice(i, i + 1))[0]
+    hessian = np.empty((n, k, k))
+    for j in range(k):
+        shift = np.zeros(k)
+        shift[j] = step
+        hessian[..., j] = (_posterior_terms(phi + shift, targets, counts, mu, variance)[1]
+                           - _posterior_terms(phi - shift, targets, counts, mu, variance)[1]) / (2 * step)
+    hessian = 0.5 * (hessian + np.swapaxes(hessian, -1, -2))
+    # The prior alone keeps the Hessian positive definite; fall back to it where the curvature estimate is not
+    prior_precision = np.eye(k) / variance
+    eigenvalues = np.linalg.eigvalsh(hessian)
+    hessian = np.where((eigenvalues.min(axis=-1) > 0)[:, None, None], hessian, prior_precision)
+    objective_value, _, nll = _posterior_terms(phi, targets, counts, mu, variance)
+    return phi, np.linalg.inv(hessian), nll, objective_value
+
+
+def fit_hierarchical(tree, payoffs, targets, counts, model, level=2, max_iterations=50, tol=1e-4,
+                     chunk_size=256, max_workers=None, min_variance=1e-3, verbose=True):
+    """
+    Empirical-Bayes EM fit of per-participant parameters and their population prior.
+    :param tree, payoffs: Stacked games (stack_payoffs) in the order of the targets' game axis.
+    :param targets, counts: (n_participants, n_games, 2) arrays from participant_arrays.
+    :param model: Key of PARAMETER_TRANSFORMS / level_k.MODEL_PARAMETERS.
+    :param chunk_size: Participants solved together in one batched MAP search (one task for the process pool).
+    :return: dict with phi (MAP), covariance (Laplace), theta (transformed MAP), nll per participant,
+             the prior mu / variance, the per-iteration history and whether EM converged within max_iterations
+             (a warning is issued when it did not).
+    """
+    n_participants, k = len(targets), len(MODEL_PARAMETERS[model])
+    mu, variance = np.zeros(k), np.ones(k)
+    phi = np.tile(mu, (n_participants, 1))
+    chunks = [slice(start, start + chunk_size) for start in range(0, n_participants, chunk_size)]
+    history, converged = [], False
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(tree, payoffs, model, level)) as pool:
+        for iteration in range(max_iterations):
+            start = time.perf_counter()
+            futures = [pool.submit(_map_chunk, targets[c], counts[c], mu, variance, phi[c]) for c in chunks]
+            results = [f.result() for f in futures]
+            phi = np.concatenate([r[0] for r in results])
+            covariance = np.concatenate([r[1] for r in results])
+            nll = np.concatenate([r[2] for r in results])
+            objective = np.concatenate([r[3] for r in results])
+
+            # Laplace approximation of the marginal likelihood under the prior used in this E-step
+            _, log_det = np.linalg.slogdet(covariance)
+            log_marginal = np.sum(-objective + 0.5 * log_det - 0.5 * np.sum(np.log(variance)))
+
+            new_mu = phi.mean(axis=0)
+            new_variance = np.maximum(np.mean((phi - new_mu) ** 2 + np.diagonal(covariance, axis1=-2, axis2=-1), axis=0), min_variance)
+            change = max(np.max(np.abs(new_mu - mu)), np.max(np.abs(np.log(new_variance / variance))))
+            mu, variance = new_mu, new_variance
+            history.append({"iteration": iteration, "log_marginal": float(log_marginal), "total_nll": float(nll.sum()),
+                            "change": float(change), "seconds": time.perf_counter() - start})
+            if verbose:
+                print(f"EM iteration {iteration}: log marginal {log_marginal:.3f}, NLL {nll.sum():.3f}, change {change:.2e}")
+            if change < tol:
+                converged = True
+                break
+    if not converged:
+        warnings.warn(f"{model}: EM did not converge in {max_iterations} iterations (last change {change:.2e}, tol {tol:.0e})")
+
+    theta, _ = PARAMETER_TRANSFORMS[model](phi)
+    return {"phi": phi, "covariance": covariance, "theta": theta, "nll": nll, "mu": mu, "variance": variance,
+            "history": history, "converged": converged}
+
+
+def save_posteriors(file_path, ids, model, fit, counts=None):
+    """
+    Persist per-participant posteriors as a compressed .npz holding one array per column:
+    ID, the MAP of every parameter (by name), phi_<name>_mean / phi_<name>_sd in the unconstrained space,
+    nll, n_responses, plus the prior (prior_mu, prior_variance) and the model name.
+    """
+    names = MODEL_PARAMETERS[model]
+    sd = np.sqrt(np.diagonal(fit["covariance"], axis1=-2, axis2=-1))
+    columns = {"ID": np.asarray(ids).astype(str)}
+    for j, name in enumerate(names):
+        columns[name] = fit["theta"][:, j]
+        columns[f"phi_{name}_mean"] = fit["phi"][:, j]
+        columns[f"phi_{name}_sd"] = sd[:, j]
+    columns["nll"] = fit["nll"]
+    if counts is not None:
+        columns["n_responses"] = counts.sum(axis=(-2, -1))
+    np.savez_compressed(file_path, model=np.array(model), prior_mu=fit["mu"], prior_variance=fit["variance"], **columns)
+
+
+def load_posteriors(file_path):
+    """Read a save_posteriors file back as (DataFrame of per-participant columns, {"model", "prior_mu", "prior_variance"})."""
+    with np.load(file_path) as data:
+        prior = {key: data[key] for key in ("prior_mu", "prior_variance")}
+        prior["model"] = str(data["model"])
+        columns = {key: data[key] for key in data.files if key not in ("model", "prior_mu", "prior_variance")}
+    return pd.DataFrame(columns), prior
+
+
+if __name__ == "__main__":
+    from compiled_game import stack_payoffs
+    from game_configs_exp2 import game_configs
+
+    rows = pd.read_csv("final_cleaned_data_2.csv")
+    fitted_configs = {g: game_configs[g] for g in game_configs if g in set(rows["Game"])}
+    game_names, tree, payoffs = stack_payoffs(fitted_configs)
+    ids, targets, counts = participant_arrays(rows, game_names)
+
+    for model in ("selfish", "inequality"):
+        fit = fit_hierarchical(tree, payoffs, targets, counts, model)
+        save_posteriors(f"participant_posteriors_{model}.npz", ids, model, fit, counts)
+        prior_theta, _ = PARAMETER_TRANSFORMS[model](fit["mu"])
+        print(f"{model}: {len(ids)} participants, population parameters at the prior mean "
+              f"{ {name: round(float(v), 3) for name, v in zip(MODEL_PARAMETERS[model], prior_theta)} }")
@@ -0,0 +1,154 @@
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from compiled_game import stack_payoffs
+from level_k import MODEL_PARAMETERS, level_k_nll
+from multistart import MODEL_CONSTRAINTS, model_constraints, fit_multistart
+from trial_likelihood import TrialData
+
+"""
+Incremental refits of an append-only participant CSV (final_cleaned_data_*.csv gaining a wave of participants).
+
+IncrementalFit keeps, in a JSON state file next to the data, the per-game sufficient statistics of the rows seen so
+far (trial_likelihood.TrialData), the byte offset up to which the file was read, the file size at that update, a
+SHA-256 of the last TAIL_WINDOW bytes before the offset and the last optimum of every model. On update() the file is
+read from the offset only and the statistics of the new rows are added to the running ones, so an update costs the
+appended bytes rather than the whole file; if the file shrank or the tail checksum no longer matches (the file was
+edited rather than appended to) the statistics are rebuilt from scratch. Edits further back than the tail window are
+not detected. refit() then starts the local optimizer from the previous optimum on the updated aggregates, so a wave
+costs a few iterations; the first fit of a model is a cold fit_multistart.
+"""
+
+
+TAIL_WINDOW = 1 << 16  # Bytes before the offset covered by the append checksum
+
+
+def _sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _tail_checksum(fp, offset):
+    "SHA-256 of the TAIL_WINDOW bytes of an open binary file ending at offset"
+    start = max(0, offset - TAIL_WINDOW)
+    fp.seek(start)
+    return _sha256(fp.read(offset - start))
+
+
+class IncrementalFit:
+    "Running sufficient statistics of an append-only participant CSV and the level-k fits warm-started on them"
+    def __init__(self, data_path, game_configs, state_path=None, level=2):
+        """
+        :param data_path: Participant rows (ID, Game, ..., P1_Expectation, P2_Expectation), comma- or tab-separated.
+        :param game_configs: Configs of the games to fit (sharing one tree, see stack_payoffs).
+        :param state_path: JSON state file, data_path + ".fit_state.json" by default.
+        """
+        self.data_path = data_path
+        self.state_path = state_path or f"{data_path}.fit_state.json"
+        self.level = level
+        self.game_names, self.tree, self.payoffs = stack_payoffs(game_configs)
+        self._reset()
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as fp:
+                state = json.load(fp)
+            if state["game_names"] == self.game_names:
+                self.offset, self.checksum, self.header = state["offset"], state["checksum"], state["header"]
+                self.size = state.get("size", self.offset)
+                self.data = TrialData(self.game_names, state["counts"], state["sums"], state["sums_sq"])
+                self.fits = state["fits"]
+
+    def _reset(self):
+        self.offset, self.size, self.checksum, self.header = 0, 0, _sha256(b""), None
+        zeros = np.zeros((len(self.game_names), 2))
+        self.data = TrialData(self.game_names, zeros, zeros, zeros)
+        self.fits = {}
+
+    def update(self):
+        """
+        Add the statistics of the rows appended since the last update.
+        :return: Number of new rows (all rows when the file was rewritten and the statistics rebuilt).
+        """
+        with open(self.data_path, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if size < self.size or _tail_checksum(fp, self.offset) != self.checksum:
+                self._reset()  # Not an append: the rows already counted changed
+            fp.seek(self.offset)
+            appended = fp.read()
+            end = self.offset + appended.rfind(b"\n") + 1  # Only complete lines; a partial last row waits for the next update
+            if end <= self.offset:
+                return 0
+            chunk = appended[:end - self.offset]
+            if self.header is None:
+                header_end = chunk.find(b"\n") + 1
+                self.header, chunk = chunk[:header_end].decode(), chunk[header_end:]
+            rows = pd.read_csv(io.BytesIO(self.header.encode() + chunk), sep="\t" if "\t" in self.header else ",")
+            self.data = self.data + TrialData.from_rows(rows, self.game_names)
+            self.offset, self.size, self.checksum = end, size, _tail_checksum(fp, end)
+        self.save()
+        return len(rows)
+
+    def refit(self, model, bounds, n_starts=32, method=None):
+        """
+        Fit a model on the current statistics, from its previous optimum when there is one.
+        :return: {"params", "nll", "n_evaluations", "warm_start", "seconds"}.
+        """
+        start = time.perf_counter()
+        targets, counts = self.data.means, self.data.counts
+        previous = self.fits.get(model)
+        if previous is None:
+            fit = fit_multistart(self.tree, self.payoffs, targets, model, bounds, n_starts=n_starts, level=self.level, counts=counts)
+            params, nll = list(fit["params"].values()), fit["nll"]
+            n_evaluations = fit["timing"]["n_evaluations"]
+        else:
+            method = method or ("SLSQP" if model in MODEL_CONSTRAINTS else "L-BFGS-B")
+            objective = lambda x: level_k_nll(self.tree, self.payoffs, x, targets, model, self.level, jac=True, counts=counts)
+            result = minimize(objective, previous["params"], jac=True, bounds=bounds, method=method,
+                              constraints=model_constraints(model, len(bounds)))
+            params, nll, n_evaluations = result.x.tolist(), float(result.fun), int(result.nfev)
+        self.fits[model] = {"params": params, "nll": nll}
+        self.save()
+        return {"params": dict(zip(MODEL_PARAMETERS[model], params)), "nll": nll, "n_evaluations": n_evaluations,
+                "warm_start": previous is not None, "seconds": time.perf_counter() - start}
+
+    def save(self):
+        state = {
+            "data_path": self.data_path,
+            "game_names": self.game_names,
+            "offset": self.offset,
+            "size": self.size,
+            "checksum": self.checksum,
+            "header": self.header,
+            "counts": self.data.counts.tolist(),
+            "sums": self.data.sums.tolist(),
+            "sums_sq": self.data.sums_sq.tolist(),
+            "fits": self.fits,
+        }
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, "w") as fp:
+            json.dump(state, fp)
+        os.replace(temporary, self.state_path)
+
+
+if __name__ == "__main__":
+    from game_configs_exp2 import game_configs
+
+    BOUNDS = {
+        "selfish": [(0.01, 10), (0.01, 10)],
+        "inequality": [(0.00, 100)] * 6,  # [β1, β2, δ1, δ2, α1, α2]
+    }
+    incremental = IncrementalFit("final_cleaned_data_2.csv", game_configs)
+    print(f"{incremental.update()} new rows, {int(incremental.data.counts.sum())} responses in total")
+    for model, bounds in BOUNDS.items():
+        fit = incremental.refit(model, bounds)
+        print(f"{model}: NLL {fit['nll']:.4f} after {fit['n_evaluations']} {'warm' if fit['warm_start'] else 'cold'} evaluations "
+              f"in {fit['seconds']:.2f}s, {fit['params']}")
@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from level_k import MODEL_PARAMETERS, level_k_nll
+from multistart import MODEL_CONSTRAINTS, latin_hypercube_starts
+
+"""
+Bayesian mode for the level-k models: an affine-invariant ensemble sampler (Goodman & Weare stretch move).
+
+The walkers are split into two halves; each half is moved using the other as the complementary ensemble, so every
+proposal of a half is scored in one batched level_k_nll call (parameters as a (n_walkers / 2, k) batch).
+The prior is uniform over the bounds, restricted by the model's MODEL_CONSTRAINTS (delta >= alpha for IA), so the
+posterior is the likelihood (the same trial-level or per-game-mean NLL the MLE fits use) inside that box.
+Convergence is summarised per parameter by the split R-hat over walkers and an effective sample size from the
+walker-averaged integrated autocorrelation time. The walkers of one ensemble are not independent chains (every move
+uses the other half), so their R-hat is only a heuristic: it flags walkers that have not mixed, but a value near 1
+does not prove convergence. Comparing independent runs (different seeds) is the stronger check.
+When the walkers start around a point estimate, draws that leave the prior's support are reflected back into the
+bounds and redrawn while they break a constraint, rather than clipped: clipped walkers would share a coordinate on a
+bound face, and the stretch move cannot take walkers off a face they all share.
+"""
+
+
+def log_prior(params, bounds, model):
+    """0 inside the bounds and the model constraints, -inf outside, for a (..., k) batch of rows."""
+    bounds = np.asarray(bounds, dtype=float)
+    inside = np.all((params >= bounds[:, 0]) & (params <= bounds[:, 1]), axis=-1)
+    for i, j in MODEL_CONSTRAINTS.get(model, []):
+        inside &= params[..., i] >= params[..., j]
+    return np.where(inside, 0.0, -np.inf)
+
+
+def _log_posterior(params, tree, payoffs, targets, model, bounds, level, counts):
+    """Batched log posterior; rows outside the prior's support are never solved."""
+    log_p = log_prior(params, bounds, model)
+    inside = np.isfinite(log_p)
+    if inside.any():
+        log_p[inside] -= level_k_nll(tree, payoffs, params[inside], targets, model, level, counts=counts)
+    return log_p, int(inside.sum())
+
+
+def autocorrelation_time(chains, window=5):
+    """
+    Integrated autocorrelation time of every parameter, from the autocorrelation function averaged over chains
+    (FFT estimate, Sokal's automatic window of `window` times the running estimate).
+    :param chains: (n_steps, n_chains, k) draws.
+    :return: (k,) autocorrelation times.
+    """
+    n_steps = len(chains)
+    centred = chains - chains.mean(axis=0)
+    size = 2 ** int(np.ceil(np.log2(2 * n_steps)))
+    spectrum = np.fft.rfft(centred, n=size, axis=0)
+    acf = np.fft.irfft(spectrum * np.conjugate(spectrum), axis=0)[:n_steps]
+    acf = acf / np.where(acf[0] > 0, acf[0], 1)
+    acf = acf.mean(axis=1)  # (n_steps, k)
+    taus = 2 * np.cumsum(acf, axis=0) - 1
+    tau = np.empty(chains.shape[-1])
+    for p in range(chains.shape[-1]):
+        below = np.arange(n_steps) >= window * taus[:, p]
+        tau[p] = taus[np.argmax(below) if below.any() else -1, p]
+    return tau
+
+
+def effective_sample_size(chains):
+    """(k,) effective number of independent draws among the n_steps * n_chains draws."""
+    return chains.shape[0] * chains.shape[1] / np.maximum(autocorrelation_time(chains), 1)
+
+
+def split_rhat(chains):
+    """
+    (k,) Gelman-Rubin R-hat with every chain split into halves; values near 1 indicate mixing.
+    The chains are assumed independent; for the walkers of one ensemble it is a heuristic (see the module notes).
+    """
+    half = len(chains) // 2
+    split = np.concatenate([chains[:half], chains[half:2 * half]], axis=1)  # (half, 2 * n_chains, k)
+    within = split.var(axis=0, ddof=1).mean(axis=0)
+    between = half * split.mean(axis=0).var(axis=0, ddof=1)
+    pooled = (half - 1) / half * within + between / half
+    return np.sqrt(pooled / np.where(within > 0, within, np.inf))
+
+
+def _ball_start(x0, bounds, model, n_walkers, rng, max_tries=1000):
+    """
+    Walkers in a small ball around x0 inside the prior's support: coordinates past a bound are reflected back into
+    the bounds and walkers breaking a model constraint are redrawn, so no two walkers share a coordinate.
+    """
+    x0 = np.asarray(x0, dtype=float)
+    width = 1e-3 * np.maximum(np.abs(x0), 1e-2)
+    lower, upper = bounds[:, 0], bounds[:, 1]
+    walkers = np.empty((n_walkers, len(x0)))
+    pending = np.arange(n_walkers)
+    for _ in range(max_tries):
+        draws = x0 + width * rng.standard_normal((len(pending), len(x0)))
+        draws = lower + np.abs(draws - lower)
+        draws = upper - np.abs(upper - draws)
+        walkers[pending] = draws
+        pending = pending[~np.isfinite(log_prior(draws, bounds, model))]
+        if len(pending) == 0:
+            return walkers
+    raise ValueError(f"Could not start {n_walkers} walkers inside the support of '{model}' around x0 = {x0.tolist()}")
+
+
+def sample_posterior(tree, payoffs, targets, model, bounds, n_walkers=64, n_steps=2000, burn_in=500, x0=None,
+                     counts=1, level=2, stretch=2.0, seed=0, verbose=True):
+    """
+    Draw posterior samples of one model's parameters with the ensemble sampler.
+    :param tree, payoffs, targets: Stacked games (stack_payoffs) and their (n_games, 2) human [P(In), P(Right)].
+    :param bounds: Support of the uniform prior, in MODEL_PARAMETERS[model] order.
+    :param n_walkers: Even number of walkers, at least twice the number of parameters.
+    :param x0: Optional point estimate (e.g. the MLE) to start the walkers in a small ball around (reflected and
+               redrawn into the prior's support); otherwise they start from Latin-hypercube points over the bounds.
+    :param counts: Optional (n_games, 2) response counts for the trial-level likelihood (as in fit_multistart).
+    :param stretch: Scale a of the stretch move.
+    :return: {"chains": (n_steps - burn_in, n_walkers, k) draws, "log_posterior", "acceptance", "rhat" (heuristic
+              over the correlated walkers), "ess", "summary": DataFrame per parameter, "timing"}.
+    """
+    names = MODEL_PARAMETERS[model]
+    k = len(names)
+    if n_walkers % 2 or n_walkers < 2 * k:
+        raise ValueError(f"n_walkers must be even and at least {2 * k} for model '{model}', got {n_walkers}")
+    rng = np.random.default_rng(seed)
+    bounds = np.asarray(bounds, dtype=float)
+    args = (tree, payoffs, targets, model, bounds, level, counts)
+
+    if x0 is None:
+        walkers = latin_hypercube_starts(bounds, n_walkers, model, seed)
+    else:
+        walkers = _ball_start(x0, bounds, model, n_walkers, rng)
+    log_p, n_evaluations = _log_posterior(walkers, *args)
+
+    halves = [np.arange(0, n_walkers // 2), np.arange(n_walkers // 2, n_walkers)]
+    chains = np.empty((n_steps, n_walkers, k))
+    log_posterior = np.empty((n_steps, n_walkers))
+    accepted = np.zeros(n_walkers)
+    start = time.perf_counter()
+    for step in range(n_steps):
+        for moving, other in (halves, halves[::-1]):
+            z = ((stretch - 1) * rng.random(len(moving)) + 1) ** 2 / stretch
+            partners = walkers[rng.choice(other, len(moving))]
+            proposals = partners + z[:, None] * (walkers[moving] - partners)
+            proposal_log_p, evaluated = _log_posterior(proposals, *args)
+            n_evaluations += evaluated
+            accept = np.log(rng.random(len(moving))) < (k - 1) * np.log(z) + proposal_log_p - log_p[moving]
+            walkers[moving[accept]] = proposals[accept]
+            log_p[moving[accept]] = proposal_log_p[accept]
+            accepted[moving] += accept
+        chains[step], log_posterior[step] = walkers, log_p
+        if verbose and (step + 1) % max(1, n_steps // 10) == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{model}: step {step + 1}/{n_steps}, {n_evaluations / elapsed:.0f} likelihood evaluations/s, "
+                  f"acceptance {accepted.sum() / ((step + 1) * n_walkers):.2f}")
+    wall_seconds = time.perf_counter() - start
+
+    kept = chains[burn_in:]
+    rhat, ess = split_rhat(kept), effective_sample_size(kept)
+    draws = kept.reshape(-1, k)
+    summary = pd.DataFrame({
+        "Parameter": names,
+        "Mean": draws.mean(axis=0),
+        "SD": draws.std(axis=0, ddof=1),
+        "Lower": np.percentile(draws, 2.5, axis=0),
+        "Upper": np.percentile(draws, 97.5, axis=0),
+        "R_hat": rhat,
+        "ESS": ess,
+    })
+    return {
+        "chains": kept,
+        "log_posterior": log_posterior[burn_in:],
+        "acceptance": accepted / n_steps,
+        "rhat": rhat,
+        "ess": ess,
+        "summary": summary,
+        "timing": {
+            "n_walkers": n_walkers,
+            "n_steps": n_steps,
+            "wall_seconds": wall_seconds,
+            "n_evaluations": n_evaluations,
+            "evaluations_per_second": n_evaluations / wall_seconds,
+            "ess_per_second": float(ess.min() / wall_seconds),
+        },
+    }
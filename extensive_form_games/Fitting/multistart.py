@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+from scipy.optimize import minimize
+from scipy.stats import qmc
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from level_k import MODEL_PARAMETERS, level_k_nll
+
+"""
+Parallel multi-start global fitting driver.
+
+Instead of one minimize from a hard-coded x0, fit_multistart draws N Latin-hypercube starts inside the bounds,
+runs one local fit per start across a ProcessPoolExecutor and merges starts that converged to the same optimum.
+Each worker receives the stacked games once (through the pool initializer) and then only gets start vectors,
+so the starts are independent and the wall time scales with the number of cores.
+Objectives are the batched level_k_nll with exact gradients (jac=True). A start counts as usable when its optimizer
+reported success and its end point keeps the model constraints; unusable starts rank after every usable one, so a
+failed or infeasible run only becomes the fit when no start succeeded (with a warning).
+"""
+
+# Pairs (i, j) of parameter columns constrained to x[i] - x[j] >= 0, e.g. delta >= alpha for each IA player
+MODEL_CONSTRAINTS = {
+    "inequality": [(2, 4), (3, 5)],
+}
+CONSTRAINT_TOL = 1e-8  # Slack on x[i] - x[j] >= 0 when judging where a local fit ended
+
+_problem = {}  # The games being fitted, set once in every worker process by _init_worker
+
+
+def _init_worker(tree, payoffs, targets, model, level, counts):
+    _problem.update(tree=tree, payoffs=payoffs, targets=targets, model=model, level=level, counts=counts)
+
+
+def _objective(x):
+    p = _problem
+    return level_k_nll(p["tree"], p["payoffs"], x, p["targets"], model=p["model"], level=p["level"], jac=True, counts=p["counts"])
+
+
+def model_constraints(model, n_params):
+    """SLSQP inequality constraints for the model (built inside the worker, lambdas cannot be pickled)."""
+    constraints = []
+    for i, j in MODEL_CONSTRAINTS.get(model, []):
+        gradient = np.zeros(n_params)
+        gradient[i], gradient[j] = 1, -1
+        constraints.append({"type": "ineq", "fun": lambda x, i=i, j=j: x[i] - x[j], "jac": lambda x, g=gradient: g})
+    return constraints
+
+
+def _fit_from_start(x0, bounds, method):
+    """One local fit from x0; returns a JSON-ready record of where it ended up."""
+    start = time.perf_counter()
+    constraints = model_constraints(_problem["model"], len(x0))
+    result = minimize(_objective, x0, jac=True, bounds=bounds, constraints=constraints, method=method)
+    return {
+        "x0": [float(v) for v in x0],
+        "x": [float(v) for v in result.x],
+        "nll": float(result.fun),
+        "success": bool(result.success),
+        "feasible": satisfies_constraints(_problem["model"], result.x),
+        "message": str(result.message),
+        "n_evaluations": int(result.nfev),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def satisfies_constraints(model, x, tol=CONSTRAINT_TOL):
+    """True when x keeps every x[i] >= x[j] constraint of the model (to tol)."""
+    return all(bool(x[i] - x[j] >= -tol) for i, j in MODEL_CONSTRAINTS.get(model, []))
+
+
+def _usable(result):
+    return result["success"] and result.get("feasible", True)
+
+
+def latin_hypercube_starts(bounds, n_starts, model=None, seed=0):
+    """
+    Latin-hypercube start points spread over the bounds.
+    Starts violating the model's x[i] >= x[j] constraints are pulled onto the feasible side (x[j] = x[i]).
+    :return: (n_starts, n_params) array.
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    unit = qmc.LatinHypercube(d=len(bounds), seed=seed).random(n_starts)
+    starts = qmc.scale(unit, bounds[:, 0], bounds[:, 1])
+    for i, j in MODEL_CONSTRAINTS.get(model, []):
+        starts[:, j] = np.minimum(starts[:, j], starts[:, i])
+    return starts
+
+
+def deduplicate_optima(results, x_tol=1e-3, nll_tol=1e-6):
+    """
+    Merge local fits that converged to the same optimum, best first: usable fits (success and feasible) by NLL, then
+    the others by NLL. Two fits are the same optimum when their NLLs agree to nll_tol and every parameter agrees to x_tol
+    (relative to the parameter's magnitude when it is above 1).
+    :return: list of candidates with the best start's record plus "n_starts", the number of starts that reached it.
+    """
+    candidates = []
+    for result in sorted(results, key=lambda r: (not _usable(r), r["nll"])):
+        x = np.asarray(result["x"])
+        for candidate in candidates:
+            scale = np.maximum(np.abs(candidate["x"]), 1)
+            if _usable(result) == _usable(candidate) and abs(result["nll"] - candidate["nll"]) <= nll_tol * max(1, abs(candidate["nll"])) and \
+                    np.all(np.abs(x - candidate["x"]) <= x_tol * scale):
+                candidate["n_starts"] += 1
+                break
+        else:
+            candidates.append(dict(result, n_starts=1))
+    return candidates
+
+
+def fit_multistart(tree, payoffs, targets, model, bounds, n_starts=32, max_workers=None, seed=0, level=2, method=None, counts=1):
+    """
+    Fit one model from n_starts Latin-hypercube starts in parallel.
+    :param tree, payoffs, targets: Stacked games (stack_payoffs) and their (n_games, 2) human [P(In), P(Right)].
+    :param model: Key of level_k.MODEL_PARAMETERS; the bounds follow its column order.
+    :param max_workers: Worker processes (defaults to every core).
+    :param counts: Optional (n_games, 2) response counts; with targets = TrialData.means and counts = TrialData.counts
+                   the objective is the trial-level binomial pseudo-likelihood of the participant rows (the slider
+                   responses in [0, 1] are used as Bernoulli weights, so the NLL is not an exact likelihood for
+                   AIC / BIC).
+    :param method: scipy method; SLSQP when the model has constraints, L-BFGS-B otherwise.
+    :return: {"params": best {name: value}, "nll": best NLL, "candidates": distinct optima best first, "timing": stats}.
+    """
+    names = MODEL_PARAMETERS[model]
+    if len(bounds) != len(names):
+        raise ValueError(f"Model '{model}' has {len(names)} parameters, got {len(bounds)} bounds")
+    method = method or ("SLSQP" if model in MODEL_CONSTRAINTS else "L-BFGS-B")
+    max_workers = max_workers or os.cpu_count()
+    starts = latin_hypercube_starts(bounds, n_starts, model, seed)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(tree, payoffs, targets, model, level, counts)) as pool:
+        results = list(pool.map(_fit_from_start, starts, repeat(bounds), repeat(method)))
+    wall_seconds = time.perf_counter() - start
+
+    candidates = deduplicate_optima(results)
+    best = candidates[0]
+    if not _usable(best):
+        warnings.warn(f"{model}: no start converged to a feasible optimum; the best failed run is returned")
+    n_evaluations = sum(r["n_evaluations"] for r in results)
+    return {
+        "params": dict(zip(names, best["x"])),
+        "nll": best["nll"],
+        "candidates": candidates,
+        "timing": {
+            "n_starts": n_starts,
+            "n_workers": max_workers,
+            "method": method,
+            "wall_seconds": wall_seconds,
+            "fit_seconds": sum(r["seconds"] for r in results),  # Summed over starts; / wall_seconds is the parallel speed-up
+            "n_evaluations": n_evaluations,
+            "evaluations_per_second": n_evaluations / wall_seconds,
+        },
+    }
+
+
+def write_fitted_params(fits, file_path="fitted_params.json"):
+    """
+    Save fits in the fitted_params.json layout the simulation scripts read ({model: {param: value}}),
+    with every candidate optimum and the timing stats under the extra "fits" key.
+    :param fits: {model: fit_multistart result}.
+    """
+    output = {model: fit["params"] for model, fit in fits.items()}
+    output["fits"] = {model: {key: fit[key] for key in ("nll", "candidates", "timing")} for model, fit in fits.items()}
+    with open(file_path, "w") as fp:
+        json.dump(output, fp, indent=2)
@@ -0,0 +1,151 @@
+import sys
+import itertools
+
+import numpy as np
+import pandas as pd
+
+"""
+Regressions of the human power judgments on the power-model predictions (REU, RC, RCR, ...), for every combination
+of predictors at once.
+
+The design matrix is built once from the *_direct_results.csv files ("Relative Utility (P2 - P1)" per game) and the
+human means (power_stats_by_game*.csv). Every non-empty subset of the m predictors (2^m - 1 of them) is then fitted
+by ordinary least squares through batched normal equations: the predictors and the target are centered (which takes
+care of the intercept), the m x m Gram matrix and X'y are formed once, and each subset solves its masked copy of the
+Gram matrix (excluded predictors are replaced by identity rows with a zero right-hand side, so their coefficient is 0)
+in one stacked np.linalg.solve call. Fitted values of all subsets come out of one matrix product. A system is
+degenerate, and its coefficients and fitted values are NaN, when a selected predictor has (near-)zero variance or the
+selected predictors are collinear (condition number of their correlation matrix above MAX_CONDITION). This is judged
+system by system, so one degenerate resample never changes how the others are solved.
+Per subset: Pearson r between fitted and observed, R^2, adjusted R^2, Gaussian AIC/BIC (statsmodels convention,
+intercept counted, variance not) and the coefficients. Nothing is plotted here: the model_regressions_*.py scripts
+draw their figures from the returned fitted values in a separate, optional pass.
+"""
+
+RESULT_COLUMN = "Relative Utility (P2 - P1)"
+MAX_CONDITION = 1e10  # Correlation-matrix condition number beyond which the selected predictors count as collinear
+
+
+def load_power_predictions(files, column=RESULT_COLUMN):
+    """
+    Model predictions per game from the power-model result files.
+    :param files: {predictor label: path}, e.g. {"REU": "reu_direct_results.csv", "RC": "rc_direct_results.csv"}.
+    :return: DataFrame indexed by Game with one column per label (games missing from a file are NaN).
+    """
+    return pd.concat({label: pd.read_csv(path).set_index("Game")[column] for label, path in files.items()}, axis=1)
+
+
+def design_matrix(predictions, human, target="Mean_Power"):
+    """
+    Predictors and target on the games present in both (in the order of the human file).
+    :param predictions: load_power_predictions output.
+    :param human: DataFrame with Game and the target column (e.g. a power_stats_by_game*.csv).
+    :return: (games, X (n_games, m), y (n_games,), predictor labels).
+    """
+    human = human.set_index("Game")[target]
+    games = [game for game in human.index if game in predictions.index and predictions.loc[game].notna().all()]
+    if not games:
+        raise ValueError("No game has both a human mean and every model prediction")
+    return games, predictions.loc[games].to_numpy(dtype=float), human.loc[games].to_numpy(dtype=float), list(predictions.columns)
+
+
+def predictor_subsets(m):
+    """(2^m - 1, m) boolean masks of every non-empty predictor subset, by size and then in lexicographic order."""
+    return np.array([np.isin(np.arange(m), combo) for k in range(1, m + 1) for combo in itertools.combinations(range(m), k)],
+                    dtype=bool).reshape(-1, m)
+
+
+def subset_fits(X, y, masks, min_variance=0.0):
+    """
+    OLS coefficients and fitted values of every predictor subset, batched over any leading dimensions of X and y.
+    :param X: (..., n, m) predictors; y: (..., n) target; masks: (n_subsets, m) boolean subsets.
+    :param min_variance: Scalar or (m,) variances at or below which a selected predictor makes its system degenerate
+                         (exactly constant predictors always do).
+    :return: (coefficients (..., n_subsets, m) with 0 for excluded predictors, intercepts (..., n_subsets),
+              fitted (..., n_subsets, n)), all NaN for degenerate systems.
+    """
+    n, m = X.shape[-2:]
+    x_mean, y_mean = X.mean(axis=-2), y.mean(axis=-1)
+    Xc, yc = X - x_mean[..., None, :], y - y_mean[..., None]
+    gram = np.einsum("...ni,...nj->...ij", Xc, Xc)[..., None, :, :]
+    moment = np.einsum("...ni,...n->...i", Xc, yc)[..., None, :]
+
+    variance = np.diagonal(gram, axis1=-2, axis2=-1) / n  # (..., 1, m)
+    constant = variance <= np.maximum(min_variance, 1e-12 * np.mean(X ** 2, axis=-2)[..., None, :])
+    degenerate = np.any(masks & constant, axis=-1)  # (..., n_subsets)
+    both = masks[:, :, None] & masks[:, None, :]
+    scale = np.sqrt(np.where(masks & ~constant, variance * n, 1.0))
+    correlation = np.where(both, gram, np.eye(m)) / (scale[..., :, None] * scale[..., None, :])
+    correlation = np.where(degenerate[..., None, None], np.eye(m), correlation)
+    degenerate |= np.linalg.cond(correlation) > MAX_CONDITION
+
+    # Degenerate systems are swapped for the identity so the stacked solve never fails, then masked out
+    systems = np.where(degenerate[..., None, None], np.eye(m), np.where(both, gram, np.eye(m)))
+    rhs = np.where(masks, moment, 0.0)
+    coefficients = np.linalg.solve(systems, rhs[..., None])[..., 0]
+    coefficients = np.where(degenerate[..., None], np.nan, np.where(masks, coefficients, 0.0))
+    intercepts = y_mean[..., None] - np.einsum("...sm,...m->...s", coefficients, x_mean)
+    fitted = intercepts[..., None] + np.einsum("...sm,...nm->...sn", coefficients, X)
+    return coefficients, intercepts, fitted
+
+
+def fit_statistics(y, fitted, k):
+    """
+    Pearson r, R^2, adjusted R^2 and Gaussian log-likelihood of fitted values, batched like subset_fits.
+    :param y: (..., n) target; fitted: (..., n_subsets, n); k: (n_subsets,) number of predictors.
+    """
+    n = y.shape[-1]
+    yc = y - y.mean(axis=-1, keepdims=True)
+    rss = np.sum((y[..., None, :] - fitted) ** 2, axis=-1)
+    tss = np.sum(yc ** 2, axis=-1)[..., None]
+    fitted_c = fitted - fitted.mean(axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.einsum("...sn,...n->...s", fitted_c, yc) / np.sqrt(np.sum(fitted_c ** 2, axis=-1) * tss)
+        r2 = 1 - rss / tss
+        adjusted_r2 = 1 - (1 - r2) * (n - 1) / (n - k - 1)
+        log_likelihood = -n / 2 * (np.log(2 * np.pi * rss / n) + 1)
+    return r, r2, adjusted_r2, log_likelihood
+
+
+def combination_names(names, masks):
+    return [" + ".join(np.asarray(names)[mask]) for mask in masks]
+
+
+def subset_regressions(X, y, names, masks=None):
+    """
+    OLS of y on every predictor subset in one batched solve.
+    :param X: (n, m) predictors; y: (n,) target; names: m predictor labels.
+    :param masks: Optional (n_subsets, m) boolean subsets, every non-empty subset by default.
+    :return: {"table": DataFrame (Combination, Predictors, r, R2, Adjusted_R2, AIC, BIC, Intercept, one column per
+              predictor coefficient), "coefficients": (n_subsets, m), "intercepts", "fitted": (n_subsets, n), "masks"}.
+    """
+    X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+    n, m = X.shape
+    masks = predictor_subsets(m) if masks is None else np.asarray(masks, dtype=bool)
+    coefficients, intercepts, fitted = subset_fits(X, y, masks)
+    k = masks.sum(axis=1)
+    r, r2, adjusted_r2, log_likelihood = fit_statistics(y, fitted, k)
+    table = pd.DataFrame({
+        "Combination": combination_names(names, masks),
+        "Predictors": k,
+        "r": r,
+        "R2": r2,
+        "Adjusted_R2": adjusted_r2,
+        "AIC": -2 * log_likelihood + 2 * (k + 1),
+        "BIC": -2 * log_likelihood + np.log(n) * (k + 1),
+        "Intercept": intercepts,
+    })
+    for j, name in enumerate(names):
+        table[name] = np.where(masks[:, j], coefficients[:, j], np.nan)
+    return {"table": table, "coefficients": coefficients, "intercepts": intercepts, "fitted": fitted, "masks": masks}
+
+
+if __name__ == "__main__":
+    # python power_regressions.py power_stats_by_game.csv [output.csv]
+    predictions = load_power_predictions({"REU": "reu_direct_results.csv", "RC": "rc_direct_results.csv",
+                                          "RCR": "rcr_direct_results.csv"})
+    games, X, y, names = design_matrix(predictions, pd.read_csv(sys.argv[1]))
+    table = subset_regressions(X, y, names)["table"]
+    print(table.to_string(index=False))
+    if len(sys.argv) > 2:
+        table.to_csv(sys.argv[2], index=False)
@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from scipy.optimize import minimize
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from level_k import MODEL_PARAMETERS, level_k_nll
+from multistart import MODEL_CONSTRAINTS
+
+"""
+Likelihood surfaces and profile likelihoods of the level-k fits.
+
+nll_surface evaluates the summed NLL over a dense 2-D grid of two parameters with the others held at a point
+estimate; each grid row is one batched level_k_nll call.
+profile_likelihood re-optimizes the other (nuisance) parameters at every grid point. Grid rows are spread over a
+ProcessPoolExecutor and, inside a row, all columns are first solved together as one bound-constrained L-BFGS-B
+problem: their parameter rows go through one batched level_k_nll call and the objective is the sum of the
+(independent) column NLLs. The stopping tests of that joint problem act on the sum, so every column is then polished
+by its own L-BFGS-B run from the joint solution. The model constraints x[i] >= x[j] (delta >= alpha for IA) are
+turned into bounds, so no SLSQP is needed:
+    - both free: x[j] = s * x[i] with s in [0, 1],
+    - one fixed by the grid: a bound on the other,
+    - both fixed: the grid point is infeasible and its NLL is NaN.
+Workers write their rows straight into .npy memory maps (<prefix>_nll.npy, <prefix>_params.npy), so nothing is held
+in memory and finished rows can be inspected while a run is going; plot_surface renders a heatmap afterwards.
+"""
+
+FEASIBILITY_TOL = 1e-9  # Slack on x[i] >= x[j] for fixed values (optimizers return alpha a hair above delta = 0)
+
+_problem = {}  # The games, the data and the profile settings, set once in every worker process by _init_worker
+
+
+def _init_worker(tree, payoffs, targets, counts, model, level, x_hat, bounds, fixed, nll_path, params_path):
+    _problem.update(tree=tree, payoffs=payoffs, targets=targets, counts=counts, model=model, level=level,
+                    x_hat=np.asarray(x_hat, dtype=float), bounds=np.asarray(bounds, dtype=float), fixed=list(fixed),
+                    nll=open_memmap(nll_path, mode="r+"), params=open_memmap(params_path, mode="r+"))
+
+
+def _profile_row(row, fixed_values):
+    """
+    Profile one grid row: fixed_values is (n_columns, n_fixed), the values of the fixed parameters at every column.
+    The nuisance parameters of all columns are optimized jointly (independent problems summed) from the point estimate,
+    then every column is polished on its own.
+    """
+    p = _problem
+    k = len(p["x_hat"])
+    fixed = p["fixed"]
+    free = [a for a in range(k) if a not in fixed]
+    n_columns = len(fixed_values)
+    position = {a: f for f, a in enumerate(free)}
+
+    theta0 = np.tile(p["x_hat"], (n_columns, 1))
+    theta0[:, fixed] = fixed_values
+    lower = np.tile(p["bounds"][free, 0], (n_columns, 1))
+    upper = np.tile(p["bounds"][free, 1], (n_columns, 1))
+    feasible = np.ones(n_columns, dtype=bool)
+    ratios = []  # (i, j) with both free: the variable of j is s = x[j] / x[i]
+    for i, j in MODEL_CONSTRAINTS.get(p["model"], []):
+        if i in position and j in position:
+            ratios.append((i, j))
+            lower[:, position[j]], upper[:, position[j]] = 0, 1
+        elif j in position:
+            upper[:, position[j]] = np.minimum(upper[:, position[j]], theta0[:, i])
+        elif i in position:
+            lower[:, position[i]] = np.maximum(lower[:, position[i]], theta0[:, j])
+        else:
+            feasible &= theta0[:, i] >= theta0[:, j] - FEASIBILITY_TOL
+    feasible &= np.all(lower <= upper, axis=1)
+    upper = np.where(feasible[:, None], upper, lower)  # Infeasible columns are pinned and masked out
+
+    def to_params(z, columns):
+        theta = theta0[columns].copy()
+        theta[:, free] = z
+        for i, j in ratios:
+            theta[:, j] = z[:, position[j]] * theta[:, i]
+        return theta
+
+    def objective(flat, columns):
+        z = flat.reshape(len(columns), len(free))
+        theta = to_params(z, columns)
+        nll, gradient = level_k_nll(p["tree"], p["payoffs"], theta, p["targets"], p["model"], p["level"], jac=True, counts=p["counts"])
+        nll, gradient = np.where(feasible[columns], nll, 0.0), np.where(feasible[columns, None], gradient, 0.0)
+        d_z = gradient[:, free]
+        for i, j in ratios:
+            d_z[:, position[j]] = gradient[:, j] * theta[:, i]
+            d_z[:, position[i]] += gradient[:, j] * z[:, position[j]]
+        return nll.sum(), d_z.ravel()
+
+    def solve(z_start, columns):
+        return minimize(objective, z_start.ravel(), args=(columns,), jac=True, method="L-BFGS-B",
+                        bounds=list(zip(lower[columns].ravel(), upper[columns].ravel())),
+                        options={"ftol": 1e-12, "gtol": 1e-7, "maxiter": 5000})
+
+    z0 = theta0[:, free].copy()
+    for i, j in ratios:
+        z0[:, position[j]] = np.divide(theta0[:, j], theta0[:, i], out=np.full(n_columns, 0.5), where=theta0[:, i] > 0)
+    z0 = np.clip(z0, lower, upper)
+    every = np.arange(n_columns)
+    result = solve(z0, every)
+    z, n_evaluations = result.x.reshape(n_columns, len(free)), int(result.nfev)
+    # The joint stopping tests act on the summed NLL, so polish every column on its own from the joint solution
+    for c in np.flatnonzero(feasible):
+        polished = solve(z[c:c + 1], np.array([c]))
+        z[c], n_evaluations = polished.x, n_evaluations + int(polished.nfev)
+    theta = to_params(z, every)
+    nll = level_k_nll(p["tree"], p["payoffs"], theta, p["targets"], p["model"], p["level"], counts=p["counts"])
+    p["nll"][row] = np.where(feasible, nll, np.nan)
+    p["params"][row] = theta
+    p["nll"].flush()
+    p["params"].flush()
+    return row, n_evaluations
+
+
+def profile_likelihood(tree, payoffs, targets, model, x_hat, bounds, names, grids, prefix, counts=1, level=2,
+                       max_workers=None, verbose=True):
+    """
+    Profile NLL over a 1-D or 2-D grid of fixed parameters, re-optimizing all the others at every grid point.
+    :param x_hat: Point estimate (e.g. the multistart optimum), the start of every nuisance optimization.
+    :param names: One or two parameter names of MODEL_PARAMETERS[model] to fix, e.g. ["delta_player1", "alpha_player1"].
+    :param grids: Their grid values; the first parameter indexes rows (one process-pool task per row).
+    :param prefix: Output prefix of the memory maps <prefix>_nll.npy (n_rows, n_columns) and <prefix>_params.npy.
+    :return: {"nll", "params" (read-only memory maps), "grids", "names", "timing"}.
+    """
+    parameters = MODEL_PARAMETERS[model]
+    fixed = [parameters.index(name) for name in names]
+    grids = [np.asarray(grid, dtype=float) for grid in grids]
+    if len(grids) == 1:
+        rows = [grids[0][:, None]]  # A 1-D profile is a single row
+    else:
+        rows = [np.column_stack([np.full(len(grids[1]), value), grids[1]]) for value in grids[0]]
+    nll_path, params_path = f"{prefix}_nll.npy", f"{prefix}_params.npy"
+    shape = (len(rows), len(rows[0]))
+    open_memmap(nll_path, mode="w+", dtype=float, shape=shape)[:] = np.nan
+    open_memmap(params_path, mode="w+", dtype=float, shape=shape + (len(parameters),))[:] = np.nan
+
+    counts = np.broadcast_to(np.asarray(counts, dtype=float), np.shape(targets))
+    start = time.perf_counter()
+    n_evaluations = 0
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(tree, payoffs, targets, counts, model, level, x_hat, bounds, fixed, nll_path, params_path)) as pool:
+        futures = [pool.submit(_profile_row, r, values) for r, values in enumerate(rows)]
+        for done, future in enumerate(as_completed(futures), 1):
+            n_evaluations += future.result()[1]
+            if verbose and (done % max(1, len(rows) // 10) == 0 or done == len(rows)):
+                elapsed = time.perf_counter() - start
+                print(f"{' x '.join(names)}: {done}/{len(rows)} rows, {done * shape[1] / elapsed:.0f} grid points/s")
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        "nll": np.load(nll_path, mmap_mode="r"),
+        "params": np.load(params_path, mmap_mode="r"),
+        "grids": grids,
+        "names": list(names),
+        "timing": {"n_points": shape[0] * shape[1], "wall_seconds": wall_seconds, "n_evaluations": n_evaluations,
+                   "points_per_second": shape[0] * shape[1] / wall_seconds},
+    }
+
+
+def nll_surface(tree, payoffs, targets, model, x_hat, names, grids, counts=1, level=2):
+    """
+    Summed NLL over a 2-D grid of two parameters with the others held at x_hat (no re-optimization).
+    :return: (len(grids[0]), len(grids[1])) array; points violating the model constraints are NaN.
+    """
+    parameters = MODEL_PARAMETERS[model]
+    i, j = (parameters.index(name) for name in names)
+    surface = np.empty((len(grids[0]), len(grids[1])))
+    for r, value in enumerate(grids[0]):
+        params = np.tile(np.asarray(x_hat, dtype=float), (len(grids[1]), 1))
+        params[:, i], params[:, j] = value, grids[1]
+        feasible = np.ones(len(params), dtype=bool)
+        for a, b in MODEL_CONSTRAINTS.get(model, []):
+            feasible &= params[:, a] >= params[:, b] - FEASIBILITY_TOL
+        surface[r] = np.where(feasible, level_k_nll(tree, payoffs, params, targets, model, level, counts=counts), np.nan)
+    return surface
+
+
+def plot_surface(nll, grids, names, title="", file_path=None, levels=(1.0, 3.0, 4.6)):
+    """
+    Heatmap of NLL - min(NLL) over a 2-D grid, with contours at the given NLL differences
+    (3.0 is the 95% region for two parameters, i.e. chi2(2) / 2).
+    """
+    import matplotlib.pyplot as plt
+
+    delta = np.asarray(nll) - np.nanmin(nll)
+    fig, ax = plt.subplots(figsize=(7, 6))
+    mesh = ax.pcolormesh(grids[1], grids[0], delta, shading="auto", cmap="viridis_r", vmax=np.nanpercentile(delta, 95))
+    ax.contour(grids[1], grids[0], delta, levels=list(levels), colors="white", linewidths=0.8)
+    row, column = np.unravel_index(np.nanargmin(nll), np.shape(nll))
+    ax.plot(grids[1][column], grids[0][row], "r*", markersize=12)
+    fig.colorbar(mesh, ax=ax, label="NLL - min NLL")
+    ax.set_xlabel(names[1])
+    ax.set_ylabel(names[0])
+    ax.set_title(title)
+    fig.tight_layout()
+    if file_path:
+        fig.savefig(file_path, dpi=150)
+        plt.close(fig)
+    return fig
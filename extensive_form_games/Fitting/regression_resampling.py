@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from power_regressions import (combination_names, design_matrix, fit_statistics, load_power_predictions,
+                               predictor_subsets, subset_fits, subset_regressions)
+
+"""
+Resampling significance of the power-model regressions (power_regressions.subset_regressions) for every predictor
+combination at once.
+
+    - Permutation null: the human means are shuffled across games, breaking any link to the model predictions;
+      the p-value of a combination is (1 + #{permuted R^2 >= observed R^2}) / (1 + n_permutations).
+    - Game bootstrap: games are resampled with replacement and every combination is refitted; percentile
+      intervals are reported for r, adjusted R^2 and every coefficient. With ten-odd games many resamples repeat a
+      few games, so a selected predictor can be (nearly) constant in a resample; such a resample would give huge
+      coefficients, so it is dropped for the combinations that select that predictor (subset_fits flags it, per
+      resample and per combination) and the number dropped is reported with the intervals.
+Both reuse the design matrix and run as batched matrix operations: a block of resamples is one (n_resamples, n, m)
+stack solved for all subsets by subset_fits. Blocks get their own seeds (SeedSequence.spawn) and run in a
+ProcessPoolExecutor, so the results depend on the seed and block_size but not on the number of workers.
+"""
+
+_problem = {}  # The design matrix and subsets, set once in every worker process by _init_worker
+
+
+def _init_worker(X, y, masks, min_variance):
+    _problem.update(X=X, y=y, masks=masks, min_variance=min_variance)
+
+
+def _resample_block(seed, n_resamples, kind):
+    """One block of permutations or bootstrap resamples; returns (r, R^2, adjusted R^2, coefficients) per resample."""
+    p = _problem
+    rng = np.random.default_rng(seed)
+    X, y, masks = p["X"], p["y"], p["masks"]
+    if kind == "permutation":
+        X_resampled = np.broadcast_to(X, (n_resamples,) + X.shape)
+        y_resampled = rng.permuted(np.tile(y, (n_resamples, 1)), axis=1)
+    else:
+        games = rng.integers(len(y), size=(n_resamples, len(y)))
+        X_resampled, y_resampled = X[games], y[games]
+    coefficients, _, fitted = subset_fits(X_resampled, y_resampled, masks, p["min_variance"])
+    r, r2, adjusted_r2, _ = fit_statistics(y_resampled, fitted, masks.sum(axis=1))
+    return r, r2, adjusted_r2, coefficients
+
+
+def _run(kind, n_resamples, seed_sequence, block_size, pool, verbose):
+    sizes = [min(block_size, n_resamples - start) for start in range(0, n_resamples, block_size)]
+    seeds = seed_sequence.spawn(len(sizes))
+    start = time.perf_counter()
+    blocks, done = [None] * len(sizes), 0
+    futures = {pool.submit(_resample_block, s, n, kind): b for b, (s, n) in enumerate(zip(seeds, sizes))}
+    for future in as_completed(futures):
+        blocks[futures[future]] = future.result()
+        done += sizes[futures[future]]
+        if verbose:
+            print(f"{kind}: {done}/{n_resamples} resamples, {done / (time.perf_counter() - start):.0f} resamples/s")
+    return [np.concatenate([block[i] for block in blocks]) for i in range(4)]
+
+
+def resample_regressions(X, y, names, masks=None, n_permutations=10_000, n_bootstrap=10_000, alpha=0.05,
+                         max_workers=None, seed=0, block_size=2_000, min_variance_ratio=0.05, verbose=True):
+    """
+    Permutation p-values and game-bootstrap intervals of every predictor combination.
+    :param X: (n, m) predictors; y: (n,) target; names: m predictor labels (see power_regressions.design_matrix).
+    :param masks: Optional (n_subsets, m) boolean subsets, every non-empty subset by default.
+    :param block_size: Resamples per process-pool task.
+    :param min_variance_ratio: A bootstrap resample is dropped for a combination when one of its predictors has less
+                               than this fraction of its full-sample variance in the resample.
+    :return: {"table": DataFrame (Combination, r, Adjusted_R2, P_Permutation, r_Lower/Upper, Adjusted_R2_Lower/Upper,
+              <name>_Lower/<name>_Upper for each predictor, N_Dropped bootstrap resamples), "permutation_r2":
+              (n_permutations, n_subsets), "bootstrap": {"r", "adjusted_r2", "coefficients" (NaN where dropped),
+              "dropped": (n_bootstrap, n_subsets) boolean}, "timing"}.
+    """
+    X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+    masks = predictor_subsets(X.shape[1]) if masks is None else np.asarray(masks, dtype=bool)
+    observed = subset_regressions(X, y, names, masks)["table"]
+    seeds = np.random.SeedSequence(seed).spawn(2)
+
+    start = time.perf_counter()
+    min_variance = min_variance_ratio * X.var(axis=0)
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(X, y, masks, min_variance)) as pool:
+        permutation = _run("permutation", n_permutations, seeds[0], block_size, pool, verbose)
+        bootstrap = _run("bootstrap", n_bootstrap, seeds[1], block_size, pool, verbose)
+    wall_seconds = time.perf_counter() - start
+
+    permutation_r2 = permutation[1]
+    dropped = np.isnan(bootstrap[3]).any(axis=-1)
+    exceed = np.sum(permutation_r2 >= observed["R2"].to_numpy() - 1e-12, axis=0)
+    lower, upper = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    table = pd.DataFrame({
+        "Combination": combination_names(names, masks),
+        "r": observed["r"],
+        "Adjusted_R2": observed["Adjusted_R2"],
+        "P_Permutation": (1 + exceed) / (1 + n_permutations),
+        "r_Lower": np.nanpercentile(bootstrap[0], lower, axis=0),
+        "r_Upper": np.nanpercentile(bootstrap[0], upper, axis=0),
+        "Adjusted_R2_Lower": np.nanpercentile(bootstrap[2], lower, axis=0),
+        "Adjusted_R2_Upper": np.nanpercentile(bootstrap[2], upper, axis=0),
+    })
+    for j, name in enumerate(names):
+        table[f"{name}_Lower"] = np.where(masks[:, j], np.nanpercentile(bootstrap[3][..., j], lower, axis=0), np.nan)
+        table[f"{name}_Upper"] = np.where(masks[:, j], np.nanpercentile(bootstrap[3][..., j], upper, axis=0), np.nan)
+    table["N_Dropped"] = dropped.sum(axis=0)
+    return {
+        "table": table,
+        "permutation_r2": permutation_r2,
+        "bootstrap": {"r": bootstrap[0], "adjusted_r2": bootstrap[2], "coefficients": bootstrap[3], "dropped": dropped},
+        "timing": {
+            "n_resamples": n_permutations + n_bootstrap,
+            "n_workers": max_workers or os.cpu_count(),
+            "wall_seconds": wall_seconds,
+            "resamples_per_second": (n_permutations + n_bootstrap) / wall_seconds,
+        },
+    }
+
+
+if __name__ == "__main__":
+    # python regression_resampling.py power_stats_by_game.csv [output.csv]
+    predictions = load_power_predictions({"REU": "reu_direct_results.csv", "RCR": "rcr_direct_results.csv",
+                                          "RC": "rc_direct_results.csv"})
+    games, X, y, names = design_matrix(predictions, pd.read_csv(sys.argv[1]))
+    resampled = resample_regressions(X, y, names)
+    print(resampled["table"].to_string(index=False))
+    print(f"{resampled['timing']['resamples_per_second']:.0f} resamples/s")
+    if len(sys.argv) > 2:
+        resampled["table"].to_csv(sys.argv[2], index=False)
@@ -0,0 +1,106 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+"""
+Streaming summaries of participant CSVs.
+
+summarize_participants reads a participant x game export (ID, Game, Power, P1_Expectation, P2_Expectation; comma- or
+tab-separated) in chunks and keeps only a running count, mean and sum of squared deviations per game and column,
+merged chunk by chunk with the pairwise (Chan et al.) update, so memory is bounded by the number of games rather
+than the number of rows. The result has the layout of the *_summary_stats.csv files:
+    Game, Mean_Power, SD_Power, Mean_P1_Expectation, SD_P1_Expectation, Mean_P2_Expectation, SD_P2_Expectation
+with games sorted by name, SDs with ddof=1 and the expectations rescaled from the 0-100 slider to [0, 1].
+power_stats and human_probs_from_summary turn it into the power_stats_by_game_*.csv and human_probs shapes.
+"""
+
+SUMMARY_COLUMNS = ("Power", "P1_Expectation", "P2_Expectation")
+SCALES = {"Power": 1, "P1_Expectation": 100, "P2_Expectation": 100}  # Divisors applied to the means and SDs
+
+
+def _separator(file_path):
+    with open(file_path, newline="") as fp:
+        header = fp.readline()
+    return "\t" if "\t" in header else ","
+
+
+def _merge(total, chunk):
+    """Pairwise merge of two (count, mean, m2) frames indexed by game."""
+    if total is None:
+        return chunk
+    index = total[0].index.union(chunk[0].index)
+    n_a, mean_a, m2_a = (frame.reindex(index, fill_value=0.0) for frame in total)
+    n_b, mean_b, m2_b = (frame.reindex(index, fill_value=0.0) for frame in chunk)
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    weight = (n_b / n.where(n > 0, 1))
+    return n, mean_a + delta * weight, m2_a + m2_b + delta ** 2 * n_a * weight
+
+
+def summarize_participants(file_path, columns=SUMMARY_COLUMNS, chunksize=100_000, with_counts=False,
+                           exclude_ids=None, query=None):
+    """
+    Per-game mean and SD of the participant responses, read in chunks of chunksize rows.
+    :param with_counts: Also add an N_<column> column with the number of non-missing responses.
+    :param exclude_ids: Participant IDs whose rows are dropped.
+    :param query: Optional pandas query string a row must satisfy to be counted (e.g. "Power >= 0").
+    :return: DataFrame in the *_summary_stats.csv layout.
+    """
+    columns = list(columns)
+    usecols = None if query else ["Game"] + columns + (["ID"] if exclude_ids else [])
+    total = None
+    for chunk in pd.read_csv(file_path, sep=_separator(file_path), usecols=usecols, chunksize=chunksize):
+        if exclude_ids:
+            chunk = chunk[~chunk["ID"].isin(exclude_ids)]
+        if query:
+            chunk = chunk.query(query)
+        groups = chunk.groupby("Game")[columns]
+        n = groups.count().astype(float)
+        mean = groups.mean().fillna(0.0)
+        total = _merge(total, (n, mean, groups.var(ddof=0).fillna(0.0) * n))
+    n, mean, m2 = total
+    sd = np.sqrt(m2 / (n - 1).where(n > 1, np.nan))
+
+    summary = pd.DataFrame({"Game": n.index})
+    for column in columns:
+        scale = SCALES.get(column, 1)
+        summary[f"Mean_{column}"] = (mean[column] / scale).where(n[column] > 0).to_numpy()
+        summary[f"SD_{column}"] = (sd[column] / scale).to_numpy()
+        if with_counts:
+            summary[f"N_{column}"] = n[column].astype(int).to_numpy()
+    return summary
+
+
+def power_stats(summary):
+    """The power_stats_by_game_*.csv layout (Game, Mean_Power, SD_Power) of a summary."""
+    return summary[["Game", "Mean_Power", "SD_Power"]]
+
+
+def human_probs_from_summary(summary):
+    """{game: {"p_in", "p_right"}} from the mean expectations of a summary, as the fitting scripts use."""
+    required = ["Game", "Mean_P1_Expectation", "Mean_P2_Expectation"]
+    if not all(col in summary.columns for col in required):
+        raise ValueError(f"Summary is missing one of {required}")
+    return {game: {"p_in": p_in, "p_right": p_right}
+            for game, p_in, p_right in zip(summary["Game"], summary["Mean_P1_Expectation"], summary["Mean_P2_Expectation"])}
+
+
+def load_human_probs(file_path, chunksize=100_000):
+    """human_probs from either a *_summary_stats.csv file or a raw participant export (streamed)."""
+    with open(file_path, newline="") as fp:
+        header = fp.readline()
+    if "Mean_P1_Expectation" in header:
+        return human_probs_from_summary(pd.read_csv(file_path, sep=_separator(file_path)))
+    return human_probs_from_summary(summarize_participants(file_path, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    # python streaming.py participants.csv [summary_stats.csv [power_stats.csv]]
+    summary = summarize_participants(sys.argv[1])
+    if len(sys.argv) > 2:
+        summary.to_csv(sys.argv[2], index=False)
+    else:
+        print(summary.to_string(index=False))
+    if len(sys.argv) > 3:
+        power_stats(summary).to_csv(sys.argv[3], index=False)
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import hashlib
+import importlib
+
+import numpy as np
+import pandas as pd
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from fit_cache import config_hash, data_hash
+from streaming import power_stats, summarize_participants
+
+"""
+Regenerates the per-game summary artifacts (power_stats_by_game*.csv, *_summary_stats.csv) from the participant rows.
+
+SOURCES names the participant files with their optional exclusion filters (exclude_ids, query), and SUMMARIES lists
+every output: the sources it draws on, the games it keeps (a game_configs module, or None for every game in the
+sources) and its layout ("summary": Mean/SD/N of Power and both expectations; "power": Game, Mean_Power, SD_Power).
+regenerate_summaries summarises each needed source once (streaming.summarize_participants, chunked groupby) and writes
+every output from those summaries. summary_manifest.json (a local file, not tracked) records the hash of each output's
+sources, spec and game configs; an output whose inputs are unchanged since it was written is skipped, and a source is
+not read at all when nothing needs it. A file whose regenerated table matches its current contents is never rewritten
+(so the committed artifacts keep their formatting) and is only recorded in the manifest. An existing file with no
+manifest entry that would change was not written here, so it is kept and reported as a conflict (force=True
+overwrites it).
+With the sources below, the exp1 / exp2 / training artifacts are reproduced exactly from training_data_2.csv; the
+exp3 and full artifacts are not (final_cleaned_data_exp3_choice_3.csv is not the file they were made from), so the
+committed versions are kept.
+"""
+
+SOURCES = {
+    "training": {"path": "training_data_2.csv"},
+    "exp2_cleaned_1": {"path": "final_cleaned_data_1.csv"},
+    "exp2_cleaned_2": {"path": "final_cleaned_data_2.csv"},
+    "exp3_choice": {"path": "final_cleaned_data_exp3_choice_3.csv"},
+}
+
+SUMMARIES = {
+    "training_data_2_summary_stats.csv": {"sources": ["training"], "games": None, "layout": "summary"},
+    "exp1_summary_stats.csv": {"sources": ["training"], "games": "game_configs_exp1", "layout": "summary"},
+    "power_stats_by_game_exp1_pilot.csv": {"sources": ["training"], "games": "game_configs_exp1", "layout": "power"},
+    "power_stats_by_game.csv": {"sources": ["training"], "games": "game_configs_exp2", "layout": "power"},
+    "power_stats_by_game_exp2.csv": {"sources": ["training"], "games": "game_configs_exp2", "layout": "power"},
+    "final_cleaned_data_1_summary_stats.csv": {"sources": ["exp2_cleaned_1"], "games": None, "layout": "summary"},
+    "final_cleaned_data_2_summary_stats.csv": {"sources": ["exp2_cleaned_2"], "games": None, "layout": "summary"},
+    "exp3_summary_stats.csv": {"sources": ["exp3_choice"], "games": "game_configs_exp3", "layout": "summary"},
+    "power_stats_by_game_exp3_choice.csv": {"sources": ["exp3_choice"], "games": "game_configs_exp3", "layout": "power"},
+    "power_stats_by_game_full.csv": {"sources": ["training", "exp3_choice"], "games": "game_configs_full", "layout": "power"},
+}
+
+
+def _output_hash(spec, sources, source_hashes):
+    content = {"spec": spec, "sources": {name: [sources[name], source_hashes[name]] for name in spec["sources"]}}
+    if spec["games"] is not None:  # The games kept, not just the name of the module listing them
+        content["games"] = config_hash(importlib.import_module(spec["games"]).game_configs)
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def _same_table(existing_path, table, rtol=1e-9):
+    """True when every column of the existing file is reproduced by the table (which may add N_* columns)."""
+    existing = pd.read_csv(existing_path)
+    if not set(existing.columns) <= set(table.columns) or len(existing) != len(table):
+        return False
+    table = table.reset_index(drop=True)
+    for column in existing.columns:
+        if pd.api.types.is_numeric_dtype(table[column]):
+            if not np.allclose(existing[column].to_numpy(dtype=float), table[column].to_numpy(dtype=float), rtol=rtol, equal_nan=True):
+                return False
+        elif not (existing[column].astype(str) == table[column].astype(str)).all():
+            return False
+    return True
+
+
+def regenerate_summaries(summaries=SUMMARIES, sources=SOURCES, data_dir=".", output_dir=".",
+                         manifest_path=None, force=False):
+    """
+    Write every summary whose sources or spec changed since the last run.
+    :param data_dir: Directory of the source files; outputs go to output_dir.
+    :param force: Rewrite every output, including existing files the manifest does not know that would change.
+    :return: {output: "written", "unchanged" (inputs or contents unchanged, file untouched) or "conflict" (an unmanaged
+              existing file that differs, left as is)}.
+    """
+    manifest_path = manifest_path or os.path.join(output_dir, "summary_manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as fp:
+            manifest = json.load(fp)
+
+    needed = {name for spec in summaries.values() for name in spec["sources"]}
+    source_hashes = {name: data_hash(os.path.join(data_dir, sources[name]["path"])) for name in needed}
+    stale = {output: _output_hash(spec, sources, source_hashes) for output, spec in summaries.items()}
+    stale = {output: key for output, key in stale.items()
+             if force or manifest.get(output) != key or not os.path.exists(os.path.join(output_dir, output))}
+
+    tables = {}
+    for name in sorted({name for output in stale for name in summaries[output]["sources"]}):
+        source = sources[name]
+        tables[name] = summarize_participants(os.path.join(data_dir, source["path"]), with_counts=True,
+                                              exclude_ids=source.get("exclude_ids"), query=source.get("query"))
+
+    status = {}
+    for output, spec in summaries.items():
+        if output not in stale:
+            status[output] = "unchanged"
+            continue
+        summary = pd.concat([tables[name] for name in spec["sources"]])
+        if spec["games"] is not None:
+            summary = summary[summary["Game"].isin(list(importlib.import_module(spec["games"]).game_configs))]
+        summary = summary.drop_duplicates("Game").sort_values("Game")  # A game in several sources keeps the first
+        summary = power_stats(summary) if spec["layout"] == "power" else summary
+        path = os.path.join(output_dir, output)
+        if os.path.exists(path) and _same_table(path, summary):
+            manifest[output] = stale[output]
+            status[output] = "unchanged"
+            continue
+        if not force and output not in manifest and os.path.exists(path):
+            status[output] = "conflict"
+            continue
+        summary.to_csv(path, index=False)
+        manifest[output] = stale[output]
+        status[output] = "written"
+
+    with open(manifest_path, "w") as fp:
+        json.dump(manifest, fp, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    for output, state in regenerate_summaries(force="--force" in sys.argv).items():
+        print(f"{output}: {state}")
@@ -0,0 +1,125 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Get the project root by going up two levels
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Games"))
+
+from level_k import level_k_log_predictions, log_binary_nll
+
+"""
+Trial-level likelihood engine.
+
+The fits used to collapse final_cleaned_data_*.csv / training_data_2.csv into per-game means and score the model
+with a binary cross-entropy on those means. Here the raw participant x game rows (ID, Game, Power, P1_Expectation,
+P2_Expectation) are reduced once into per-game sufficient statistics held in (n_games, 2) arrays:
+    - counts: number of responses for [P(In), P(Right)] in each game
+    - sums: sum of the responses (rescaled to [0, 1])
+    - sums_sq: sum of the squared responses
+Every likelihood below is a closed-form function of those statistics, so a call costs O(n_games) however many
+participants there are:
+    - "bernoulli": each response y is the weight of a Bernoulli observation, sum_i y log p + (1 - y) log(1 - p)
+                   = S log p + (n - S) log(1 - p). The responses are sliders in [0, 1], not binary choices, so this
+                   is a binomial pseudo-likelihood: its optimum is consistent but its value is not a likelihood
+                   to plug into AIC / BIC.
+    - "gaussian": y ~ Normal(p, sigma^2) with sigma profiled out per choice, using RSS = SS - 2 p S + n p^2
+"""
+
+RESPONSE_COLUMNS = ("P1_Expectation", "P2_Expectation")  # Responses for P(In) and P(Right), on a 0-100 slider
+
+
+class TrialData:
+    "Per-game sufficient statistics of the participant responses, aligned with a list of game names"
+    def __init__(self, game_names, counts, sums, sums_sq):
+        """
+        :param game_names: Games in the order of the rows (the order of stack_payoffs).
+        :param counts, sums, sums_sq: (n_games, 2) statistics of the [P(In), P(Right)] responses.
+        """
+        self.game_names = list(game_names)
+        self.counts = np.asarray(counts, dtype=float)
+        self.sums = np.asarray(sums, dtype=float)
+        self.sums_sq = np.asarray(sums_sq, dtype=float)
+
+    @classmethod
+    def from_rows(cls, rows, game_names, columns=RESPONSE_COLUMNS, scale=100):
+        """
+        Reduce participant rows to sufficient statistics with one bincount per statistic (no Python loop over rows).
+        Rows for games not in game_names are ignored, and missing responses are not counted.
+        :param rows: DataFrame with a Game column and the response columns.
+        :param scale: Responses are divided by this to land in [0, 1].
+        """
+        game_index = pd.Index(list(game_names)).get_indexer(rows["Game"])
+        keep = game_index >= 0
+        game_index = game_index[keep]
+        responses = rows.loc[keep, list(columns)].to_numpy(dtype=float) / scale
+        observed = ~np.isnan(responses)
+        responses = np.where(observed, responses, 0.0)
+        n_games = len(game_names)
+        statistics = [
+            np.stack([np.bincount(game_index, weights=w[:, c], minlength=n_games) for c in range(responses.shape[1])], axis=-1)
+            for w in (observed.astype(float), responses, responses ** 2)
+        ]
+        return cls(game_names, *statistics)
+
+    @classmethod
+    def from_csv(cls, file_path, game_names, columns=RESPONSE_COLUMNS, scale=100):
+        """Read raw participant rows (comma- or tab-separated) and reduce them."""
+        rows = pd.read_csv(file_path, sep=None, engine="python")
+        return cls.from_rows(rows, game_names, columns, scale)
+
+    def __add__(self, other):
+        """Statistics of both sets of rows; sufficient statistics simply add up."""
+        if self.game_names != other.game_names:
+            raise ValueError("TrialData must cover the same games in the same order to be combined")
+        return TrialData(self.game_names, self.counts + other.counts, self.sums + other.sums, self.sums_sq + other.sums_sq)
+
+    @property
+    def means(self):
+        """(n_games, 2) mean response, 0 where a game has no responses."""
+        return np.divide(self.sums, self.counts, out=np.zeros_like(self.sums), where=self.counts > 0)
+
+    @property
+    def variances(self):
+        """(n_games, 2) population variance of the responses."""
+        return np.divide(self.sums_sq, self.counts, out=np.zeros_like(self.sums_sq), where=self.counts > 0) - self.means ** 2
+
+
+def trial_nll(tree, payoffs, params, data, model="inequality", level=2, likelihood="bernoulli", jac=False):
+    """
+    Trial-level NLL of one model's level-k predictions, from the per-game sufficient statistics (a pseudo-likelihood
+    for "bernoulli", see the module notes).
+    :param payoffs: (n_games, n_terminals, 2) payoffs in the order of data.game_names.
+    :param params: (k,) parameter row, or (..., k) batch of rows, laid out as MODEL_PARAMETERS[model].
+    :param data: TrialData for the same games.
+    :param likelihood: "bernoulli" or "gaussian" (see the module notes).
+    :param jac: Also return d NLL / d params.
+    :return: nll of shape (...), or (nll, gradient) with gradient of shape (..., k) when jac is True.
+    """
+    predictions = level_k_log_predictions(tree, payoffs, params, model, level, jac=jac)
+    log_p, log_not_p = predictions[:2]
+    n, s = data.counts, data.sums
+
+    if likelihood == "bernoulli":
+        nll = log_binary_nll(log_p, log_not_p, data.means, n)
+        if not jac:
+            return nll
+        d_log_p, d_log_not_p = predictions[2:]
+        gradient = -np.einsum("...gc,...gcp->...p", np.broadcast_to(s, log_p.shape), d_log_p) \
+            - np.einsum("...gc,...gcp->...p", np.broadcast_to(n - s, log_p.shape), d_log_not_p)
+        return nll, gradient
+
+    if likelihood == "gaussian":
+        p = np.exp(log_p)
+        rss = np.sum(data.sums_sq - 2 * p * s + n * p ** 2, axis=-2)  # Residual sum of squares per choice, (..., 2)
+        n_total = n.sum(axis=0)
+        nll = np.sum(n_total / 2 * (np.log(2 * np.pi * rss / n_total) + 1), axis=-1)
+        if not jac:
+            return nll
+        d_p = p[..., None] * predictions[2]
+        d_rss = np.einsum("...gc,...gcp->...cp", 2 * (n * p - s), d_p)
+        gradient = np.sum((n_total / (2 * rss))[..., None] * d_rss, axis=-2)
+        return nll, gradient
+
+    raise ValueError(f"Unknown likelihood '{likelihood}', expected 'bernoulli' or 'gaussian'")
@@ -0,0 +1,216 @@
+from collections import deque
+
+import numpy as np
+
+Player1 = "1"
+Player2 = "2"
+
+PLAYERS = (Player1, Player2)
+TERMINAL = -1  # Mover code for states where no player can act
+CHANCE = -2    # Mover code for chance nodes, whose actions follow fixed probabilities
+
+
+class CompiledGame:
+    """
+    Array-backed representation of a sharing game, built once from a game_configs entry.
+    Any finite tree is supported: any number of moves, any number of actions per state and chance nodes.
+    - States: relabelled with integer ids 0..n_states-1 in breadth-first order from the initial state
+      (unreachable states in the config are dropped)
+    - Edges: one per (state, action) pair, stored CSR-style so the children of state s are
+      child_state[child_ptr[s]:child_ptr[s + 1]] reached by edge_action[child_ptr[s]:child_ptr[s + 1]]
+    - Movers: mover[s] is 0 for Player1, 1 for Player2, CHANCE (-2) for chance nodes and TERMINAL (-1) where nobody acts
+    - Chance: chance_probabilities[e] is the fixed probability of chance edge e (0 on player edges)
+    - Payoffs: dense (n_terminals, 2) matrix, row terminal_index[s] holds (Player1, Player2) payoffs of state s
+    - Layers: states of equal depth are contiguous, so the solvers sweep the tree one depth at a time
+    """
+
+    def __init__(self, transitions, rewards, actions, initial_state, chance=None):
+        """
+        Compile the game from the same dictionaries that SharingGame takes.
+        :param transitions: State-action-state mappings.
+        :param rewards: Rewards for terminal states.
+        :param actions: Actions available for each player in each state.
+        :param initial_state: The starting state of the game.
+        :param chance: Optional {state: {action: probability}} for chance nodes.
+        """
+        chance = chance or {}
+        labels, index = [initial_state], {initial_state: 0}
+        edge_lists = []  # per state: list of (action, next_state_label, chance probability)
+        movers, depths = [], [0]
+
+        queue = deque([initial_state])
+        while queue:
+            state = queue.popleft()
+            mover, edges = TERMINAL, []
+            for p, player in enumerate(PLAYERS):
+                player_actions = actions.get(state, {}).get(player, [])
+                if not player_actions:
+                    continue
+                if mover != TERMINAL:
+                    raise ValueError(f"State {state} has actions for both players; simultaneous moves are not supported")
+                mover = p
+                edges = [(action, 0.0) for action in player_actions]
+            if state in chance:
+                if mover != TERMINAL:
+                    raise ValueError(f"State {state} is both a chance node and a player's decision")
+                mover = CHANCE
+                edges = list(chance[state].items())
+                if not np.isclose(sum(prob for _, prob in edges), 1):
+                    raise ValueError(f"Chance probabilities in state {state} do not sum to 1")
+            movers.append(mover)
+            edge_list = []
+            for action, prob in edges:
+                next_state = transitions.get(state, {}).get(action, None)
+                if next_state is None:
+                    raise ValueError(f"Action '{action}' in state {state} has no transition")
+                if next_state in index:
+                    raise ValueError(f"State {next_state} is reached twice; the game must be a tree")
+                index[next_state] = len(labels)
+                labels.append(next_state)
+                depths.append(depths[index[state]] + 1)
+                queue.append(next_state)
+                edge_list.append((action, next_state, prob))
+            edge_lists.append(edge_list)
+
+        self.state_labels = labels
+        self.state_index = index
+        self.n_states = len(labels)
+        self.initial_state = 0
+        self.depth = np.asarray(depths, dtype=np.intp)
+
+        self.action_labels = []
+        action_index = {}
+        child_ptr = [0]
+        child_state, edge_action, chance_probabilities = [], [], []
+        for edge_list in edge_lists:
+            for action, next_state, prob in edge_list:
+                if action not in action_index:
+                    action_index[action] = len(self.action_labels)
+                    self.action_labels.append(action)
+                child_state.append(index[next_state])
+                edge_action.append(action_index[action])
+                chance_probabilities.append(prob)
+            child_ptr.append(len(child_state))
+        self.action_index = action_index
+
+        self.child_ptr = np.asarray(child_ptr, dtype=np.intp)
+        self.child_state = np.asarray(child_state, dtype=np.intp)
+        self.edge_action = np.asarray(edge_action, dtype=np.intp)
+        self.chance_probabilities = np.asarray(chance_probabilities, dtype=float)
+        self.n_edges = len(child_state)
+        self.n_children = np.diff(self.child_ptr)
+        self.edge_parent = np.repeat(np.arange(self.n_states, dtype=np.intp), self.n_children)
+
+        self.mover = np.asarray(movers, dtype=np.intp)
+        self.edge_mover = self.mover[self.edge_parent]
+        self.chance_edges = self.edge_mover == CHANCE
+        self.terminal_mask = self.mover == TERMINAL
+        self.terminals = np.flatnonzero(self.terminal_mask)
+        self.n_terminals = len(self.terminals)
+        self.terminal_index = np.full(self.n_states, -1, dtype=np.intp)
+        self.terminal_index[self.terminals] = np.arange(self.n_terminals)
+
+        # One entry per depth that has decision or chance states, deepest first. Each holds the contiguous
+        # slice of edges leaving that depth, the offset of each parent's first edge within the slice,
+        # the position of each edge's parent among the layer's parents, and the parents themselves
+        self.layers = []
+        for d in range(self.depth[-1], -1, -1):
+            states = np.flatnonzero(self.depth == d)
+            parents = states[self.n_children[states] > 0]
+            if len(parents) == 0:
+                continue
+            edges = slice(self.child_ptr[parents[0]], self.child_ptr[parents[-1] + 1])
+            segment = np.repeat(np.arange(len(parents)), self.n_children[parents])
+            self.layers.append((edges, self.child_ptr[parents] - edges.start, segment, parents))
+
+        self.payoffs = np.zeros((self.n_terminals, 2))
+        for row, state in enumerate(self.terminals):
+            reward = rewards.get(labels[state], {Player1: 0, Player2: 0})
+            self.payoffs[row] = reward.get(Player1, 0), reward.get(Player2, 0)
+
+    @classmethod
+    def from_config(cls, config):
+        """Compile a single game_configs entry."""
+        return cls(config["transitions"], config["rewards"], config["actions"], config["initial_state"], config.get("chance"))
+
+    def get_initial_state(self):
+        """Return the config label of the initial state."""
+        return self.state_labels[self.initial_state]
+
+    def player_states(self, player):
+        """Integer ids of the states where the given player (index 0 or 1) acts."""
+        return np.flatnonzero(self.mover == player)
+
+    def edges(self, state):
+        """Slice of the edge arrays holding the children of an integer state id."""
+        return slice(self.child_ptr[state], self.child_ptr[state + 1])
+
+    def edge_id(self, state, action):
+        """Edge id of taking a named action in a state given by its config label."""
+        s = self.state_index[state]
+        for e in range(self.child_ptr[s], self.child_ptr[s + 1]):
+            if self.action_labels[self.edge_action[e]] == action:
+                return e
+        raise KeyError(f"Action '{action}' is not available in state {state}")
+
+    def policy_dict(self, edge_probabilities, states):
+        """Translate per-edge probabilities back into the {state: {action: prob}} form used by the scripts."""
+        return {
+            self.state_labels[s]: {
+                self.action_labels[self.edge_action[e]]: float(edge_probabilities[e])
+                for e in range(self.child_ptr[s], self.child_ptr[s + 1])
+            }
+            for s in states
+        }
+
+    def reach_probabilities(self, policy):
+        """
+        Probability of reaching every state when the movers follow a per-edge policy.
+        :param policy: (..., n_edges) probabilities of each edge given its parent state (chance edges included).
+        :return: (..., n_states) reach probabilities, 1 at the initial state.
+        """
+        policy = np.asarray(policy, dtype=float)
+        reach = np.empty(policy.shape[:-1] + (self.n_states,))
+        reach[..., self.initial_state] = 1
+        for edges, _, _, _ in reversed(self.layers):  # Top-down: parents are reached before their children
+            reach[..., self.child_state[edges]] = reach[..., self.edge_parent[edges]] * policy[..., edges]
+        return reach
+
+
+def compile_game(game):
+    """Return a CompiledGame for a SharingGame, a game_configs entry or an already compiled game."""
+    if isinstance(game, CompiledGame):
+        return game
+    if isinstance(game, dict):
+        return CompiledGame.from_config(game)
+    return CompiledGame(game.transitions, game.rewards, game.actions, game.initial_state, getattr(game, "chance", None))
+
+
+def same_tree(game, other):
+    """True when two compiled games have identical structure (states, actions, movers, chance) and differ at most in payoffs."""
+    return (
+        game.n_states == other.n_states
+        and game.n_edges == other.n_edges
+        and game.action_labels == other.action_labels
+        and np.array_equal(game.child_ptr, other.child_ptr)
+        and np.array_equal(game.child_state, other.child_state)
+        and np.array_equal(game.edge_action, other.edge_action)
+        and np.array_equal(game.mover, other.mover)
+        and np.array_equal(game.chance_probabilities, other.chance_probabilities)
+    )
+
+
+def stack_payoffs(game_configs):
+    """
+    Compile every game in a game_configs dictionary against one shared tree.
+    :return: (game_names, tree, payoffs) where tree is the CompiledGame of the first game and
+             payoffs is a (n_games, n_terminals, 2) tensor in the order of game_names.
+    """
+    game_names = list(game_configs)
+    compiled = [CompiledGame.from_config(game_configs[name]) for name in game_names]
+    tree = compiled[0]
+    for name, game in zip(game_names, compiled):
+        if not same_tree(tree, game):
+            raise ValueError(f"Game '{name}' does not share the tree structure of '{game_names[0]}'")
+    payoffs = np.stack([game.payoffs for game in compiled])
+    return game_names, tree, payoffs
@@ -0,0 +1,156 @@
+import numpy as np
+from scipy.special import logsumexp, roots_legendre
+from scipy.stats import beta
+
+from level_k import log_binary_nll, level_k_log_predictions, mixture_policy, reported_choice_probabilities, solve_level_k_batch
+from level_k import goal_weighted_utilities
+from power_models import expected_utilities
+
+"""
+Generalized Relative Expected Utility (GREU): REU when the observer is unsure what each player actually wants.
+A goal is a weight pair (w_S, w_O) on a player's own and the other player's payoff, so a set of goals is an
+(n_goals, 2) matrix and the subjective utility of player i under goal g is w_S[g] * U_i + w_O[g] * U_other.
+Utilities are linear in the payoffs, so the expected subjective utilities of every goal follow from the ordinary
+(EU_P1, EU_P2) of each game by one matrix product, and the prior over goals is a weight vector on the goal rows:
+    - discrete priors over named goals (GOALS): GREU_UNIFORM and GREU_ESTIMATED reproduce compute_greu and
+      compute_greu_estimated of Archive/REU.py,
+    - the continuous generalized-beta prior of Archive/Stimuli/play.py, integrated by Gauss-Legendre quadrature on
+      the goal line (w_S, w_O) = (x, sign(a) * (1 - x)) with x ~ Beta(|a|, b): positive a spreads the goals between
+      altruistic (x = 0) and selfish (x = 1), negative a between sadistic and selfish.
+Payoffs are (..., n_terminals, 2) and policies (..., n_edges), so every game of stack_payoffs is scored at once.
+
+compute_greu takes the behaviour as given (e.g. the selfish level-k P(In) / P(Right)). goal_level_k instead lets
+every goal induce its own level-k policy (the "goal" utility model of level_k, both players pursuing the goal): the
+(n_goals, n_games) batch is solved in one solve_level_k_batch call, the behaviour is the goal-prior mixture of those
+policies (level_k.mixture_policy) and each goal's subjective utility is taken under its own policy, so goal
+uncertainty moves both the predicted choices and the GREU. goal_level_k_nll fits the two betas under a fixed goal
+prior from log-probabilities mixed with log-sum-exp, with an exact gradient for the optimizers.
+"""
+
+GOALS = {
+    "altruistic": (0.0, 1.0),    # Ua = Uother
+    "prosocial": (0.5, 0.5),     # Up = 1/2 Uself + 1/2 Uother
+    "selfish": (1.0, 0.0),       # Usel = Uself
+    "competitive": (0.5, -0.5),  # Uc = 1/2 Uself - 1/2 Uother
+    "sadistic": (0.0, -1.0),     # Us = -Uother
+}
+
+GREU_UNIFORM = {goal: 1.0 for goal in GOALS}  # compute_greu sums (rather than averages) the five goals
+GREU_ESTIMATED = {"altruistic": 0.1, "prosocial": 0.2, "selfish": 0.7, "competitive": 0.0, "sadistic": 0.0}
+
+
+def discrete_prior(prior, goals=GOALS):
+    """
+    Goal matrix and weights of a prior over named goals.
+    :param prior: {goal name: weight}; weights are used as given (not normalized).
+    :return: (goals (n_goals, 2) of (w_S, w_O), weights (n_goals,)).
+    """
+    names = list(prior)
+    return np.array([goals[name] for name in names], dtype=float), np.array([prior[name] for name in names], dtype=float)
+
+
+def generalized_beta(x, w_O, w_S, loc=0, scale=1):
+    """Generalized Beta PDF with location and scale parameters (negative w_O gives the inverted, negative density)."""
+    if scale <= 0:
+        raise ValueError("Scale must be positive.")
+    if w_O == 0:
+        raise ValueError("w_O cannot be zero.")
+    return np.sign(w_O) * beta.pdf((np.asarray(x) - loc) / scale, abs(w_O), w_S) / scale
+
+
+def generalized_beta_prior(w_O, w_S, loc=0, scale=1, n_points=1000):
+    """
+    Quadrature goals and weights of the generalized-beta goal density.
+    Goals lie on (w_S, w_O) = (x, sign(w_O) * (1 - x)) at n_points Gauss-Legendre nodes x of [loc, loc + scale]; the
+    weights are the |density| times the quadrature weights, normalized to sum to 1.
+    :return: (goals (n_points, 2), weights (n_points,)).
+    """
+    nodes, quadrature = roots_legendre(n_points)
+    x = loc + scale * (nodes + 1) / 2
+    weights = np.abs(generalized_beta(x, w_O, w_S, loc, scale)) * quadrature * scale / 2
+    goals = np.column_stack([x, np.sign(w_O) * (1 - x)])
+    return goals, weights / weights.sum()
+
+
+def goal_utilities(tree, policy, payoffs, goals, reach=None):
+    """
+    Expected subjective utility of both players under every goal.
+    :param goals: (n_goals, 2) goal matrix of (w_S, w_O) rows.
+    :return: (..., n_goals, 2) with [..., g, i] the expected utility of player i when it pursues goal g.
+    """
+    eu = expected_utilities(tree, policy, payoffs, reach)  # (..., 2): EU_P1, EU_P2
+    own_other = np.stack([eu, eu[..., ::-1]], axis=-1)  # (..., player, [own, other])
+    return np.einsum("...pk,gk->...gp", own_other, np.asarray(goals, dtype=float))
+
+
+def compute_greu(tree, policy, payoffs, goals, weights, reach=None):
+    """
+    GREU: expected utilities integrated over a goal prior.
+    :param goals: (n_goals, 2) goal matrix, see discrete_prior and generalized_beta_prior.
+    :param weights: (n_goals,) prior (or quadrature) weights of the goals.
+    :return: (EU_P1, EU_P2, GREU) integrated over the goals.
+    """
+    # The prior collapses to one expected goal (w_S, w_O) before touching the games
+    w_self, w_other = np.asarray(weights, dtype=float) @ np.asarray(goals, dtype=float)
+    eu = expected_utilities(tree, policy, payoffs, reach)
+    eu_player1 = w_self * eu[..., 0] + w_other * eu[..., 1]
+    eu_player2 = w_self * eu[..., 1] + w_other * eu[..., 0]
+    return eu_player1, eu_player2, eu_player2 - eu_player1
+
+
+def goal_level_k(tree, payoffs, betas, goals, weights, level=2):
+    """
+    Goal-conditioned level-k behaviour and GREU for every game.
+    :param payoffs: (n_games, n_terminals, 2) payoff tensor from stack_payoffs (or one game's (n_terminals, 2)).
+    :param betas: (2,) inverse temperatures of Player 1 and Player 2, shared by every goal.
+    :param goals: (n_goals, 2) goal matrix; weights: (n_goals,) goal prior.
+    :return: {"policies": (n_goals, n_games, n_edges) per-goal level policies, "policy": their goal-prior mixture,
+              "predictions": (n_games, 2) mixed [P(In), P(Right)], "GREU": (EU_P1, EU_P2, GREU) integrated over goals}.
+    """
+    goals = np.asarray(goals, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    payoffs = np.asarray(payoffs, dtype=float)
+    goal_rows = goals.reshape((len(goals),) + (1,) * (payoffs.ndim - 2) + (2,))  # One goal per leading batch entry
+    utilities = goal_weighted_utilities(tree, payoffs, goal_rows)  # (n_goals, n_games, n_terminals, 2)
+    policies = solve_level_k_batch(tree, utilities, betas, levels=level)[level]
+    policy = mixture_policy(tree, policies, weights)
+    eu = expected_utilities(tree, policies, payoffs)  # (n_goals, n_games, 2) direct payoffs under each goal's policy
+    own_other = np.stack([eu, eu[..., ::-1]], axis=-1)
+    subjective = np.einsum("g...pk,gk->g...p", own_other, goals)  # Each goal's utility under its own policy
+    eu_player1, eu_player2 = np.moveaxis(np.tensordot(weights, subjective, axes=1), -1, 0)
+    return {
+        "policies": policies,
+        "policy": policy,
+        "predictions": reported_choice_probabilities(tree, policy),
+        "GREU": (eu_player1, eu_player2, eu_player2 - eu_player1),
+    }
+
+
+def goal_level_k_nll(tree, payoffs, params, targets, goals, weights, level=2, jac=False, counts=1):
+    """
+    NLL of the goal-prior mixture of level-k predictions, as a function of the two betas.
+    The reported choices (REPORTED_CHOICES) are each player's first move, so their mixture probabilities are the
+    prior-weighted averages of the per-goal ones, mixed here in log space.
+    :param params: (2,) or (..., 2) rows of (beta_player1, beta_player2).
+    :param goals: (n_goals, 2) goal matrix; weights: (n_goals,) goal prior.
+    :return: nll of shape (...), or (nll, gradient) with gradient of shape (..., 2) when jac is True.
+    """
+    params = np.asarray(params, dtype=float)
+    goals = np.asarray(goals, dtype=float)
+    rows = np.concatenate([np.broadcast_to(params[..., None, :], params.shape[:-1] + (len(goals), 2)),
+                           np.broadcast_to(goals, params.shape[:-1] + goals.shape)], axis=-1)
+    with np.errstate(divide="ignore"):
+        log_weights = np.log(np.asarray(weights, dtype=float) / np.sum(weights))[:, None, None]
+    if not jac:
+        log_p, log_not_p = level_k_log_predictions(tree, payoffs, rows, "goal", level)
+        return log_binary_nll(logsumexp(log_weights + log_p, axis=-3), logsumexp(log_weights + log_not_p, axis=-3), targets, counts)
+
+    log_p, log_not_p, d_log_p, d_log_not_p = level_k_log_predictions(tree, payoffs, rows, "goal", level, jac=True)
+    mixed_p, mixed_not_p = logsumexp(log_weights + log_p, axis=-3), logsumexp(log_weights + log_not_p, axis=-3)
+    # d log(sum_g w_g p_g) = sum_g (w_g p_g / sum) d log p_g; only the beta columns are free
+    d_mixed_p = np.sum(np.exp(log_weights + log_p - mixed_p[..., None, :, :])[..., None] * d_log_p[..., :2], axis=-4)
+    d_mixed_not_p = np.sum(np.exp(log_weights + log_not_p - mixed_not_p[..., None, :, :])[..., None] * d_log_not_p[..., :2], axis=-4)
+    weights_p = np.broadcast_to(counts * targets, mixed_p.shape)
+    weights_not_p = np.broadcast_to(counts * (1 - targets), mixed_p.shape)
+    gradient = -np.einsum("...gc,...gcp->...p", weights_p, d_mixed_p) - np.einsum("...gc,...gcp->...p", weights_not_p, d_mixed_not_p)
+    return log_binary_nll(mixed_p, mixed_not_p, targets, counts), gradient
@@ -0,0 +1,459 @@
+import numpy as np
+from scipy.special import logsumexp
+
+"""
+Batched level-k solver.
+
+Every game in a game_configs module shares the Out/In -> Left/Right tree, so instead of building a
+SharingGame and a LevelKSimulation per game we solve all games (and any other leading batch
+dimensions) at once on a single CompiledGame:
+    - Level 0 players choose uniformly over the actions available in each state
+    - A level k player softmaxes over the expected utility of their actions, assuming the opponent
+      plays their level k-1 policy and they themselves play their own level k policy further down the tree
+    - Chance nodes follow their fixed probabilities at every level
+Policies are stored per edge of the compiled tree, so level k is a (..., n_edges) array. The tree is swept
+one depth layer at a time, so the Python overhead grows with the depth of the game, not its number of states.
+solve_level_k_batch keeps every level 0..K in one array, so cognitive-hierarchy predictions (a Poisson mixture
+over levels) are computed from those cached levels without solving the tree again.
+"""
+
+# The two choices reported for the Out/In -> Left/Right games: Player 1 going In, Player 2 choosing Right
+REPORTED_CHOICES = ((1, "In"), (3, "Right"))
+
+
+def segment_log_softmax(z, starts, segment):
+    """
+    Log-softmax of already beta-scaled utilities within contiguous segments of the last axis, via log-sum-exp,
+    so it stays finite for any beta.
+    :param z: (..., n) array.
+    :param starts: Index of the first element of each segment.
+    :param segment: (n,) segment number of every element.
+    """
+    z = z - np.maximum.reduceat(z, starts, axis=-1)[..., segment]
+    return z - np.log(np.add.reduceat(np.exp(z), starts, axis=-1))[..., segment]
+
+
+def segment_softmax(z, starts, segment):
+    """Softmax within contiguous segments of the last axis (see segment_log_softmax)."""
+    return np.exp(segment_log_softmax(z, starts, segment))
+
+
+def uniform_policy(tree):
+    """Level 0 policy: every action in a state is equally likely (chance nodes keep their fixed probabilities)."""
+    return np.where(tree.chance_edges, tree.chance_probabilities, 1 / tree.n_children[tree.edge_parent])
+
+
+def level_k_step(tree, utilities, betas, previous_policy):
+    """
+    One bottom-up backward-induction pass from level k-1 to level k, visiting every edge once.
+    :param tree: CompiledGame giving the shared structure.
+    :param utilities: (..., n_terminals, 2) utilities of Player 1 and Player 2 at each terminal state.
+    :param betas: (..., 2) inverse temperatures of Player 1 and Player 2.
+    :param previous_policy: (..., n_edges) level k-1 policy.
+    :return: (policy, values); the (..., n_edges) level k policy and the (..., n_states, 2) level k value of every state to each player.
+    """
+    batch_shape = np.broadcast_shapes(utilities.shape[:-2], betas.shape[:-1], previous_policy.shape[:-1])
+    policy = np.empty(batch_shape + (tree.n_edges,))
+    values = np.empty(batch_shape + (tree.n_states, 2))
+    values[..., tree.terminals, :] = utilities
+    for edges, starts, segment, parents in tree.layers:
+        movers = tree.edge_mover[edges]
+        chance = tree.chance_edges[edges]
+        own = np.where(chance, 0, movers)  # Whose continuation values drive the choice on each edge
+        child_values = values[..., tree.child_state[edges], :]
+        own_values = child_values[..., np.arange(len(movers)), own]
+        # The mover softmaxes over their own continuation values at this level ...
+        layer_policy = segment_softmax(betas[..., own] * own_values, starts, segment)
+        layer_policy = np.where(chance, tree.chance_probabilities[edges], layer_policy)
+        policy[..., edges] = layer_policy
+        # ... while their opponent expects them to play the level k-1 policy
+        previous = previous_policy[..., edges]
+        for p in (0, 1):
+            weights = np.where(movers == 1 - p, previous, layer_policy)
+            values[..., parents, p] = np.add.reduceat(weights * child_values[..., p], starts, axis=-1)
+    return policy, values
+
+
+def level_k_step_with_gradient(tree, utilities, betas, previous_policy, d_utilities, d_betas, d_previous):
+    """
+    level_k_step that also carries forward-mode derivatives with respect to n_params parameters.
+    Every tangent has the shape of its primal plus a trailing n_params axis, e.g. d_utilities is
+    (..., n_terminals, 2, n_params) and d_betas is (..., 2, n_params).
+    :return: (policy, values, d_policy, d_values).
+    """
+    batch_shape = np.broadcast_shapes(utilities.shape[:-2], betas.shape[:-1], previous_policy.shape[:-1])
+    n_params = d_utilities.shape[-1]
+    policy = np.empty(batch_shape + (tree.n_edges,))
+    values = np.empty(batch_shape + (tree.n_states, 2))
+    d_policy = np.empty(batch_shape + (tree.n_edges, n_params))
+    d_values = np.empty(batch_shape + (tree.n_states, 2, n_params))
+    values[..., tree.terminals, :] = utilities
+    d_values[..., tree.terminals, :, :] = d_utilities
+    for edges, starts, segment, parents in tree.layers:
+        movers = tree.edge_mover[edges]
+        chance = tree.chance_edges[edges]
+        own = np.where(chance, 0, movers)
+        arange = np.arange(len(movers))
+        child_values = values[..., tree.child_state[edges], :]
+        d_child_values = d_values[..., tree.child_state[edges], :, :]
+        own_values = child_values[..., arange, own]
+        d_own_values = d_child_values[..., arange, own, :]
+        layer_policy = segment_softmax(betas[..., own] * own_values, starts, segment)
+        layer_policy = np.where(chance, tree.chance_probabilities[edges], layer_policy)
+        # d softmax_e = softmax_e * (dz_e - sum over the state's edges of softmax * dz), with z = beta * value
+        d_z = d_betas[..., own, :] * own_values[..., None] + betas[..., own, None] * d_own_values
+        d_mean = np.add.reduceat(layer_policy[..., None] * d_z, starts, axis=-2)[..., segment, :]
+        d_layer_policy = np.where(chance[:, None], 0.0, layer_policy[..., None] * (d_z - d_mean))
+        policy[..., edges] = layer_policy
+        d_policy[..., edges, :] = d_layer_policy
+        previous = previous_policy[..., edges]
+        d_previous_layer = d_previous[..., edges, :]
+        for p in (0, 1):
+            opponent = movers == 1 - p
+            weights = np.where(opponent, previous, layer_policy)
+            d_weights = np.where(opponent[:, None], d_previous_layer, d_layer_policy)
+            values[..., parents, p] = np.add.reduceat(weights * child_values[..., p], starts, axis=-1)
+            d_values[..., parents, p, :] = np.add.reduceat(
+                d_weights * child_values[..., p, None] + weights[..., None] * d_child_values[..., p, :], starts, axis=-2)
+    return policy, values, d_policy, d_values
+
+
+def solve_level_k_batch(tree, utilities, betas, levels=2):
+    """
+    Compute the level 0..levels policies for a batch of games sharing one tree.
+    :param tree: CompiledGame giving the shared structure.
+    :param utilities: (..., n_terminals, 2) utilities of Player 1 and Player 2 at each terminal state.
+    :param betas: (..., 2) inverse temperatures of Player 1 and Player 2, broadcastable against the batch.
+    :param levels: Highest level of reasoning to compute.
+    :return: (levels + 1, ..., n_edges) array; entry [k, ..., e] is the probability the mover takes edge e at level k.
+    """
+    utilities = np.asarray(utilities, dtype=float)
+    betas = np.asarray(betas, dtype=float)
+    batch_shape = np.broadcast_shapes(utilities.shape[:-2], betas.shape[:-1])
+    utilities = np.broadcast_to(utilities, batch_shape + utilities.shape[-2:])
+    betas = np.broadcast_to(betas, batch_shape + (2,))
+
+    policies = np.empty((levels + 1,) + batch_shape + (tree.n_edges,))
+    policies[0] = uniform_policy(tree)
+    for k in range(1, levels + 1):
+        policies[k], _ = level_k_step(tree, utilities, betas, policies[k - 1])
+    return policies
+
+
+def poisson_level_weights(tau, levels):
+    """
+    Cognitive-hierarchy population weights: Poisson(tau) over levels 0..levels, truncated and renormalized.
+    :param tau: Mean level of reasoning, scalar or (...) array.
+    :return: (..., levels + 1) weights summing to 1.
+    """
+    tau = np.asarray(tau, dtype=float)[..., None]
+    ratios = tau / np.arange(1, levels + 1)  # f(k) / f(k-1) = tau / k
+    weights = np.cumprod(np.concatenate([np.ones_like(tau), ratios], axis=-1), axis=-1)
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+def mixture_policy(tree, policies, weights):
+    """
+    Behaviour policy of a population mixing the cached level policies.
+    In each state the levels are weighted by how likely a mover of that level is to have reached it through their
+    own earlier choices, so a player who moves several times keeps a consistent level down the tree.
+    :param policies: (levels + 1, ..., n_edges) output of solve_level_k_batch.
+    :param weights: (..., levels + 1) or (levels + 1,) weight of each level in the population.
+    :return: (..., n_edges) mixed policy.
+    """
+    own_reach = np.zeros(policies.shape[:-1] + (tree.n_states,))
+    for p in (0, 1):
+        own_policy = np.where(tree.edge_mover == p, policies, 1.0)  # Only the player's own choices discount the path
+        own_reach = np.where(tree.mover == p, tree.reach_probabilities(own_policy), own_reach)
+    # Put the level axis next to the edges so the weights broadcast against any batch dimensions
+    policies = np.moveaxis(policies, 0, -2)
+    own_reach = np.moveaxis(own_reach, 0, -2)[..., tree.edge_parent]
+    weights = np.asarray(weights, dtype=float)[..., None]
+    total = (weights * own_reach).sum(axis=-2)
+    mixed = (weights * own_reach * policies).sum(axis=-2)
+    # States no level ever reaches by its own choices fall back to the plain population average
+    fallback = (weights * policies).sum(axis=-2)
+    return np.where(total > 0, mixed / np.where(total > 0, total, 1), fallback)
+
+
+def cognitive_hierarchy_policy(tree, policies, tau):
+    """
+    Poisson cognitive-hierarchy prediction from already computed level policies.
+    :param policies: (levels + 1, ..., n_edges) output of solve_level_k_batch.
+    :param tau: Mean of the Poisson distribution over levels, broadcastable against the batch.
+    :return: (..., n_edges) policy of the population.
+    """
+    return mixture_policy(tree, policies, poisson_level_weights(tau, len(policies) - 1))
+
+
+def reported_choice_probabilities(tree, policies):
+    """Pull P(In) for Player 1 and P(Right) for Player 2 out of per-edge policies: (..., n_edges) -> (..., 2)."""
+    edges = [tree.edge_id(state, action) for state, action in REPORTED_CHOICES]
+    return policies[..., edges]
+
+
+def level_k_choice_probabilities(tree, payoffs, beta_player1, beta_player2, levels=2):
+    """
+    Self-interested level-k predictions for every game at once.
+    :param payoffs: (n_games, n_terminals, 2) payoff tensor from stack_payoffs.
+    :return: (levels + 1, n_games, 2) array of [P(In), P(Right)] for each level and game.
+    """
+    betas = np.stack(np.broadcast_arrays(beta_player1, beta_player2), axis=-1)
+    return reported_choice_probabilities(tree, solve_level_k_batch(tree, payoffs, betas[..., None, :], levels))
+
+
+# Utility transforms f(tree, payoffs, params) -> utilities shared by every model. payoffs is (..., n_terminals, 2) and
+# params is (..., n) holding the model's preference parameters (the row without the two betas), so the terminal
+# utilities of all terminals, players and parameter rows come out of one NumPy call before the tree is swept; the
+# tree is only read by transforms that refer to particular outcomes (the Out option of reciprocity).
+# A new social-preference model only needs a transform and an entry in UTILITY_MODELS / MODEL_PARAMETERS.
+def outside_option(tree):
+    """Row of the Out terminal in the compiled payoffs: the outcome of Player 1 taking Out in the initial state."""
+    row = tree.terminal_index[tree.child_state[tree.edge_id(tree.get_initial_state(), "Out")]]
+    if row < 0:
+        raise ValueError("Out in the initial state does not end the game; the reciprocity model needs an Out terminal")
+    return row
+
+
+def selfish_utilities(tree, payoffs, params):
+    """Each player's utility is their direct payoff."""
+    return np.asarray(payoffs, dtype=float)  # solve_level_k_batch broadcasts payoffs against the betas
+
+
+def inequity_aversion_utilities(tree, payoffs, params):
+    """
+    Fehr-Schmidt utilities for both players at every terminal state.
+    :param payoffs: (..., n_terminals, 2) direct payoffs.
+    :param params: (..., 4) rows of (delta_player1, delta_player2, alpha_player1, alpha_player2), the
+                   disadvantageous- and advantageous-inequity weights.
+    :return: (..., n_terminals, 2) utilities, self payoff less both inequity penalties.
+    """
+    payoffs = np.asarray(payoffs, dtype=float)
+    params = np.asarray(params, dtype=float)
+    delta = params[..., None, 0:2]
+    alpha = params[..., None, 2:4]
+    advantage = payoffs - payoffs[..., ::-1]  # Own payoff minus the other player's, for each player
+    return payoffs - delta * np.maximum(-advantage, 0) - alpha * np.maximum(advantage, 0)
+
+
+def reciprocity_utilities(tree, payoffs, params):
+    """
+    Reciprocity utilities: Player 2 weighs Player 1's payoff by theta_player2 * q, where q = -1 when Player 1
+    turned down an Out option that gave both the highest joint payoff and Player 2's highest payoff, and 0 otherwise.
+    Player 1 keeps their direct payoff.
+    :param payoffs: (..., n_terminals, 2) direct payoffs.
+    :param params: (..., 1) rows of (theta_player2,).
+    :return: (..., n_terminals, 2) utilities.
+    """
+    payoffs = np.asarray(payoffs, dtype=float)
+    theta = np.asarray(params, dtype=float)[..., 0]
+    weight = (-theta * player1_misbehaved(tree, payoffs))[..., None]
+    player2 = payoffs[..., 1] + weight * (payoffs[..., 0] - payoffs[..., 1])
+    return np.stack(np.broadcast_arrays(payoffs[..., 0], player2), axis=-1)
+
+
+def player1_misbehaved(tree, payoffs):
+    """True where Out gave both the highest joint payoff and Player 2's highest payoff (q = -1 in the reciprocity model)."""
+    out = outside_option(tree)
+    joint = payoffs.sum(axis=-1)
+    return (joint[..., out] == joint.max(axis=-1)) & (payoffs[..., out, 1] == payoffs[..., 1].max(axis=-1))
+
+
+def goal_weighted_utilities(tree, payoffs, params):
+    """
+    Goal-weighted utilities: each player values w_self times their own payoff plus w_other times the other player's.
+    :param payoffs: (..., n_terminals, 2) direct payoffs.
+    :param params: (..., 2) rows of (w_self, w_other), a goal of goal_utility.GOALS.
+    :return: (..., n_terminals, 2) utilities.
+    """
+    payoffs = np.asarray(payoffs, dtype=float)
+    params = np.asarray(params, dtype=float)
+    return params[..., None, 0:1] * payoffs + params[..., None, 1:2] * payoffs[..., ::-1]
+
+
+UTILITY_MODELS = {
+    "selfish": selfish_utilities,
+    "inequality": inequity_aversion_utilities,
+    "reciprocity": reciprocity_utilities,
+    "goal": goal_weighted_utilities,
+}
+
+
+# Jacobians of the transforms: d utilities / d params as (..., n_terminals, 2, n) arrays, used for exact NLL gradients
+def selfish_jacobian(tree, payoffs, params):
+    payoffs = np.asarray(payoffs, dtype=float)
+    return np.zeros(payoffs.shape + (0,))
+
+
+def inequity_aversion_jacobian(tree, payoffs, params):
+    payoffs = np.asarray(payoffs, dtype=float)
+    advantage = payoffs - payoffs[..., ::-1]
+    jacobian = np.zeros(np.broadcast_shapes(payoffs.shape, np.shape(params)[:-1] + (1, 1)) + (4,))
+    for p in (0, 1):
+        jacobian[..., p, p] = -np.maximum(-advantage[..., p], 0)     # d / d delta_p
+        jacobian[..., p, 2 + p] = -np.maximum(advantage[..., p], 0)  # d / d alpha_p
+    return jacobian
+
+
+def reciprocity_jacobian(tree, payoffs, params):
+    payoffs = np.asarray(payoffs, dtype=float)
+    jacobian = np.zeros(np.broadcast_shapes(payoffs.shape, np.shape(params)[:-1] + (1, 1)) + (1,))
+    jacobian[..., 1, 0] = np.where(player1_misbehaved(tree, payoffs)[..., None], payoffs[..., 1] - payoffs[..., 0], 0.0)
+    return jacobian
+
+
+def goal_weighted_jacobian(tree, payoffs, params):
+    payoffs = np.asarray(payoffs, dtype=float)
+    shape = np.broadcast_shapes(payoffs.shape, np.shape(params)[:-1] + (1, 1))
+    return np.stack([np.broadcast_to(payoffs, shape), np.broadcast_to(payoffs[..., ::-1], shape)], axis=-1)
+
+
+UTILITY_JACOBIANS = {
+    "selfish": selfish_jacobian,
+    "inequality": inequity_aversion_jacobian,
+    "reciprocity": reciprocity_jacobian,
+    "goal": goal_weighted_jacobian,
+}
+
+# Column layout of the parameter rows accepted by the grid evaluators, matching fitted_params.json
+MODEL_PARAMETERS = {
+    "selfish": ("beta_player1", "beta_player2"),
+    "inequality": ("beta_player1", "beta_player2", "delta_player1", "delta_player2", "alpha_player1", "alpha_player2"),
+    "reciprocity": ("beta_player1", "beta_player2", "theta_player2"),
+    "goal": ("beta_player1", "beta_player2", "w_self", "w_other"),
+}
+
+
+def model_utilities(tree, model, payoffs, params):
+    """Terminal utilities and betas for a batch of parameter rows laid out as MODEL_PARAMETERS[model]."""
+    if model not in UTILITY_MODELS:
+        raise ValueError(f"Unknown model '{model}', expected one of {list(UTILITY_MODELS)}")
+    params = np.asarray(params, dtype=float)
+    return UTILITY_MODELS[model](tree, payoffs, params[..., 2:]), params[..., 0:2]
+
+
+def level_k_grid(tree, payoffs, params, model="inequality", level=2, chunk_size=4096):
+    """
+    Level-k predictions for many parameter vectors and every game at once.
+    :param tree: CompiledGame giving the shared structure.
+    :param payoffs: (n_games, n_terminals, 2) payoff tensor from stack_payoffs.
+    :param params: (n_params, k) matrix whose columns follow MODEL_PARAMETERS[model], e.g.
+                   (beta1, beta2, delta1, delta2, alpha1, alpha2) rows for the inequality-aversion model.
+    :param chunk_size: Parameter rows solved per batch, bounding memory at about chunk_size * n_games * n_edges floats per level.
+    :return: (n_params, n_games, 2) array of [P(In), P(Right)] at the requested level.
+    """
+    params = np.atleast_2d(np.asarray(params, dtype=float))
+    if params.shape[-1] != len(MODEL_PARAMETERS[model]):
+        raise ValueError(f"Model '{model}' takes {len(MODEL_PARAMETERS[model])} parameters per row, got {params.shape[-1]}")
+    predictions = np.empty((len(params), len(payoffs), 2))
+    for start in range(0, len(params), chunk_size):
+        chunk = params[start:start + chunk_size, None, :]  # Broadcast each row across the games
+        utilities, betas = model_utilities(tree, model, payoffs, chunk)
+        policies = solve_level_k_batch(tree, utilities, betas, levels=level)
+        predictions[start:start + chunk_size] = reported_choice_probabilities(tree, policies[level])
+    return predictions
+
+
+def binary_nll(probabilities, targets, epsilon=1e-9):
+    """Summed binary cross-entropy between predicted and human [P(In), P(Right)] over the last two axes."""
+    probabilities = np.clip(probabilities, epsilon, 1 - epsilon)
+    log_likelihood = targets * np.log(probabilities) + (1 - targets) * np.log(1 - probabilities)
+    return -np.sum(log_likelihood, axis=(-2, -1))
+
+
+def reported_log_probabilities(tree, values, betas, d_values=None, d_betas=None):
+    """
+    Log-probabilities of the reported choices and of their complements, computed with log-sum-exp straight from
+    the level-k state values instead of taking the log of (possibly underflowed) probabilities.
+    :param values: (..., n_states, 2) level-k values from level_k_step.
+    :param betas: (..., 2) inverse temperatures.
+    :param d_values, d_betas: Optional forward-mode tangents (trailing n_params axis) to differentiate through.
+    :return: (log_p, log_not_p), each (..., 2) for [In, Right]; plus their (..., 2, n_params) tangents when given.
+    """
+    log_p, log_not_p, d_log_p, d_log_not_p = [], [], [], []
+    for state, action in REPORTED_CHOICES:
+        s = tree.state_index[state]
+        edges, mover = tree.edges(s), tree.mover[s]
+        chosen = tree.edge_id(state, action) - edges.start
+        others = np.arange(tree.n_children[s]) != chosen
+        child_values = values[..., tree.child_state[edges], mover]
+        z = betas[..., mover, None] * child_values
+        log_total = logsumexp(z, axis=-1)
+        log_others = logsumexp(z[..., others], axis=-1)
+        log_p.append(z[..., chosen] - log_total)
+        log_not_p.append(log_others - log_total)
+        if d_values is None:
+            continue
+        d_z = d_betas[..., mover, None, :] * child_values[..., None] + \
+            betas[..., mover, None, None] * d_values[..., tree.child_state[edges], mover, :]
+        d_log_total = np.einsum("...e,...ep->...p", np.exp(z - log_total[..., None]), d_z)
+        d_log_others = np.einsum("...e,...ep->...p", np.exp(z[..., others] - log_others[..., None]), d_z[..., others, :])
+        d_log_p.append(d_z[..., chosen, :] - d_log_total)
+        d_log_not_p.append(d_log_others - d_log_total)
+    log_p, log_not_p = np.stack(log_p, axis=-1), np.stack(log_not_p, axis=-1)
+    if d_values is None:
+        return log_p, log_not_p
+    return log_p, log_not_p, np.stack(d_log_p, axis=-2), np.stack(d_log_not_p, axis=-2)
+
+
+def log_binary_nll(log_p, log_not_p, targets, counts=1):
+    """
+    Summed binary cross-entropy over the last two axes, from log P(choice) and log P(not choice).
+    :param counts: Optional number of responses behind each target (broadcast against the targets); with
+                   targets = mean response and counts = number of responses this is the trial-level (binomial pseudo-) NLL.
+    """
+    return -np.sum(counts * (targets * log_p + (1 - targets) * log_not_p), axis=(-2, -1))
+
+
+def level_k_log_predictions(tree, payoffs, params, model="inequality", level=2, jac=False):
+    """
+    Log-probabilities of the reported choices of one model for every game and parameter row.
+    :param params: (k,) parameter row, or (..., k) batch of rows, laid out as MODEL_PARAMETERS[model].
+    :param level: Level of reasoning of the predictions (1 or higher; level 0 has no parameters).
+    :param jac: Also return their derivatives, computed by forward-mode differentiation through the level-k sweep.
+    :return: (log_p, log_not_p), each (..., n_games, 2); plus their (..., n_games, 2, k) derivatives when jac is True.
+    """
+    if level < 1:
+        raise ValueError("Log predictions need level >= 1")
+    params = np.asarray(params, dtype=float)
+    rows = params[..., None, :]  # Broadcast each row across the games
+    utilities, betas = model_utilities(tree, model, payoffs, rows)
+    policy = uniform_policy(tree)
+    if not jac:
+        for _ in range(level):
+            policy, values = level_k_step(tree, utilities, betas, policy)
+        return reported_log_probabilities(tree, values, betas)
+
+    n_params = params.shape[-1]
+    batch_shape = np.broadcast_shapes(utilities.shape[:-2], betas.shape[:-1])
+    d_utilities = np.zeros(batch_shape + utilities.shape[-2:] + (n_params,))
+    d_utilities[..., 2:] = UTILITY_JACOBIANS[model](tree, payoffs, rows[..., 2:])
+    d_betas = np.broadcast_to(np.eye(2, n_params), batch_shape + (2, n_params))
+
+    d_policy = np.zeros((tree.n_edges, n_params))
+    for _ in range(level):
+        policy, values, d_policy, d_values = level_k_step_with_gradient(
+            tree, utilities, betas, policy, d_utilities, d_betas, d_policy)
+    return reported_log_probabilities(tree, values, betas, d_values, d_betas)
+
+
+def level_k_nll(tree, payoffs, params, targets, model="inequality", level=2, jac=False, counts=1):
+    """
+    Summed binary cross-entropy of one model's level-k predictions over every game, optionally with its exact gradient.
+    The likelihood is computed from log-probabilities (reported_log_probabilities), so it stays finite and smooth
+    however large beta gets; there is no clipping of probabilities.
+    Written to be handed straight to scipy.optimize.minimize, e.g. minimize(level_k_nll, x0, args=(...), jac=True).
+    :param params: (k,) parameter row, or (..., k) batch of rows, laid out as MODEL_PARAMETERS[model].
+    :param targets: (n_games, 2) human [P(In), P(Right)].
+    :param counts: Optional (n_games, 2) number of responses behind each target, for the trial-level likelihood.
+    :param jac: Also return d NLL / d params.
+    :return: nll of shape (...), or (nll, gradient) with gradient of shape (..., k) when jac is True.
+    """
+    if not jac:
+        log_p, log_not_p = level_k_log_predictions(tree, payoffs, params, model, level)
+        return log_binary_nll(log_p, log_not_p, targets, counts)
+    log_p, log_not_p, d_log_p, d_log_not_p = level_k_log_predictions(tree, payoffs, params, model, level, jac=True)
+    weights = np.broadcast_to(counts * targets, log_p.shape)
+    other_weights = np.broadcast_to(counts * (1 - targets), log_p.shape)
+    gradient = -np.einsum("...gc,...gcp->...p", weights, d_log_p) - np.einsum("...gc,...gcp->...p", other_weights, d_log_not_p)
+    return log_binary_nll(log_p, log_not_p, targets, counts), gradient
@@ -0,0 +1,161 @@
+import numpy as np
+
+from compiled_game import compile_game
+from level_k import REPORTED_CHOICES, uniform_policy
+
+"""
+Power models (REU, RCR, RC, RCA) for any compiled game tree, batched over games and parameter settings.
+The original Models.py versions read the Out/Left/Right payoffs from states 2, 4 and 5 directly; here
+every quantity is written in terms of the per-edge policy of the compiled tree instead:
+    - REU: EU_i = sum over terminal states of P(reach terminal) * U_i(terminal); REU = EU_P2 - EU_P1
+    - RCR: RCR_P1 = |MaxU_P2 - EU_P2| / MaxU_P2, RCR_P2 = |MaxU_P1 - EU_P1| / MaxU_P1; RCR = RCR_P2 - RCR_P1
+    - RC: RC_i = sum over player i's states of P(reach state) * number of distinct outcomes of its actions; RC = RC_P2 - RC_P1
+    - RCA: CA_i = sum over player i's edges of P(reach state) * P(action) * the total-variation change that taking the
+           action (rather than following the policy) makes to the other player's expected actions downstream;
+           RCA = CA_P2 - CA_P1
+Chance nodes only enter through the reach probabilities.
+power_scores computes all four from one reach-probability sweep, for any batch of games and choice probabilities.
+Payoffs are (..., n_terminals, 2) and policies (..., n_edges); the leading dimensions broadcast against each other.
+"""
+
+
+def choice_policy(tree, p_in_player1, p_right_player2, choices=REPORTED_CHOICES):
+    """
+    Per-edge policy from the reported choice probabilities (P(In) for Player 1 and P(Right) for Player 2).
+    The other actions in each reported state share the remaining probability; every other state is uniform.
+    :return: (..., n_edges) policy broadcast over the shapes of p_in_player1 and p_right_player2.
+    """
+    probabilities = [np.asarray(p_in_player1, dtype=float), np.asarray(p_right_player2, dtype=float)]
+    batch_shape = np.broadcast_shapes(*(p.shape for p in probabilities))
+    policy = np.broadcast_to(uniform_policy(tree), batch_shape + (tree.n_edges,)).copy()
+    for (state, action), p in zip(choices, probabilities):
+        edge = tree.edge_id(state, action)
+        siblings = tree.edges(tree.state_index[state])
+        policy[..., siblings] = ((1 - p) / (tree.n_children[tree.state_index[state]] - 1))[..., None]
+        policy[..., edge] = p
+    return policy
+
+
+def expected_utilities(tree, policy, payoffs, reach=None):
+    """(..., 2) expected payoff of Player 1 and Player 2 when both follow the policy."""
+    reach = tree.reach_probabilities(policy) if reach is None else reach
+    return np.einsum("...t,...tp->...p", reach[..., tree.terminals], payoffs)
+
+
+def compute_reu(tree, policy, payoffs, reach=None):
+    """Relative Expected Utility (of Player 2 relative to Player 1). Returns (EU_P1, EU_P2, REU)."""
+    eu = expected_utilities(tree, policy, payoffs, reach)
+    return eu[..., 0], eu[..., 1], eu[..., 1] - eu[..., 0]
+
+
+def compute_rcr(tree, policy, payoffs, reach=None):
+    """
+    Relative Control over Resources. Returns (RCR_P1, RCR_P2, RCR).
+    Each shortfall is relative to the player's largest payoff, so a game where that payoff is 0 has no RCR and raises.
+    """
+    eu = expected_utilities(tree, policy, payoffs, reach)
+    max_u = np.max(payoffs, axis=-2)
+    if np.any(max_u == 0):
+        raise ValueError("RCR is undefined when a player's largest payoff is 0")
+    rcr_player1 = np.abs(max_u[..., 1] - eu[..., 1]) / max_u[..., 1]
+    rcr_player2 = np.abs(max_u[..., 0] - eu[..., 0]) / max_u[..., 0]
+    return rcr_player1, rcr_player2, rcr_player2 - rcr_player1
+
+
+def distinct_outcomes(tree, payoffs):
+    """
+    Number of distinct outcomes reachable by the actions in each state (0 for terminal states).
+    Terminal children count as the same outcome when their payoff tuples are identical; a non-terminal child is
+    always its own outcome.
+    :return: (..., n_states) counts.
+    """
+    payoffs = np.asarray(payoffs, dtype=float)
+    # Pairs of terminal siblings (later edge, earlier edge); an edge is a repeat if it matches any earlier sibling
+    terminal_child = tree.terminal_index[tree.child_state]
+    later, earlier = [], []
+    for s in np.flatnonzero(tree.n_children > 1):
+        edges = np.arange(tree.child_ptr[s], tree.child_ptr[s + 1])
+        edges = edges[terminal_child[edges] >= 0]
+        for j in range(1, len(edges)):
+            later.extend([edges[j]] * j)
+            earlier.extend(edges[:j])
+    later, earlier = np.asarray(later, dtype=np.intp), np.asarray(earlier, dtype=np.intp)
+    same = np.all(payoffs[..., terminal_child[later], :] == payoffs[..., terminal_child[earlier], :], axis=-1)
+    repeats = np.zeros(payoffs.shape[:-2] + (tree.n_edges,))
+    np.add.at(repeats, (Ellipsis, later), same)
+    new_outcome = (repeats == 0).astype(float)
+    counts = np.zeros(payoffs.shape[:-2] + (tree.n_states,))
+    np.add.at(counts, (Ellipsis, tree.edge_parent), new_outcome)
+    return counts
+
+
+def compute_rc(tree, policy, payoffs, reach=None):
+    """Relative Choice. Returns (RC_P1, RC_P2, RC)."""
+    reach = tree.reach_probabilities(policy) if reach is None else reach
+    choice = reach * distinct_outcomes(tree, payoffs)
+    rc_player1 = choice[..., tree.mover == 0].sum(axis=-1)
+    rc_player2 = choice[..., tree.mover == 1].sum(axis=-1)
+    return rc_player1, rc_player2, rc_player2 - rc_player1
+
+
+def expected_actions(tree, policy, player):
+    """
+    Expected number of actions the player takes from every state onwards (one bottom-up sweep).
+    :return: (..., n_states) counts, 0 at terminals.
+    """
+    policy = np.asarray(policy, dtype=float)
+    own = (tree.edge_mover == player).astype(float)
+    visits = np.zeros(policy.shape[:-1] + (tree.n_states,))
+    for edges, starts, _, parents in tree.layers:
+        through = own[edges] + visits[..., tree.child_state[edges]]
+        visits[..., parents] = np.add.reduceat(policy[..., edges] * through, starts, axis=-1)
+    return visits
+
+
+def compute_rca(tree, policy, payoffs=None, reach=None):
+    """
+    Relative Control over Actions (counterfactual causal influence over the other player's actions).
+    Payoffs do not enter; when given, the scores are only broadcast to their batch shape like the other models'.
+    Returns (CA_P1, CA_P2, RCA).
+    """
+    policy = np.asarray(policy, dtype=float)
+    reach = tree.reach_probabilities(policy) if reach is None else reach
+    influence = []
+    for player in (0, 1):
+        visits = expected_actions(tree, policy, 1 - player)
+        edges = np.flatnonzero(tree.edge_mover == player)
+        parents, children = tree.edge_parent[edges], tree.child_state[edges]
+        # Half the L1 distance between the other player's expected action counts after taking an edge and under the
+        # policy. In a tree the other player's actions below the edge scale by 1 - pi and those below its siblings
+        # drop out, so the distance is (1 - pi) visits[child] + (visits[parent] - pi visits[child])
+        pi = policy[..., edges]
+        shift = 0.5 * ((1 - 2 * pi) * visits[..., children] + visits[..., parents])
+        influence.append(np.sum(reach[..., parents] * pi * shift, axis=-1))
+    if payoffs is not None:
+        influence = np.broadcast_arrays(*influence, np.empty(np.shape(payoffs)[:-2]))[:2]
+    return influence[0], influence[1], influence[1] - influence[0]
+
+
+POWER_MODELS = {"REU": compute_reu, "RCR": compute_rcr, "RC": compute_rc, "RCA": compute_rca}
+
+
+def power_scores(tree, payoffs, policy, models=POWER_MODELS):
+    """
+    Every power model for a batch of games in one call, sharing a single reach-probability sweep.
+    :param payoffs: (..., n_terminals, 2) payoff tensor, e.g. the (n_games, n_terminals, 2) of stack_payoffs.
+    :param policy: (..., n_edges) policies broadcasting against the payoffs' leading dimensions (see choice_policy).
+    :return: {model: (score_P1, score_P2, relative score)}, each array of the broadcast batch shape.
+    """
+    reach = tree.reach_probabilities(policy)
+    return {name: compute(tree, policy, payoffs, reach) for name, compute in models.items()}
+
+
+def power_models(game, p_in_player1, p_right_player2, payoffs=None):
+    """
+    REU, RCR, RC and RCA for a game (SharingGame, game_configs entry or CompiledGame) given the reported choice probabilities.
+    :param payoffs: Optional (..., n_terminals, 2) batch of payoffs sharing the game's tree; defaults to the game's own.
+    :return: {"REU": (EU_P1, EU_P2, REU), "RCR": (RCR_P1, RCR_P2, RCR), "RC": (RC_P1, RC_P2, RC), "RCA": (CA_P1, CA_P2, RCA)}.
+    """
+    tree = compile_game(game)
+    payoffs = tree.payoffs if payoffs is None else payoffs
+    return power_scores(tree, payoffs, choice_policy(tree, p_in_player1, p_right_player2))
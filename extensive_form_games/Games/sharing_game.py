@@ -1,3 +1,5 @@
+from compiled_game import CompiledGame
+
 Player1 = "1"
 Player2 = "2"
 
@@ -9,21 +11,28 @@ class SharingGame:
     - Actions: Configurable actions for each player in each state
     - Transitions: State transition function
     - Rewards: Payoffs for reaching certain terminal states
+    - Chance: Optional states where nature moves with fixed probabilities
     """
 
-    def __init__(self, transitions, rewards, actions, initial_state):
+    def __init__(self, transitions, rewards, actions, initial_state, chance=None):
         """
         Initialize the game with game-specific configurations.
         :param transitions: State-action-state mappings.
         :param rewards: Rewards for terminal states.
         :param actions: Actions available for each player in each state.
         :param initial_state: The starting state of the game.
+        :param chance: Optional {state: {action: probability}} for chance nodes.
         """
         self.transitions = transitions
         self.rewards = rewards
         self.actions = actions
         self.initial_state = initial_state
+        self.chance = chance or {}
     
+    def compile(self):
+        """Return the array-backed CompiledGame for this game's configuration."""
+        return CompiledGame(self.transitions, self.rewards, self.actions, self.initial_state, self.chance)
+
     def is_player_terminal(self, state, player):
         """Check if the given state is terminal for the specific player."""
         if len(self.get_actions(state, player)) == 0:
@@ -33,10 +42,12 @@ class SharingGame:
 
     def player_non_terminal_states(self, player):
         """Get a list of non-terminal states for the player."""
-        return [state for state in range(1, self.get_total_states() + 1) if not self.is_player_terminal(state, player)]
+        return [state for state in self.get_states() if not self.is_player_terminal(state, player)]
 
     def is_terminal(self, state):
-        """Check if a state is terminal for the game (i.e., no player can act)."""
+        """Check if a state is terminal for the game (i.e., no player can act and it is not a chance node)."""
+        if state in self.chance:
+            return False
         if self.is_player_terminal(state, Player1) == True and self.is_player_terminal(state, Player2)== True:
             return True
         else:
@@ -53,9 +64,17 @@ class SharingGame:
         """Return the initial state of the game."""
         return self.initial_state
     
+    def get_states(self):
+        """Return every state reachable from the initial state, in breadth-first order."""
+        states, frontier = [self.initial_state], [self.initial_state]
+        while frontier:
+            frontier = [next_state for state in frontier for next_state in self.transitions.get(state, {}).values()]
+            states.extend(frontier)
+        return states
+
     def get_total_states(self):
         """Return the total number of states in the game."""
-        return 5
+        return len(self.get_states())
 
     def get_actions(self, state, player):
         """Get the actions available to the given player at a specific state."""
@@ -6,297 +6,239 @@ import math
 sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Games')
 
 import numpy as np
+from scipy.special import logsumexp
 from sharing_game import SharingGame
+from compiled_game import PLAYERS, compile_game
+from level_k import UTILITY_MODELS, cognitive_hierarchy_policy, level_k_step, uniform_policy
 from game_configs_full import game_configs
 
 Player1 = "1"
 Player2 = "2"
 
-def softmax(x, beta):
-    """ Apply softmax with an inverse temperature parameter (beta) to a list of values (expected utilities). """
-    x = np.array(x)
-    exp_x = np.exp(beta * x)
-    return exp_x / np.sum(exp_x)  # Returns a choice probability for each action that is associated with a given expected utility (x)
+def log_softmax(x, beta):
+    """ Log choice probabilities for a list of values (expected utilities), computed with log-sum-exp so large beta cannot overflow. """
+    z = beta * np.array(x, dtype=float)
+    return z - logsumexp(z)
 
 
-class LevelKSimulation_Selfish:
-    "The objective is to compute the action probabilities for both players"
-    "We define 3 ways of computing this which corresponds to level 0,1 and 2 reasoning"
-    "For the levels of reasoning that involve utility calculations, the utility of each player"
-    "... corresponds to their direct payoff in the game"
-    def __init__(self, game, beta_player1, beta_player2):
+def softmax(x, beta):
+    """ Apply softmax with an inverse temperature parameter (beta) to a list of values (expected utilities). """
+    return np.exp(log_softmax(x, beta))  # Returns a choice probability for each action that is associated with a given expected utility (x)
+
+
+class LevelKSimulation:
+    "Shared level-k engine for the simulations below; models differ only in the utility transform applied to the payoffs."
+    "The transform (level_k.UTILITY_MODELS) maps the (n_terminals, 2) payoffs to utilities in one call, so a new"
+    "... social-preference model is one function there plus, at most, a thin subclass naming its parameters."
+    "Policies are stored per edge of the compiled game: edge_probabilities[p, e] is the probability that"
+    "... player p takes edge e, and computed_states[p, s] records which of p's states have a policy yet."
+    "Each level is computed once by a single bottom-up pass over the tree (level_k_step) and memoized, so"
+    "... asking for level k of both players costs O(edges x k) and works for trees of any depth and any k."
+    "Cognitive-hierarchy predictions mix the cached levels with Poisson weights without solving anything new"
+    def __init__(self, game, beta_player1, beta_player2, model="selfish", params=()):
         """
-        Initialize the simulation with different beta parameters for Player 1 and Player 2.
-        :param game: Instance of the SharingGame class.
+        Initialize the simulation for any model in level_k.UTILITY_MODELS.
+        :param game: Instance of the SharingGame class (or an already compiled game).
         :param beta_player1: Beta parameter for Player 1.
         :param beta_player2: Beta parameter for Player 2.
+        :param model: Name of the utility transform.
+        :param params: The model's preference parameters, laid out as level_k.MODEL_PARAMETERS[model] without the betas.
         """
-        self.game = game
+        self._init_policies(game)
         self.beta_player1 = beta_player1  # Beta for Player 1
         self.beta_player2 = beta_player2  # Beta for Player 2
-        "The action probabalities below is what we aim to compute"
-        self.action_probabilities = {Player1: {}, Player2: {}}  # Store action probabilities for each player
+        self._init_utilities(model, params)
+
+    def _init_policies(self, game):
+        self.game = game
+        self.compiled = compile_game(game)
+        self.edge_probabilities = np.zeros((2, self.compiled.n_edges))
+        self.computed_states = np.zeros((2, self.compiled.n_states), dtype=bool)
+        self._level_policies = [uniform_policy(self.compiled)]  # Memo of the level 0, 1, ... policies
+
+    def _init_utilities(self, model, params=()):
+        "Utilities of both players at every terminal state, from one call to the model's transform"
+        self.model = model
+        self.terminal_utilities = UTILITY_MODELS[model](self.compiled, self.compiled.payoffs, np.asarray(params, dtype=float))
 
     def get_beta(self, player):
         """Return the beta parameter for the given player."""
         return self.beta_player1 if player == Player1 else self.beta_player2
 
+    @property
+    def action_probabilities(self):
+        """Action probabilities for each player in the {player: {state: {action: prob}}} form."""
+        return {
+            player: self.compiled.policy_dict(self.edge_probabilities[p], np.flatnonzero(self.computed_states[p]))
+            for p, player in enumerate(PLAYERS)
+        }
+
+    def level_policy(self, level):
+        """Per-edge policy of every mover at the given level, computing any missing lower levels once."""
+        betas = np.array([self.get_beta(Player1), self.get_beta(Player2)], dtype=float)
+        while len(self._level_policies) <= level:
+            policy, _ = level_k_step(self.compiled, self.terminal_utilities, betas, self._level_policies[-1])
+            self._level_policies.append(policy)
+        return self._level_policies[level]
+
+    def solve(self, levels=2):
+        """
+        Compute levels 0..levels once (reusing any already cached) and return them as one compact array.
+        :return: (levels + 1, n_edges) array; row k is the level k policy of every mover.
+        """
+        self.level_policy(levels)
+        return np.stack(self._level_policies[:levels + 1])
+
+    def cognitive_hierarchy(self, tau, levels=2):
+        """Per-edge policy of a Poisson(tau) cognitive-hierarchy population truncated at the given level."""
+        return cognitive_hierarchy_policy(self.compiled, self.solve(levels), tau)
+
+    def simulate_cognitive_hierarchy(self, player, tau, levels=2):
+        """Set the player's action probabilities to the Poisson(tau) cognitive-hierarchy mixture of levels 0..levels."""
+        self._set_policy(player, self.cognitive_hierarchy(tau, levels))
+
+    def _set_policy(self, player, policy):
+        g = self.compiled
+        p = PLAYERS.index(player)
+        states = g.player_states(p)
+        edges = np.isin(g.edge_parent, states)
+        self.edge_probabilities[p, edges] = policy[edges]
+        self.computed_states[p, states] = True
+
+    def simulate_level_k(self, player, level):
+        """Set the player's action probabilities in every state where they act to their level-k policy."""
+        self._set_policy(player, self.level_policy(level))
+
     def simulate_level_0(self, player):
         """ Level 0 players choose actions uniformly at random. """
-        for state in self.game.transitions.keys():
-            actions = self.game.get_actions(state, player)
-            if actions:
-                prob = 1 / len(actions) # This is the general calculation for a player's action probabality in all states where that player can act
-                self.action_probabilities[player][state] = {action: prob for action in actions}
-
-    def simulate_level_1(self, player, state, depth=0, max_depth=3):
-        if depth >= max_depth:
-            return 0  # End recursion to avoid infinite depth
-
-        for state in self.game.transitions.keys():
-            actions = self.game.get_actions(state, player)
-            expected_utilities = []
-
-            for action in actions:
-                next_state = self.game.get_transition(state, action)
-                if self.game.is_terminal(next_state):
-                    utility = self.game.get_player_utility(player, next_state)
-                else:
-                    # Simulate opponent's response
-                    opponent = self.game.opponent(player)
-                    opponent_actions = self.game.get_actions(next_state, opponent)
-                    total_utility = 0
-                    for opponent_action in opponent_actions:
-                        opponent_next_state = self.game.get_transition(next_state, opponent_action)
-                        opponent_action_prob = (
-                            self.action_probabilities[opponent][next_state].get(opponent_action, 0)
-                        )
-                        if self.game.is_terminal(opponent_next_state):
-                            utility = self.game.get_player_utility(player, opponent_next_state)
-                        else:
-                            utility = self.simulate_level_1(opponent, opponent_next_state, depth + 1, max_depth)
-                        total_utility += utility * opponent_action_prob
-                    utility = total_utility
-                expected_utilities.append(utility)
-
-            # Convert expected utilities to probabilities using softmax and the player's beta
-            if expected_utilities:
-                beta = self.get_beta(player)
-                probabilities = softmax(expected_utilities, beta=beta)
-                self.action_probabilities[player][state] = {
-                    action: float(prob) for action, prob in zip(actions, probabilities)
-                }
-
-    def simulate_level_2(self, player, state, depth=0, max_depth=3):
-        """Simulate Level 2 reasoning for the given player."""
-        # Ensure Level 1 probabilities for the opponent are computed first
-        opponent = self.game.opponent(player)
-        if not self.action_probabilities[opponent]:
-            self.simulate_level_1(opponent, state, depth=0, max_depth=max_depth)
-        return self.simulate_level_1(opponent, state, depth=0, max_depth=max_depth)
-
-class LevelKSimulation_IA:
+        self.simulate_level_k(player, 0)
+
+    def simulate_level_1(self, player, state=None):
+        """ Level 1 players softmax over expected utilities against a level 0 opponent. (state is unused; the whole tree is solved) """
+        self.simulate_level_k(player, 1)
+
+    def simulate_level_2(self, player, state=None):
+        """ Level 2 players softmax over expected utilities against a level 1 opponent. (state is unused; the whole tree is solved) """
+        self.simulate_level_k(player, 2)
+
+
+class LevelKSimulation_Selfish(LevelKSimulation):
     "The objective is to compute the action probabilities for both players"
-    "We define 3 ways of computing this which corresponds to level 0,1 and 2 reasoning"
     "For the levels of reasoning that involve utility calculations, the utility of each player"
     "... corresponds to their direct payoff in the game"
-    def __init__(self, game, beta_player1, beta_player2, delta_player1, delta_player2, alpha_player1, alpha_player2):
+    def __init__(self, game, beta_player1, beta_player2):
         """
         Initialize the simulation with different beta parameters for Player 1 and Player 2.
-        :param game: Instance of the SharingGame class.
+        :param game: Instance of the SharingGame class (or an already compiled game).
         :param beta_player1: Beta parameter for Player 1.
         :param beta_player2: Beta parameter for Player 2.
         """
-        self.game = game
-        self.beta_player1 = beta_player1  # Beta for Player 1
-        self.beta_player2 = beta_player2  # Beta for Player 2
+        super().__init__(game, beta_player1, beta_player2, model="selfish")
 
+class LevelKSimulation_IA(LevelKSimulation):
+    "The objective is to compute the action probabilities for both players"
+    "For the levels of reasoning that involve utility calculations, the utility of each player"
+    "... is their direct payoff less Fehr-Schmidt penalties for disadvantageous and advantageous inequity"
+    def __init__(self, game, beta_player1, beta_player2, delta_player1, delta_player2, alpha_player1, alpha_player2):
+        """
+        Initialize the simulation with different beta parameters for Player 1 and Player 2.
+        :param game: Instance of the SharingGame class (or an already compiled game).
+        :param beta_player1: Beta parameter for Player 1.
+        :param beta_player2: Beta parameter for Player 2.
+        """
         self.delta_player1   = delta_player1   # P1’s disad‐ineq weight
         self.delta_player2   = delta_player2   # P2’s disad‐ineq weight  
         self.alpha_player1   = alpha_player1   # P1’s adV‐ineq weight
         self.alpha_player2   = alpha_player2    # P2’s adv‐ineq weight
 
-        "The action probabalities below is what we aim to compute"
-        self.action_probabilities = {Player1: {}, Player2: {}}  # Store action probabilities for each player
-
-    def get_beta(self, player):
-        """Return the beta parameter for the given player."""
-        return self.beta_player1 if player == Player1 else self.beta_player2
+        "Setting delta (weighting over disadvantegeous equity) and alpha (weighting over advantageous equity) as free parameters"
+        super().__init__(game, beta_player1, beta_player2, model="inequality",
+                         params=(delta_player1, delta_player2, alpha_player1, alpha_player2))
 
     def get_IA_params(self, player):
         if player == Player1:
             return self.delta_player1, self.alpha_player1
         else:
             return self.delta_player2, self.alpha_player2
-        
-    def simulate_level_0(self, player):
-        """ Level 0 players choose actions uniformly at random. """
-        for state in self.game.transitions.keys():
-            actions = self.game.get_actions(state, player)
-            if actions:
-                prob = 1 / len(actions) # This is the general calculation for a player's action probabality in all states where that player can act
-                self.action_probabilities[player][state] = {action: prob for action in actions} # Stores action probabalities for each player in a given state.
-
-    def simulate_level_1(self, player, state, depth=0, max_depth=3):
-        opponent = self.game.opponent(player)
-        if depth >= max_depth:
-            return 0  # End recursion to avoid infinite depth
-
-        for state in self.game.transitions.keys():
-            actions = self.game.get_actions(state, player)
-            expected_utilities = []
-            for action in actions:
-                next_state = self.game.get_transition(state, action)
-                if self.game.is_terminal(next_state):
-                    self_utility = self.game.get_player_utility(player, next_state)
-                    opponent_utility = self.game.get_player_utility(opponent, next_state)
-                    delta, alpha = self.get_IA_params(player)
-                    "Setting delta (weighting over disadvantegeous equity) and alpha (weighting over advantageous equity) as free parameters"
-                    disad = delta * max(opponent_utility - self_utility, 0)
-                    ad = alpha * max(self_utility - opponent_utility, 0)
-                    utility = self_utility - disad - ad
-                else:
-                    # Simulate opponent's response
-                    opponent_actions = self.game.get_actions(next_state, opponent)
-                    total_utility = 0
-                    for opponent_action in opponent_actions:
-                        opponent_next_state = self.game.get_transition(next_state, opponent_action)
-                        opponent_action_prob = (
-                            self.action_probabilities[opponent][next_state].get(opponent_action, 0)
-                        )
-                        if self.game.is_terminal(opponent_next_state):
-                            self_utility = self.game.get_player_utility(player, opponent_next_state)
-                            opponent_utility = self.game.get_player_utility(opponent, opponent_next_state)
-                            delta, alpha = self.get_IA_params(player)
-                            "Setting delta (weighting over disadvantegeous equity) and alpha (weighting over advantageous equity) as free parameters"
-                            disad = delta * max(opponent_utility - self_utility, 0)
-                            ad = alpha * max(self_utility - opponent_utility, 0)
-                            utility = self_utility - disad - ad
-                        else:
-                            utility = self.simulate_level_1(opponent, opponent_next_state, depth + 1, max_depth)
-                        total_utility += utility * opponent_action_prob
-                    utility = total_utility
-                expected_utilities.append(utility)
-
-            # Convert expected utilities to probabilities using softmax and the player's beta
-            if expected_utilities:
-                beta = self.get_beta(player)
-                probabilities = softmax(expected_utilities, beta=beta)
-                self.action_probabilities[player][state] = {
-                    action: float(prob) for action, prob in zip(actions, probabilities)
-                }
-
-    def simulate_level_2(self, player, state, depth=0, max_depth=3):
-        """Simulate Level 2 reasoning for the given player."""
-        # Ensure Level 1 probabilities for the opponent are computed first
-        opponent = self.game.opponent(player)
-        if not self.action_probabilities[opponent]:
-            self.simulate_level_1(opponent, state, depth=0, max_depth=max_depth)
-
-        for state in self.game.transitions.keys():
-            actions = self.game.get_actions(state, player)
-            expected_utilities = []
-            for action in actions:
-                next_state = self.game.get_transition(state, action)
-                if self.game.is_terminal(next_state):
-                    self_utility = self.game.get_player_utility(player, next_state)
-                    opponent_utility = self.game.get_player_utility(opponent, next_state)
-                    delta, alpha = self.get_IA_params(player)
-                    "Setting delta (weighting over disadvantegeous equity) and alpha (weighting over advantageous equity) as free parameters"
-                    disad = delta * max(opponent_utility - self_utility, 0)
-                    ad = alpha * max(self_utility - opponent_utility, 0)
-                    utility = self_utility - disad - ad
-                else:
-                    opponent_actions = self.game.get_actions(next_state, opponent)
-                    total_utility = 0
-                    for opponent_action in opponent_actions:
-                        opponent_next_state = self.game.get_transition(next_state, opponent_action)
-                        opponent_action_prob = (
-                            self.action_probabilities[opponent][next_state].get(opponent_action, 0)
-                        )
-                        if self.game.is_terminal(opponent_next_state):
-                            self_utility = self.game.get_player_utility(player, opponent_next_state)
-                            opponent_utility = self.game.get_player_utility(opponent, opponent_next_state)
-                            delta, alpha = self.get_IA_params(player)
-                            "Setting delta (weighting over disadvantegeous equity) and alpha (weighting over advantageous equity) as free parameters"
-                            disad = delta * max(opponent_utility - self_utility, 0)
-                            ad = alpha * max(self_utility - opponent_utility, 0)
-                            utility = self_utility - disad - ad
-                        else:
-                            utility = self.simulate_level_2(opponent, opponent_next_state, depth + 1, max_depth)
-                        total_utility += utility * opponent_action_prob
-                    utility = total_utility
-                expected_utilities.append(utility)
-
-            # Convert expected utilities to probabilities using softmax and the player's beta
-            if expected_utilities:
-                beta = self.get_beta(player)
-                probabilities = softmax(expected_utilities, beta=beta)
-                self.action_probabilities[player][state] = {
-                    action: float(prob) for action, prob in zip(actions, probabilities)
-                }
-
-
-# Example configuration for a single game
-transitions = {1: {"Out": 2, "In": 3}, 3: {"Left": 4, "Right": 5}}
-rewards = {
-    2: {Player1: 5, Player2: 5},
-    4: {Player1: 10, Player2: 10},
-    5: {Player1: 0, Player2: 0},
-}
-actions = {1: {Player1: ["Out", "In"]}, 3: {Player2: ["Left", "Right"]}}
-initial_state = 1
-
-"Simulating Play"
-game = SharingGame(transitions=transitions, rewards=rewards, actions=actions, initial_state=initial_state)
-
-# Loop through all games in the game_configs dictionary
-for game_name, config in game_configs.items():
-
-    # Initialize the game for the current configuration
-    game = SharingGame(
-        transitions=config["transitions"],
-        rewards=config["rewards"],
-        actions=config["actions"],
-        initial_state=config["initial_state"],
+
+class LevelKSimulation_Recip_Parameter(LevelKSimulation):
+    "The objective is to compute the action probabilities for both players"
+    "Player 2 weighs Player 1's payoff by theta_player2 when Player 1 misbehaved, i.e. turned down an Out option that"
+    "... gave both the highest joint payoff and Player 2's highest payoff; Player 1 is self-interested (theta_player1 = 0)"
+    def __init__(self, game, beta_player1, beta_player2, theta_player2):
+        """
+        Initialize the simulation with different parameters for Player 1 and Player 2.
+        :param game: Instance of the SharingGame class (or an already compiled game).
+        :param beta_player1: Beta parameter for Player 1.
+        :param beta_player2: Beta parameter for Player 2.
+        :param theta_player2: Theta parameter for Player 2 (the players social preference in reponse to whether or not player 1
+        misbehaved)
+        """
+        self.theta_player1 = 0
+        self.theta_player2 = theta_player2
+        super().__init__(game, beta_player1, beta_player2, model="reciprocity", params=(theta_player2,))
+
+
+if __name__ == "__main__":
+    # Example configuration for a single game
+    transitions = {1: {"Out": 2, "In": 3}, 3: {"Left": 4, "Right": 5}}
+    rewards = {
+        2: {Player1: 5, Player2: 5},
+        4: {Player1: 10, Player2: 10},
+        5: {Player1: 0, Player2: 0},
+    }
+    actions = {1: {Player1: ["Out", "In"]}, 3: {Player2: ["Left", "Right"]}}
+    initial_state = 1
+
+    "Simulating Play"
+    game = SharingGame(transitions=transitions, rewards=rewards, actions=actions, initial_state=initial_state)
+
+    # Loop through all games in the game_configs dictionary
+    for game_name, config in game_configs.items():
+
+        # Initialize the game for the current configuration
+        game = SharingGame(
+            transitions=config["transitions"],
+            rewards=config["rewards"],
+            actions=config["actions"],
+            initial_state=config["initial_state"],
+        )
+
+        # Create a simulation object
+        simulation = LevelKSimulation_Selfish(
+        game=game,
+        beta_player1 = 0.33567815435117143,
+        beta_player2 = 0.34834185166878495,
     )
+        # Simulate Level 0 reasoning
+        simulation.simulate_level_0(Player1)
+        simulation.simulate_level_0(Player2)
+
+
+         # Print Level 0 action probabilities for both players
+        #print(f"Level 0 action probabilities for {game_name} - Player 1:")
+        #print(simulation.action_probabilities[Player1])
+        #print(f"Level 0 action probabilities for {game_name} - Player 2:")
+        #print(simulation.action_probabilities[Player2])
+
+        # Simulate Level 1 reasoning
+        simulation.simulate_level_1(Player1, 1)
+        simulation.simulate_level_1(Player2, 1)
+
+        # Print Level 1 action probabilities for both players
+       #print(f"Level 1 action probabilities for {game_name} - Player 1:")
+       # print(simulation.action_probabilities[Player1])
+       # print(f"Level 1 action probabilities for {game_name} - Player 2:")
+       # print(simulation.action_probabilities[Player2])
+
+
+        # Simulate Level 2 for Player 1 and Player 2
+        simulation.simulate_level_2(Player1, game.get_initial_state())
+        simulation.simulate_level_2(Player2, game.get_initial_state())
+
+        # Extract and print probabilities of interest
+        p_in_player1 = simulation.action_probabilities[Player1].get(1, {}).get("In", 0)
+        p_right_player2 = simulation.action_probabilities[Player2].get(3, {}).get("Right", 0)
 
-    # Create a simulation object
-    simulation = LevelKSimulation_Selfish(
-    game=game,
-    beta_player1 = 0.33567815435117143,
-    beta_player2 = 0.34834185166878495,
-)
-    # Simulate Level 0 reasoning
-    simulation.simulate_level_0(Player1)
-    simulation.simulate_level_0(Player2)
-
-
-     # Print Level 0 action probabilities for both players
-    #print(f"Level 0 action probabilities for {game_name} - Player 1:")
-    #print(simulation.action_probabilities[Player1])
-    #print(f"Level 0 action probabilities for {game_name} - Player 2:")
-    #print(simulation.action_probabilities[Player2])
-
-    # Simulate Level 1 reasoning
-    simulation.simulate_level_1(Player1, 1)
-    simulation.simulate_level_1(Player2, 1)
-
-    # Print Level 1 action probabilities for both players
-   #print(f"Level 1 action probabilities for {game_name} - Player 1:")
-   # print(simulation.action_probabilities[Player1])
-   # print(f"Level 1 action probabilities for {game_name} - Player 2:")
-   # print(simulation.action_probabilities[Player2])
-
-
-    # Simulate Level 2 for Player 1 and Player 2
-    simulation.simulate_level_2(Player1, game.get_initial_state())
-    simulation.simulate_level_2(Player2, game.get_initial_state())
-
-    # Extract and print probabilities of interest
-    p_in_player1 = simulation.action_probabilities[Player1].get(1, {}).get("In", 0)
-    p_right_player2 = simulation.action_probabilities[Player2].get(3, {}).get("Right", 0)
-
-    print(f"Game: {game_name}")
-    print(f"P(In) for Player 1: {p_in_player1}")
-    print(f"P(Right) for Player 2: {p_right_player2}")
\ No newline at end of file
+        print(f"Game: {game_name}")
+        print(f"P(In) for Player 1: {p_in_player1}")
@@ -4,8 +4,8 @@ sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-en
 
 import numpy as np
 from scipy.optimize import minimize
-from sharing_game import SharingGame
-from strategic_play import LevelKSimulation
+from compiled_game import stack_payoffs
+from level_k import level_k_nll
 from game_configs import game_configs
 
 
@@ -28,60 +28,36 @@ human_data = {
     "common_interest": {"p_in": 0.76047619, "p_right": 0.051904762},
 }
 
-# Negative log-likelihood function for Player 1 and Player 2
-def negative_log_likelihood(beta, game, target_probs):
-    beta_player1, beta_player2 = beta
-    simulation = LevelKSimulation(game, beta_player1, beta_player2)
+game_names, tree, payoffs = stack_payoffs(game_configs)
+targets = np.array([[human_data[game]["p_in"], human_data[game]["p_right"]] for game in game_names])
 
-    # Simulate Level 2 reasoning
-    simulation.simulate_level_2(Player1, game.get_initial_state())
-    simulation.simulate_level_2(Player2, game.get_initial_state())
+# Negative log-likelihood function for Player 1 and Player 2 in a single game
+def negative_log_likelihood(beta, game_index):
+    # Level 2 NLL of this game from log-probabilities, with its exact gradient
+    return level_k_nll(tree, payoffs[game_index:game_index + 1], beta, targets[game_index:game_index + 1], model="selfish", jac=True)
 
-    # Get simulated probabilities
-    p_in_player1 = simulation.action_probabilities[Player1].get(1, {}).get("In", 0)
-    p_right_player2 = simulation.action_probabilities[Player2].get(3, {}).get("Right", 0)
-
-    # Retrieve target probabilities
-    target_p_in = target_probs["p_in"]
-    target_p_right = target_probs["p_right"]
-
-    # Avoid invalid probabilities (e.g., log(0))
-    epsilon = 1e-9
-    p_in_player1 = max(min(p_in_player1, 1 - epsilon), epsilon)
-    p_right_player2 = max(min(p_right_player2, 1 - epsilon), epsilon)
-
-    # Compute log-likelihood for both Player 1 and Player 2
-    log_likelihood_player1 = target_p_in * np.log(p_in_player1) + (1 - target_p_in) * np.log(1 - p_in_player1)
-    log_likelihood_player2 = target_p_right * np.log(p_right_player2) + (1 - target_p_right) * np.log(1 - p_right_player2)
-
-    # Return negative log-likelihood for both players
-    return -(log_likelihood_player1 + log_likelihood_player2)
+# Grid-search warm starts: evaluate a beta grid on every game at once and start each fit from its best grid point
+beta_values = np.linspace(0.01, 10, 100)
+beta_grid = np.stack(np.meshgrid(beta_values, beta_values, indexing="ij"), axis=-1).reshape(-1, 2)
+# Giving every game its own batch axis keeps the NLLs per game: (n_grid, n_games)
+grid_nll = level_k_nll(tree, payoffs[:, None], beta_grid[:, None, :], targets[:, None], model="selfish")
+warm_starts = beta_grid[np.argmin(grid_nll, axis=0)]
 
 # Fit beta for each game
 fitted_betas = {}
 
-for game_name, config in game_configs.items():
+for game_index, game_name in enumerate(game_names):
     print(f"Fitting beta parameters for {game_name}...")
 
-    # Initialize the game for the current configuration
-    game = SharingGame(
-        transitions=config["transitions"],
-        rewards=config["rewards"],
-        actions=config["actions"],
-        initial_state=config["initial_state"],
-    )
-
-    # Get target probabilities for this game
-    target_probs = human_data[game_name]
-
     try:
         # Optimize beta for Player 1 and Player 2
         result = minimize(
             negative_log_likelihood,
-            x0=[0.5, 1],  # Initial beta values for Player 1 and Player 2
-            args=(game, target_probs),
+            x0=warm_starts[game_index],  # Best grid point for Player 1 and Player 2
+            args=(game_index,),
             bounds=[(0.01, 10), (0.01, 10)],  # Bounds for beta parameters
             method="L-BFGS-B",
+            jac=True,
         )
         fitted_betas[game_name] = {
             "beta_player1": result.x[0],
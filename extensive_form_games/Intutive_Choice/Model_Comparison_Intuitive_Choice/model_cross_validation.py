@@ -0,0 +1,44 @@
+import sys
+#Get the project root by going up two levels
+sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Games')
+sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Fitting')
+import numpy as np
+import pandas as pd
+from compiled_game import stack_payoffs
+from cross_validation import cross_validate
+from streaming import load_human_probs
+from game_configs_full import game_configs
+
+# Human means of all 30 games: the 20 training games and the 10 exp3 test games
+human_probs = {**load_human_probs("training_data_2_summary_stats.csv"), **load_human_probs("exp3_summary_stats.csv")}
+
+fitted_configs = {g: game_configs[g] for g in game_configs if g in human_probs}
+game_names, tree, payoffs = stack_payoffs(fitted_configs)
+targets = np.array([[human_probs[g]["p_in"], human_probs[g]["p_right"]] for g in game_names])
+
+# Every model class is cross-validated with leave-one-game-out and K_FOLDS-fold splits; folds run in parallel and are
+# warm-started from the full-data fit
+K_FOLDS = 5
+SCHEMES = ["logo", K_FOLDS]
+BOUNDS = {
+    "selfish": [(0.01, 10), (0.01, 10)],
+    "inequality": [(0.00, 100)] * 6,  # [β1, β2, δ1, δ2, α1, α2]
+    "reciprocity": [(0.00, 1)] * 3,   # [β1, β2, θ2]
+}
+
+if __name__ == "__main__":
+    summary, predictions = [], []
+    for model, bounds in BOUNDS.items():
+        x0 = None
+        for scheme in SCHEMES:
+            cv = cross_validate(tree, payoffs, game_names, targets, model, bounds, folds=scheme, x0=x0)
+            x0 = cv["x0"]  # The full-data fit is shared by every scheme
+            name = "LOGO" if scheme == "logo" else f"{scheme}-fold"
+            predictions.append(cv["predictions"].assign(Model=model, Scheme=name))
+            summary.append({"Model": model, "Scheme": name, "Test_NLL": cv["test_nll"], "Folds": cv["timing"]["n_folds"],
+                            "Seconds": cv["timing"]["wall_seconds"]})
+            print(f"{model} {name}: held-out NLL {cv['test_nll']:.4f} over {cv['timing']['n_folds']} folds "
+                  f"in {cv['timing']['wall_seconds']:.2f}s")
+
+    print(pd.DataFrame(summary).to_string(index=False))
+    pd.concat(predictions).to_csv("cross_validation_predictions.csv", index=False)
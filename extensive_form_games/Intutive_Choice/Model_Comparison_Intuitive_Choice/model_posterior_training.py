@@ -0,0 +1,40 @@
+import sys
+#Get the project root by going up two levels
+sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Games')
+sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Fitting')
+import numpy as np
+import pandas as pd
+from compiled_game import stack_payoffs
+from mcmc import sample_posterior
+from multistart import fit_multistart
+from trial_likelihood import TrialData
+from game_configs_training import game_configs
+
+# Bayesian counterpart of model_fit_training.py: posterior draws of every level-k model under a uniform prior over
+# BOUNDS, with the trial-level likelihood of the raw training rows
+rows = pd.read_csv("training_data_2.csv")
+fitted_configs = {g: game_configs[g] for g in game_configs if g in set(rows["Game"])}
+game_names, tree, payoffs = stack_payoffs(fitted_configs)
+trial_data = TrialData.from_rows(rows, game_names)
+
+N_WALKERS = 64
+N_STEPS = 5000
+BURN_IN = 1000
+BOUNDS = {
+    "selfish": [(0.01, 10), (0.01, 10)],
+    "inequality": [(0.00, 100)] * 6,  # [β1, β2, δ1, δ2, α1, α2], with δ ≥ α in the prior
+    "reciprocity": [(0.00, 1)] * 3,   # [β1, β2, θ2]
+}
+
+if __name__ == "__main__":
+    for model, bounds in BOUNDS.items():
+        # Walkers start in a small ball around the MLE
+        fit = fit_multistart(tree, payoffs, trial_data.means, model, bounds, n_starts=8, counts=trial_data.counts)
+        posterior = sample_posterior(tree, payoffs, trial_data.means, model, bounds, n_walkers=N_WALKERS, n_steps=N_STEPS,
+                                     burn_in=BURN_IN, x0=list(fit["params"].values()), counts=trial_data.counts)
+        timing = posterior["timing"]
+        print(posterior["summary"].to_string(index=False))
+        print(f"{model}: {timing['evaluations_per_second']:.0f} likelihood evaluations/s, "
+              f"{timing['ess_per_second']:.1f} effective draws/s (worst parameter)")
+        np.savez_compressed(f"posterior_{model}.npz", chains=posterior["chains"], log_posterior=posterior["log_posterior"])
+        posterior["summary"].to_csv(f"posterior_summary_{model}.csv", index=False)
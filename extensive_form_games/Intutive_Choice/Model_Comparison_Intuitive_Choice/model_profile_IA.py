@@ -0,0 +1,38 @@
+import sys
+#Get the project root by going up two levels
+sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Games')
+sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Fitting')
+import numpy as np
+import pandas as pd
+from compiled_game import stack_payoffs
+from multistart import fit_multistart
+from profile_likelihood import nll_surface, plot_surface, profile_likelihood
+from trial_likelihood import TrialData
+from game_configs_training import game_configs
+
+# Diagnostics of the IA fit on the training rows: profile likelihoods over β1×β2 and δ×α for each player (all other
+# parameters re-optimized at every grid point), plus the plain NLL surface through the optimum for comparison
+rows = pd.read_csv("training_data_2.csv")
+fitted_configs = {g: game_configs[g] for g in game_configs if g in set(rows["Game"])}
+game_names, tree, payoffs = stack_payoffs(fitted_configs)
+trial_data = TrialData.from_rows(rows, game_names)
+
+BOUNDS = [(0.00, 100)] * 6  # [β1, β2, δ1, δ2, α1, α2]
+GRID_SIZE = 200
+PROFILES = {
+    "beta": (["beta_player1", "beta_player2"], [np.linspace(0.01, 1, GRID_SIZE), np.linspace(0.01, 1, GRID_SIZE)]),
+    "inequality_player1": (["delta_player1", "alpha_player1"], [np.linspace(0, 1, GRID_SIZE), np.linspace(0, 1, GRID_SIZE)]),
+    "inequality_player2": (["delta_player2", "alpha_player2"], [np.linspace(0, 1, GRID_SIZE), np.linspace(0, 1, GRID_SIZE)]),
+}
+
+if __name__ == "__main__":
+    fit = fit_multistart(tree, payoffs, trial_data.means, "inequality", BOUNDS, counts=trial_data.counts)
+    x_hat = list(fit["params"].values())
+    print(f"IA optimum: {fit['params']}, NLL {fit['nll']:.4f}")
+    for label, (names, grids) in PROFILES.items():
+        profile = profile_likelihood(tree, payoffs, trial_data.means, "inequality", x_hat, BOUNDS, names, grids,
+                                     f"profile_IA_{label}", counts=trial_data.counts)
+        print(f"{label}: {profile['timing']['n_points']} points in {profile['timing']['wall_seconds']:.1f}s")
+        plot_surface(profile["nll"], grids, names, title=f"IA profile NLL: {' x '.join(names)}", file_path=f"profile_IA_{label}.png")
+        surface = nll_surface(tree, payoffs, trial_data.means, "inequality", x_hat, names, grids, counts=trial_data.counts)
+        plot_surface(surface, grids, names, title=f"IA NLL through the optimum: {' x '.join(names)}", file_path=f"surface_IA_{label}.png")
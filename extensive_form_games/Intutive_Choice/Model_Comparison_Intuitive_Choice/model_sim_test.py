@@ -2,8 +2,8 @@ import sys,json
 # Ensure your project Games folder is on the path
 sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Games')
 import pandas as pd
-from sharing_game import SharingGame
-from strategic_play import LevelKSimulation_Selfish, LevelKSimulation_IA
+from compiled_game import stack_payoffs
+from level_k import MODEL_PARAMETERS, level_k_choice_probabilities, level_k_grid
 from game_configs_exp3 import game_configs  # Test Games
 
 
@@ -20,30 +20,17 @@ PARAMS_IA      = params["inequality"]
 # Prepare a list to collect model simulations
 results = []
 
+# Selfish predictions for every test game in one batched solve
+game_names, tree, payoffs = stack_payoffs(game_configs)
+selfish_predictions = dict(zip(game_names, level_k_choice_probabilities(
+    tree, payoffs, BETA_SELFISH["beta_player1"], BETA_SELFISH["beta_player2"])[2]))
+ia_row = [PARAMS_IA[name] for name in MODEL_PARAMETERS["inequality"]]
+ia_predictions = dict(zip(game_names, level_k_grid(tree, payoffs, ia_row, model="inequality")[0]))
+
 # --- 2) Loop through each new game and simulate both models ---
-for game_name, cfg in game_configs.items():
-    game = SharingGame(
-        transitions   = cfg["transitions"],
-        rewards       = cfg["rewards"],
-        actions       = cfg["actions"],
-        initial_state = cfg["initial_state"],
-    )
-    
+for game_name in game_names:
     # 2a) Selfish Model Prediction
-    sim_s = LevelKSimulation_Selfish(
-        game, 
-        BETA_SELFISH["beta_player1"], 
-        BETA_SELFISH["beta_player2"]
-    )
-
-    sim_s.simulate_level_0(Player1)
-    sim_s.simulate_level_0(Player2)
-    sim_s.simulate_level_1(Player1, game.get_initial_state())
-    sim_s.simulate_level_1(Player2, game.get_initial_state())
-    sim_s.simulate_level_2(Player1, game.get_initial_state())
-    sim_s.simulate_level_2(Player2, game.get_initial_state())
-    p_in_s   = sim_s.action_probabilities[Player1][1].get("In", None)
-    p_right_s = sim_s.action_probabilities[Player2][3].get("Right", None)
+    p_in_s, p_right_s = selfish_predictions[game_name]
     
     results.append({
         "Game":      game_name,
@@ -53,23 +40,7 @@ for game_name, cfg in game_configs.items():
     })
     
     # 2b) Inequality-Aversion Model Prediction
-    sim_ia = LevelKSimulation_IA(
-        game, 
-        PARAMS_IA ["beta_player1"], 
-        PARAMS_IA ["beta_player2"],
-        PARAMS_IA ["delta_player1"], 
-        PARAMS_IA ["delta_player2"],
-        PARAMS_IA ["alpha_player1"], 
-        PARAMS_IA ["alpha_player2"]
-    )
-    sim_ia.simulate_level_0(Player1)
-    sim_ia.simulate_level_0(Player2)
-    sim_ia.simulate_level_1(Player1, game.get_initial_state())
-    sim_ia.simulate_level_1(Player2, game.get_initial_state())
-    sim_ia.simulate_level_2(Player1, game.get_initial_state())
-    sim_ia.simulate_level_2(Player2, game.get_initial_state())
-    p_in_ia    = sim_ia.action_probabilities[Player1][1].get("In", None)
-    p_right_ia = sim_ia.action_probabilities[Player2][3].get("Right", None)
+    p_in_ia, p_right_ia = ia_predictions[game_name]
     
     results.append({
         "Game":      game_name,
@@ -3,7 +3,7 @@ import sys,json
 sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Games')
 import pandas as pd
 from sharing_game import SharingGame
-from strategic_play_reciprocity import LevelKSimulation_Selfish, LevelKSimulation_IA, LevelKSimulation_Recip_Parameter
+from strategic_play import LevelKSimulation_Selfish, LevelKSimulation_IA, LevelKSimulation_Recip_Parameter
 from game_configs_exp3 import game_configs  # Test Games
 
 
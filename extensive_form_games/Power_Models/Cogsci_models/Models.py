@@ -8,91 +8,37 @@ sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-en
 from sharing_game import SharingGame
 from game_configs_exp3 import game_configs
 from strategic_play import LevelKSimulation_Selfish
+from power_models import choice_policy, compute_reu, compute_rcr, compute_rc
 
 # Define players as strings to match game_configs keys
 Player1 = "1"
 Player2 = "2"
 
+# The models are computed on the compiled game tree, so they are not tied to the Out/Left/Right states 2, 4 and 5
 ### 1. REU: Relative Expected Utility
 def compute_reu_direct(game, p_in_player1, p_right_player2):
     """Compute the Relative Expected Utility (of Player 2 relative to Player 1)."""
-    # Extract rewards from the game config
-    U_P1_Out = game.get_reward(2)[Player1]
-    U_P2_Out = game.get_reward(2)[Player2]
-    U_P1_Left = game.get_reward(4)[Player1]
-    U_P2_Left = game.get_reward(4)[Player2]
-    U_P1_Right = game.get_reward(5)[Player1]
-    U_P2_Right = game.get_reward(5)[Player2]
-
-    # Expected Utility Calculations using precomputed probabilities
-    P_out = 1 - p_in_player1  
-    P_in = p_in_player1
-    P_left = 1 - p_right_player2  
-    P_right = p_right_player2
-
-    # Expected utilities for both players
-    EU_P1 = U_P1_Out * P_out + U_P1_Left * P_in * P_left + U_P1_Right * P_in * P_right
-    EU_P2 = U_P2_Out * P_out + U_P2_Left * P_in * P_left + U_P2_Right * P_in * P_right
-
-    # Compute Relative Expected Utility
-    relative_expected_utility = EU_P2 - EU_P1
-    return EU_P1, EU_P2, relative_expected_utility
+    tree = game.compile()
+    policy = choice_policy(tree, p_in_player1, p_right_player2)
+    EU_P1, EU_P2, relative_expected_utility = compute_reu(tree, policy, tree.payoffs)
+    return float(EU_P1), float(EU_P2), float(relative_expected_utility)
 
 
 ### 2. RCR: Relative Control over Resources
 def compute_rcr_direct(game, p_in_player1, p_right_player2):
     """Compute the Relative Control over Resources (RCR)."""
-    # Extract rewards from the game config
-    U_P1_Out = game.get_reward(2)[Player1]
-    U_P2_Out = game.get_reward(2)[Player2]
-    U_P1_Left = game.get_reward(4)[Player1]
-    U_P2_Left = game.get_reward(4)[Player2]
-    U_P1_Right = game.get_reward(5)[Player1]
-    U_P2_Right = game.get_reward(5)[Player2]
-
-    # Expected Utility Calculations using precomputed probabilities
-    P_out = 1 - p_in_player1  
-    P_in = p_in_player1
-    P_left = 1 - p_right_player2  
-    P_right = p_right_player2
-
-    # Define choice sets for players
-    P1_Choice_Set = [U_P1_Out, U_P1_Left, U_P1_Right]
-    P2_Choice_Set = [U_P2_Out, U_P2_Left, U_P2_Right]
-    MaxU_P1 = max(P1_Choice_Set)
-    MaxU_P2 = max(P2_Choice_Set)
-
-    EU_P1 = U_P1_Out * P_out + U_P1_Left * P_in * P_left + U_P1_Right * P_in * P_right
-    EU_P2 = U_P2_Out * P_out + U_P2_Left * P_in * P_left + U_P2_Right * P_in * P_right
-
-    RCR_P1 = (abs(MaxU_P2 - EU_P2) / MaxU_P2)
-    RCR_P2 = (abs(MaxU_P1 - EU_P1) / MaxU_P1) 
-
-    relative_control_over_resources = RCR_P2 - RCR_P1
-    return RCR_P1, RCR_P2, relative_control_over_resources
+    tree = game.compile()
+    policy = choice_policy(tree, p_in_player1, p_right_player2)
+    RCR_P1, RCR_P2, relative_control_over_resources = compute_rcr(tree, policy, tree.payoffs)
+    return float(RCR_P1), float(RCR_P2), float(relative_control_over_resources)
 
 ### 3. RC: Relative Choice
 def compute_rc_direct(game, p_in_player1, p_right_player2):
     """Compute the Relative Choice model (RC)."""
-    # Extract rewards from the game config
-    U_P1_Out = game.get_reward(2)[Player1]
-    U_P2_Out = game.get_reward(2)[Player2]
-    U_P1_Left = game.get_reward(4)[Player1]
-    U_P2_Left = game.get_reward(4)[Player2]
-    U_P1_Right = game.get_reward(5)[Player1]
-    U_P2_Right = game.get_reward(5)[Player2]
-
-    # Expected Utility Calculations using precomputed probabilities
-    P_out = 1 - p_in_player1  
-    P_in = p_in_player1
-    P_left = 1 - p_right_player2  
-    P_right = p_right_player2
-
-    P1_choice = 2
-    P2_choice = (P_in) * (game.no_unique_states(Player2, 3))
-
-    relative_choice = P2_choice -  P1_choice
-    return P1_choice , P2_choice, relative_choice
+    tree = game.compile()
+    policy = choice_policy(tree, p_in_player1, p_right_player2)
+    P1_choice, P2_choice, relative_choice = compute_rc(tree, policy, tree.payoffs)
+    return float(P1_choice), float(P2_choice), float(relative_choice)
 
 # Define CSV file paths for each model
 csv_file_path_reu = "reu_direct_results.csv"
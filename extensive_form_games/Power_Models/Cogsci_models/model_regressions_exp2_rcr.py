@@ -1,42 +1,18 @@
-import csv
+import sys
+#Get the project root by going up two levels
+sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-engineering an Intuitive Theory of Power/Computational Models/extensive_form_games/Fitting')
 import matplotlib.pyplot as plt
-from scipy.stats import pearsonr
 import numpy as np
-from sklearn.metrics import r2_score
-from sklearn.linear_model import LinearRegression
 import pandas as pd
+from power_regressions import design_matrix, load_power_predictions, subset_regressions
 
-# File paths for different models
-file_paths = [
-    "reu_direct_results.csv",
-    "rcr_direct_results.csv",
-    "rc_direct_results.csv",
-]
-
-# Dictionary to store results for each model
-model_results = {}
-
-# Function to open and read CSV files
-def open_csv(file_path):
-    model_data = {}
-    try:
-        with open(file_path, mode="r") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                game = row["Game"]
-                model_data[game] = float(row["Relative Utility (P2 - P1)"])
-        print(f"Successfully read data from: {file_path}")
-    except FileNotFoundError:
-        print(f"Error: The file '{file_path}' was not found.")
-        return None
-    return model_data
-
-# Load results from all model files
-for file_path in file_paths:
-    model_name = file_path.replace(".csv", "")  # Extract model name from filename
-    data = open_csv(file_path)
-    if data:
-        model_results[model_name] = data
+# Files of the power-model predictions, by predictor label
+model_files = {
+    "REU": "reu_direct_results.csv",
+    "RCR": "rcr_direct_results.csv",
+    "RC": "rc_direct_results.csv",
+}
+predictions = load_power_predictions(model_files)
 
 # Load the human data
 file_path = "power_stats_by_game.csv"
@@ -56,77 +32,46 @@ ci_power = {game: Z * (std / np.sqrt(N)) for game, std in std_devs_power.items()
 
 # Assign colors
 game_names = data['Game'].unique()
-color_palette = plt.cm.get_cmap('tab10', len(game_names))
+color_palette = plt.get_cmap('tab10', len(game_names))
 game_colors = {game: color_palette(i) for i, game in enumerate(game_names)}
 
 # --------- MULTIPLE LINEAR REGRESSION --------- #
 
-# Define model combinations
-combinations = {
-    "REU": ["reu_direct_results"],
-    "RC ": ["rc_direct_results"],
-    "RCR ": ["rcr_direct_results"],
-    "RC + REU": ["rc_direct_results", "reu_direct_results"],
-    "RC + RCR": ["rc_direct_results", "rcr_direct_results"],
-    "REU + RCR": ["reu_direct_results", "rcr_direct_results"],
-    "REU + RC + RCR": ["reu_direct_results", "rc_direct_results", "rcr_direct_results"]
-}
-
-for combo_name, models in combinations.items():
-    print(f"\nRunning Multiple Linear Regression for: {combo_name}")
-    
-    # Prepare data
-    X = []
-    Y = []
-    for game in Average_Power.keys():
-        try:
-            predictors = [model_results[model][game] for model in models]
-            X.append(predictors)
-            Y.append(Average_Power[game])
-        except KeyError:
-            continue  # Skip games not found in all models
-
-    X = np.array(X)
-    Y = np.array(Y)
-
-    # Fit the multiple linear regression model
-    reg = LinearRegression()
-    reg.fit(X, Y)
-    Y_pred = reg.predict(X)
-
-    # Compute correlation and R-squared
-    correlation, _ = pearsonr(Y, Y_pred)
-    adj_r2 = 1 - (1 - r2_score(Y, Y_pred)) * (len(Y) - 1) / (len(Y) - X.shape[1] - 1)
-
-    # Visualization with error bars
-    plt.figure(figsize=(10, 6))
-    for i, game in enumerate(Average_Power.keys()):
-        if i < len(Y_pred):
-            plt.errorbar(
-                Y_pred[i],
-                Y[i],
-                yerr=ci_power.get(game, 0),
-                fmt="o",
-                label=game,
-                color=game_colors.get(game, "gray"),
-                markersize=8,
-                capsize=5,
-            )
-
-    # Line of best fit
-    plt.plot([min(Y_pred), max(Y_pred)], [min(Y_pred), max(Y_pred)], linestyle="--", color="black", label="Best Fit Line")
-
-    # Customize plot
-    plt.xlabel("Model Predictions", fontsize=20)
-    plt.ylabel("Average Power (Human Data)", fontsize=20)
-    plt.title(f"{combo_name}: Correlation {correlation:.2f}")
-    plt.legend(title="Game", bbox_to_anchor=(1.05, 1), loc="upper left")
-    plt.grid(False)
-    plt.tight_layout()
-    plt.show()
-
-    # Print results
-    print(f"Correlation for {combo_name}: {correlation:.2f}")
-    print(f"Adjusted R² for {combo_name}: {adj_r2:.2f}")
-    print(f"Model Coefficients: {reg.coef_}")
-    print(f"Intercept: {reg.intercept_}")
+# Every combination of the predictors is fitted at once (power_regressions.subset_regressions)
+games, X, Y, predictor_names = design_matrix(predictions, data)
+regressions = subset_regressions(X, Y, predictor_names)
+print(regressions["table"].to_string(index=False))
+regressions["table"].to_csv("model_regressions_exp2_rcr.csv", index=False)
+
+# --------- PLOTS (skipped with --no-plot) --------- #
+
+if "--no-plot" not in sys.argv:
+    for row, Y_pred in zip(regressions["table"].itertuples(), regressions["fitted"]):
+        combo_name, correlation = row.Combination, row.r
+
+        # Visualization with error bars
+        plt.figure(figsize=(10, 6))
+        for i, game in enumerate(games):
+            if i < len(Y_pred):
+                plt.errorbar(
+                    Y_pred[i],
+                    Y[i],
+                    yerr=ci_power.get(game, 0),
+                    fmt="o",
+                    label=game,
+                    color=game_colors.get(game, "gray"),
+                    markersize=8,
+                    capsize=5,
+                )
+
+        # Line of best fit
+        plt.plot([min(Y_pred), max(Y_pred)], [min(Y_pred), max(Y_pred)], linestyle="--", color="black", label="Best Fit Line")
+
+        # Customize plot
+        plt.xlabel("Model Predictions", fontsize=20)
+        plt.ylabel("Average Power (Human Data)", fontsize=20)
+        plt.title(f"{combo_name}: Correlation {correlation:.2f}")
+        plt.legend(title="Game", bbox_to_anchor=(1.05, 1), loc="upper left")
+        plt.grid(False)
+        plt.tight_layout()
+        plt.show()
@@ -8,30 +8,45 @@ sys.path.insert(0, '/Users/junior/Desktop/Files/MIT/Research/Projects/Reverse-en
 from sharing_game import SharingGame
 from new_game_configs import game_configs # Import new game configurations
 from strategic_play import LevelKSimulation_Selfish
+from compiled_game import compile_game
+from power_models import choice_policy, power_scores
 
 # Define players as strings to match game_configs keys
 Player1 = "1"
 Player2 = "2"
 
+def direct_scores(game, p_in_player1, p_right_in_player2, p_right_out_player2):
+    """
+    REU, RCR, RC and RCA of a game from one power_scores call (power_models.py), given P(In) for Player 1 and
+    P(Right) for Player 2 after In and after Out. P(Right) after Out only matters if Player 2 has a choice after Out
+    (a single action there is taken with probability 1).
+    """
+    tree = compile_game(game)
+    initial = game.get_initial_state()
+    policy = choice_policy(tree, p_in_player1, p_right_in_player2,
+                           choices=((initial, "In"), (game.transitions[initial]["In"], "Right")))
+    after_out = game.transitions[initial]["Out"]
+    if after_out in game.transitions and tree.n_children[tree.state_index[after_out]] > 1:
+        state = tree.state_index[after_out]  # The other actions share 1 - P(Right), as in choice_policy
+        policy[tree.edges(state)] = (1 - p_right_out_player2) / (tree.n_children[state] - 1)
+        policy[tree.edge_id(after_out, "Right")] = p_right_out_player2
+    return {model: tuple(float(v) for v in values) for model, values in power_scores(tree, tree.payoffs, policy).items()}
+
 # 1. REU: Compute the Relative Expected Utility (of Player 2 relative to Player 1)
 def compute_reu_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2):
- 
-    "Your code here"
+    return direct_scores(game, p_in_player1, p_right_in_player2, p_right_out_player2)["REU"]
 
 # 2. RCR: Compute the Relative Control over Resources (RCR).
 def compute_rcr_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2):
-    
-     "Your code here"
+    return direct_scores(game, p_in_player1, p_right_in_player2, p_right_out_player2)["RCR"]
 
 # 3. Choice: Compute the Relative Choice model (RC).
 def compute_rc_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2):
-
-    "Your code here"
+    return direct_scores(game, p_in_player1, p_right_in_player2, p_right_out_player2)["RC"]
 
 # 4. Counterfactual Causal Influence over Actions: Compute the Relative Control over Actions model (RCA).
 def compute_rca_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2):
-
-    "Your code here"
+    return direct_scores(game, p_in_player1, p_right_in_player2, p_right_out_player2)["RCA"]
 
 
 # Define CSV file paths for each model
@@ -84,22 +99,27 @@ for game_name, config in game_configs.items():
 
     # Extract action probabilities for Level 2
     p_in_player1 = simulation.action_probabilities[Player1].get(1, {}).get("In", 0)
-    p_right_player2 = simulation.action_probabilities[Player2].get(3, {}).get("Right", 0)
+    p_right_in_player2 = simulation.action_probabilities[Player2].get(3, {}).get("Right", 0)
+    p_right_out_player2 = simulation.action_probabilities[Player2].get(config["transitions"][1]["Out"], {}).get("Right", 0)
+
+    # All four models from one power_scores call
+    scores = direct_scores(game, p_in_player1, p_right_in_player2, p_right_out_player2)
 
     # Compute REU (Direct)
-    EU_P1, EU_P2, REU_value = compute_reu_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2)
+    EU_P1, EU_P2, REU_value = scores["REU"]
     results_reu[game_name] = {"U_P1": round(EU_P1, 2), "U_P2": round(EU_P2, 2), "Relative Utility (P2 - P1)": round(REU_value, 2)}
 
     # Compute RCR (Direct)
-    MaxU_P1, MaxU_P2, RCR = compute_rcr_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2)
+    MaxU_P1, MaxU_P2, RCR = scores["RCR"]
     results_rcr[game_name] = {"U_P1": round(MaxU_P1, 2), "U_P2": round(MaxU_P2, 2), "Relative Utility (P2 - P1)": round(RCR, 2)}
 
      # Compute RC (Direct)
-    RC_P1, RC_P2, RC = compute_rc_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2)
+    RC_P1, RC_P2, RC = scores["RC"]
     results_rc[game_name] = {"U_P1": round(RC_P1, 2), "U_P2": round(RC_P2, 2), "Relative Utility (P2 - P1)": round(RC, 2)}
 
      # Compute RCA (Direct) (Done for you)
-    RCA_P1, RCA_P2, RCA = compute_rca_direct(game, p_in_player1, p_right_in_player2, p_right_out_player2)
+    RCA_P1, RCA_P2, RCA = scores["RCA"]
+    results_rca[game_name] = {"U_P1": round(RCA_P1, 2), "U_P2": round(RCA_P2, 2), "Relative Utility (P2 - P1)": round(RCA, 2)}
 
     # Print results for each model
     print(f"REU - Expected Utility of Player 1: {EU_P1:.2f}, Player 2: {EU_P2:.2f}, REU: {REU_value:.2f}")